@@ -1,32 +1,23 @@
 import tkinter as tk
-from tkinter import Frame, Toplevel, messagebox, simpledialog, filedialog, ttk
+from tkinter import Toplevel, messagebox, simpledialog, filedialog, ttk
 import os
-import shutil
-import json
+import sys
+
+from engine import ALGORITHMS, FileSystemEngine, FileSystemError
+from executor import BackgroundExecutor
+from block_map import BlockMap
+from defrag import Defragmenter
+from importer import HostImporter
+from table_views import AllocationTableSource, JournalSource, MftSource, VirtualTable
 
 class FileSystemApp:
     def __init__(self, root):
         self.root = root
         self.root.title("Proyecto Final, Sistemas Operativos - Sistema de Archivos")
-        self.current_directory = os.getcwd()  # Directorio inicial (Donde está el proyecto)
-        self.allocation_table = {}  # Allocation Table FAT32
-        self.journal = []  # Journal EXT
-        self.mft = {}  # MFT NTFS
-        self.disk_blocks = 1000  # N total de bloques(clusters) para la simulación
-        self.used_blocks = 0  # Bloques ya usados
-        self.block_usage = {}  # Uso de bloques por archivo
-        self.reserved_blocks = 0  # Bloques reservados para estructuras de sistema de archivos
-        self.selected_algorithm = ""  # Algoritmo seleccionado por el usuario
-        self.next_available_block = 1  # Siguiente bloque disponible
-        
-        # Mapeo de bloques máximos por archivo según el sistema de archivos
-        self.max_blocks_per_file = {
-            "FAT32": 200,
-            "NTFS": 800,
-            "EXT": 800
-        }
-        
-        self.load_data()
+        # Motor de simulación (toda la lógica del disco vive ahí); el estado se guarda en SQLite y, la primera vez,
+        # se migra desde filesystem_data.json
+        self.engine = FileSystemEngine(data_file='filesystem_data.db')
+        self.executor = BackgroundExecutor(root)  # Hilo de E/S: las operaciones no bloquean la interfaz
         self.create_main_menu()
 
     def create_main_menu(self):
@@ -57,11 +48,11 @@ class FileSystemApp:
         label.pack(pady=20)
 
         tk.Label(self.root, text="Seleccionar Sistema de Archivos:").pack(pady=10)
-        self.algorithm_selector = ttk.Combobox(self.root, values=["", "FAT32", "NTFS", "EXT"])
+        self.algorithm_selector = ttk.Combobox(self.root, values=[""] + ALGORITHMS)
         
         # Establecer la selección previa si existe
-        if self.selected_algorithm in ["FAT32", "NTFS", "EXT"]:
-            self.algorithm_selector.set(self.selected_algorithm)
+        if self.engine.selected_algorithm in ALGORITHMS:
+            self.algorithm_selector.set(self.engine.selected_algorithm)
         else:
             self.algorithm_selector.current(0)
         
@@ -82,98 +73,80 @@ class FileSystemApp:
         btn_view_mft = tk.Button(self.root, text="Ver MFT (NTFS)", command=self.view_mft, width=30)
         btn_view_mft.pack(pady=10)
 
+        self.btn_metrics = tk.Button(self.root, command=self.toggle_metrics, width=30)
+        self._update_metrics_button()
+        self.btn_metrics.pack(pady=10)
+
         btn_back = tk.Button(self.root, text="Volver", command=self.create_main_menu, width=20)
         btn_back.pack(pady=10)
 
+    def _metrics_file(self):
+        # Las métricas se exportan junto al archivo de datos, en formato de texto de Prometheus
+        return os.path.abspath(self.engine.data_file + '.metrics.prom')
+
+    def _update_metrics_button(self):
+        text = "Desactivar Métricas" if self.engine.metrics is not None else "Activar Métricas"
+        self.btn_metrics.config(text=text)
+
+    def toggle_metrics(self):
+        if self.engine.metrics is None:
+            self.engine.enable_metrics(self._metrics_file(), interval=5.0)
+            messagebox.showinfo("Métricas Activadas", f"Las métricas se escriben cada 5 segundos en:\n{self._metrics_file()}")
+        else:
+            self.engine.disable_metrics()
+            messagebox.showinfo("Métricas Desactivadas", f"Última exportación en:\n{self._metrics_file()}")
+        self._update_metrics_button()
+
     def apply_algorithm(self):
-        self.selected_algorithm = self.algorithm_selector.get()
-        if self.selected_algorithm not in ["FAT32", "NTFS", "EXT"]:
-            messagebox.showwarning("Selección Inválida", "Por favor, selecciona un sistema de archivos válido.")
+        try:
+            report = self.engine.apply_algorithm(self.algorithm_selector.get())
+        except FileSystemError as e:
+            messagebox.showwarning(e.title, str(e))
             return
 
-        self.calculate_reserved_blocks()
-        messagebox.showinfo("Sistema Aplicado", f"Sistema de archivos seleccionado: {self.selected_algorithm}")
+        messagebox.showinfo("Sistema Aplicado", f"Sistema de archivos seleccionado: {self.engine.selected_algorithm}\n"
+                                                f"Archivos convertidos: {report['files']}\n"
+                                                f"Bloques movidos fuera de la zona reservada: {report['blocks_moved']} "
+                                                f"({report['files_moved']} archivos)\n"
+                                                f"Tiempo de conversión: {report['elapsed_s'] * 1000:.1f} ms")
         self.update_size_info()
         self.update_progress_bar()
-        self.save_data()  # Guardar los cambios inmediatamente
-
-    def calculate_reserved_blocks(self):
-        """Calcula los bloques reservados según el algoritmo seleccionado"""
-        
-        # Fórmula Base: Porcentaje de Reserva = (Size Particion) / (Size Cluster)
-        # En este caso, se utiliza el porcentaje común de espacio reservado por File System
-        
-        if self.selected_algorithm == "FAT32":
-            # Suponemos que la Allocation Table ocupa 16% del disco en total
-            self.reserved_blocks = int(self.disk_blocks * 0.16)
-        elif self.selected_algorithm == "NTFS":
-            # NTFS reserva aproximadamente el 12.5% del espacio del disco para la MFT
-            self.reserved_blocks = int(self.disk_blocks * 0.125)
-        elif self.selected_algorithm == "EXT":
-            # EXT reserva el 5% del espacio total de la partición para el Journal
-            self.reserved_blocks = int(self.disk_blocks * 0.05)
-        else:
-            self.reserved_blocks = 0
-
-        # Asegurarse de que used_blocks incluye reserved_blocks
-        if self.used_blocks < self.reserved_blocks:
-            self.used_blocks = self.reserved_blocks
+        self.engine.save_data()  # Guardar los cambios inmediatamente
 
     def set_directory(self):
-        new_directory = filedialog.askdirectory(initialdir=self.current_directory, title="Selecciona el Directorio")
+        new_directory = filedialog.askdirectory(initialdir=self.engine.current_directory, title="Selecciona el Directorio")
         if new_directory:
-            self.current_directory = new_directory
-            messagebox.showinfo("Directorio Actual", f"Directorio cambiado a: {self.current_directory}")
+            self.engine.current_directory = new_directory
+            messagebox.showinfo("Directorio Actual", f"Directorio cambiado a: {self.engine.current_directory}")
+
+    def _open_table(self, window, source):
+        # La tabla se vuelve a consultar cada vez que termina una operación del hilo de E/S
+        table = VirtualTable(window, source)
+        table.pack(fill="both", expand=True)
+        self.executor.watch(table.refresh)
+        table.bind("<Destroy>", lambda event: self.executor.unwatch(table.refresh) if event.widget is table else None)
+        return table
 
     def view_allocation_table(self):
-        if self.selected_algorithm == "FAT32":
+        if self.engine.selected_algorithm == "FAT32":
             # Crear una ventana para la tabla
             table_window = tk.Toplevel(self.root)
             table_window.title("Tabla de Asignación (FAT32)")
 
-            # Crear un Treeview para mostrar los datos
-            columns = ("Archivo", "Bloques", "Rango de Bloques", "Ruta")
-            tree = ttk.Treeview(table_window, columns=columns, show="headings")
-            tree.heading("Archivo", text="Archivo")
-            tree.heading("Bloques", text="Bloques")
-            tree.heading("Rango de Bloques", text="Rango de Bloques")
-            tree.heading("Ruta", text="Ruta")
-
-            # Agregar los datos del diccionario a la tabla
-            for file, data in self.allocation_table.items():
-                blocks = data['blocks']
-                start_block = data['start_block']
-                end_block = data['end_block']
-                rango = f"{start_block}-{end_block}"
-                tree.insert("", tk.END, values=(file, blocks, rango, data['path']))
-
-            # Mostrar la tabla
-            tree.pack(fill="both", expand=True)
+            # Tabla virtual: solo se cargan las filas visibles (la cadena se recorre en la FAT al mostrarlas)
+            self._open_table(table_window, AllocationTableSource(self.engine))
         else:
             # Mostrar mensaje de error si el algoritmo no es FAT32
             messagebox.showwarning("Incompatibilidad", "El Sistema de Archivos seleccionado no es FAT32.")
 
     def view_journal(self):
-        if self.selected_algorithm == "EXT":
+        if self.engine.selected_algorithm == "EXT":
             # Crear una ventana nueva
             journal_window = Toplevel()
             journal_window.title("Journal de Operaciones")
 
-            # Crear un frame para la tabla
-            frame = Frame(journal_window)
-            frame.pack(fill="both", expand=True)
-
-            # Crear un Treeview
-            tree = ttk.Treeview(frame, columns=("Operaciones"), show="headings")
-            tree.heading("Operaciones", text="Operaciones")
-            tree.pack(fill="both", expand=True)
-
-            # Insertar los contenidos del journal en el Treeview
-            for operation in self.journal:
-                tree.insert("", "end", values=(operation,))
-
-            # Ajustar el tamaño de la columna
-            tree.column("Operaciones", width=300)
+            # Tabla virtual con los registros del journal
+            self._open_table(journal_window, JournalSource(self.engine))
 
             # Botón para cerrar la ventana
             close_button = ttk.Button(journal_window, text="Cerrar", command=journal_window.destroy)
@@ -182,32 +155,13 @@ class FileSystemApp:
             messagebox.showwarning("Incompatibilidad", "El Sistema de Archivos seleccionado no es EXT.")
 
     def view_mft(self):
-        if self.selected_algorithm == "NTFS":
-            # Convertir el contenido de la MFT a un formato más legible para la tabla
-            mft_data = []
-            for file, data in self.mft.items():
-                mft_data.append([file, data["size"], data["blocks"], data["path"]])
-
+        if self.engine.selected_algorithm == "NTFS":
             # Crear una ventana para la tabla
             mft_window = tk.Toplevel(self.root)
             mft_window.title("Tabla Maestra de Archivos (MFT)")
 
-            # Crear un Treeview para mostrar los datos en formato tabular
-            columns = ("Nombre Archivo", "Tamaño", "Bloques", "Ruta")
-            tree = ttk.Treeview(mft_window, columns=columns, show="headings")
-            for col in columns:
-                tree.heading(col, text=col)
-            tree.pack(fill="both", expand=True)
-
-            # Insertar los datos de la MFT en la tabla
-            for row in mft_data:
-                tree.insert("", "end", values=row)
-
-            # Ajustar el ancho de las columnas para una mejor visualización
-            tree.column("Nombre Archivo", width=200, anchor="w")
-            tree.column("Tamaño", width=100, anchor="center")
-            tree.column("Bloques", width=100, anchor="center")
-            tree.column("Ruta", width=300, anchor="w")
+            # Tabla virtual: cada fila se lee de su registro de la MFT solo cuando está visible
+            self._open_table(mft_window, MftSource(self.engine))
         else:
             messagebox.showwarning("Incompatibilidad", "El Sistema de Archivos seleccionado no es NTFS.")
 
@@ -231,34 +185,109 @@ class FileSystemApp:
         self.filesize_label = tk.Label(self.root, text="", font=("Arial", 12))
         self.filesize_label.pack(pady=5)
 
-        self.progress_frame = tk.Frame(self.root)
-        self.progress_frame.pack(pady=30)
+        # Mapa de bloques del disco (reservado, usado por archivo, fragmentado y libre)
+        self.block_map = BlockMap(self.root, self.engine)
+        self.block_map.pack(pady=30)
 
         self.update_size_info()
         self.update_progress_bar()
         
         btn_view_structure = tk.Button(self.root, text="Ver Estructura de Directorios", command=self.view_directory_structure, width=30)
-        btn_view_structure.pack(pady=50)
+        btn_view_structure.pack(pady=(50, 10))
+
+        self.btn_defrag = tk.Button(self.root, text="Desfragmentar", command=self.defragment, width=30)
+        self.btn_defrag.pack(pady=10)
+
+        btn_import = tk.Button(self.root, text="Importar Árbol del Host", command=self.import_tree, width=30)
+        btn_import.pack(pady=10)
 
         btn_back = tk.Button(self.root, text="Volver", command=self.create_main_menu, width=20)
         btn_back.pack(pady=10)
 
+    def defragment(self):
+        # Se aplica por intervalos cortos desde el bucle de Tk: la interfaz sigue respondiendo
+        # y el mapa de bloques muestra el avance entre un intervalo y el siguiente
+        defragmenter = Defragmenter(self.engine)
+        self.btn_defrag.config(state="disabled")
+
+        def step():
+            pending = defragmenter.run(time_slice=0.02)
+            self.update_progress_bar()
+            if pending:
+                self.root.after(1, step)
+                return
+            if self.btn_defrag.winfo_exists():
+                self.btn_defrag.config(state="normal")
+            self.executor.submit(lambda task: self.engine.save_data())  # Guardar los cambios
+            report = defragmenter.report()
+            before, after = report['before'], report['after']
+            messagebox.showinfo("Desfragmentación Completa",
+                                f"Movimientos: {report['moves']} ({report['blocks_moved']} bloques movidos)\n"
+                                f"Archivos fragmentados: {before['fragmented_files']} -> {after['fragmented_files']}\n"
+                                f"Extents por archivo: {before['extents_per_file']:.2f} -> {after['extents_per_file']:.2f}\n"
+                                f"Índice de fragmentación: {before['score']:.2%} -> {after['score']:.2%}\n"
+                                f"Fragmentación del espacio libre: {before['free_space_fragmentation']:.2%} -> "
+                                f"{after['free_space_fragmentation']:.2%}")
+
+        self.root.after(1, step)
+
+    def import_tree(self):
+        # Refleja una carpeta real (con todas sus subcarpetas) en el volumen simulado, sin copiar el contenido
+        source = filedialog.askdirectory(title="Carpeta del host a importar")
+        if not source:
+            return
+        target = simpledialog.askstring("Carpeta de Destino", "Carpeta del volumen donde importar:",
+                                        initialvalue=self.engine.current_directory)
+        if not target:
+            return
+
+        progress_window = tk.Toplevel(self.root)
+        progress_window.title("Importando Árbol")
+        progress_label = tk.Label(progress_window, text=f"Recorriendo '{source}'...")
+        progress_label.pack(padx=20, pady=(15, 5))
+        progress = ttk.Progressbar(progress_window, length=300, mode="indeterminate")
+        progress.pack(padx=20, pady=5)
+        progress.start()
+        btn_cancel = tk.Button(progress_window, text="Cancelar", width=12)
+        btn_cancel.pack(pady=(5, 15))
+
+        def report(done, total):
+            progress_label.config(text=f"Importando '{source}': {done} entradas")
+            self.update_progress_bar()
+
+        def done(summary):
+            self.update_progress_bar()
+            errors = ", ".join(f"{kind}: {count}" for kind, count in sorted(summary['errors'].items())) or "ninguno"
+            messagebox.showinfo("Importación Completa",
+                                f"Archivos: {summary['files']}\n"
+                                f"Carpetas: {summary['directories']}\n"
+                                f"Bloques asignados: {summary['blocks']}\n"
+                                f"No importados: {summary['failed']} ({errors})\n"
+                                f"Entradas ilegibles: {summary['unreadable']}")
+
+        importer = HostImporter(self.engine)
+        task = self._run_operation(
+            lambda task: importer.run(source, target, progress=task.report, cancel=task.cancelled),
+            done, "No se pudo importar el árbol", on_progress=report, cleanup=progress_window.destroy)
+        btn_cancel.config(command=task.cancel)
+        progress_window.protocol("WM_DELETE_WINDOW", task.cancel)
+
     def update_size_info(self):
-        if self.selected_algorithm == "FAT32":
+        if self.engine.selected_algorithm == "FAT32":
             cluster_size = "De 512 bytes a 64 KB"
             disk_size = "2 TB"
             partition_size = "32 GB"
-            filesize = f"Máximo {self.max_blocks_per_file['FAT32']} bloques"
-        elif self.selected_algorithm == "NTFS":
+            filesize = f"Máximo {self.engine.max_blocks_per_file['FAT32']} bloques"
+        elif self.engine.selected_algorithm == "NTFS":
             cluster_size = "De 512 bytes a 64 KB"
             disk_size = "256 TB"
             partition_size = "2 TB"
-            filesize = f"Máximo {self.max_blocks_per_file['NTFS']} bloques"
-        elif self.selected_algorithm == "EXT":
+            filesize = f"Máximo {self.engine.max_blocks_per_file['NTFS']} bloques"
+        elif self.engine.selected_algorithm == "EXT":
             cluster_size = "De 1 KB a 4 KB"
             disk_size = "1 EB"
             partition_size = "32 TB"
-            filesize = f"Máximo {self.max_blocks_per_file['EXT']} bloques"
+            filesize = f"Máximo {self.engine.max_blocks_per_file['EXT']} bloques"
         else:
             cluster_size = "Desconocido"
             disk_size = "Desconocido"
@@ -271,56 +300,47 @@ class FileSystemApp:
         self.filesize_label.config(text=f"Archivo Máximo: {filesize}")
 
     def update_progress_bar(self):
-        # Verificar si progress_frame existe
-        if not hasattr(self, 'progress_frame'):
-            return  # Salir si progress_frame no está creado
-
-        for widget in self.progress_frame.winfo_children():
-            widget.destroy()
-
-        total_width = 800
-        used_width = int((self.used_blocks / self.disk_blocks) * total_width)
-
-        # Mostrar los bloques reservados por el sistema de archivos
-        reserved_width = int((self.reserved_blocks / self.disk_blocks) * total_width)
-        reserved_label = tk.Label(
-            self.progress_frame,
-            text=f"Reservado ({self.reserved_blocks} bloques)",
-            bg="blue",
-            fg="white",
-            width=reserved_width // 10,  # Ajustar el ancho para visualización
-            anchor="w"
-        )
-        reserved_label.pack(side=tk.LEFT, padx=(0, 1))
-
-        # Mostrar los bloques usados por archivos
-        if used_width - reserved_width > 0:
-            usage_label = tk.Label(
-                self.progress_frame,
-                text=f"Usado ({self.used_blocks - self.reserved_blocks} bloques)",
-                bg="red",
-                fg="white",
-                width=(used_width - reserved_width) // 10,  # Ajustar el ancho para visualización
-                anchor="w"
-            )
-            usage_label.pack(side=tk.LEFT, padx=(0, 1))
-
-        # Mostrar el espacio libre restante
-        free_width = total_width - used_width
-        if free_width > 0:
-            free_label = tk.Label(
-                self.progress_frame,
-                text=f"Libre ({self.disk_blocks - self.used_blocks} bloques)",
-                bg="green",
-                fg="white",
-                width=free_width // 10,  # Ajustar el ancho para visualización
-                anchor="w"
-            )
-            free_label.pack(side=tk.LEFT)
+        # Actualizar el mapa de bloques si está en pantalla (solo se repintan las celdas modificadas)
+        block_map = getattr(self, 'block_map', None)
+        if block_map is None or not block_map.winfo_exists():
+            return
+        with self.engine.lock:
+            block_map.refresh()
 
     def view_directory_structure(self):
-        structure = "\n".join(os.listdir(self.current_directory))
-        messagebox.showinfo("Estructura de Directorios", f"Contenido de '{self.current_directory}':\n\n{structure}")
+        # Árbol del disco simulado: el contenido de cada carpeta se carga recién al expandirla
+        tree_window = tk.Toplevel(self.root)
+        tree_window.title("Estructura de Directorios")
+
+        tree = ttk.Treeview(tree_window, columns=("Bloques",), height=20)
+        tree.heading("#0", text=self.engine.current_directory)
+        tree.heading("Bloques", text="Bloques")
+        tree.column("#0", width=350)
+        tree.column("Bloques", width=80, anchor="center")
+        tree.pack(fill="both", expand=True)
+
+        def load_children(item, directory):
+            with self.engine.lock:
+                entries = list(self.engine.list_directory(directory))
+            for name, is_dir in entries:
+                path = os.path.join(directory, name)
+                if is_dir:
+                    child = tree.insert(item, "end", text=f"[{name}]", values=("",))
+                    folders[child] = path
+                    tree.insert(child, "end", text="...")  # Marcador: se reemplaza al expandir
+                else:
+                    tree.insert(item, "end", text=name, values=(self.engine.block_usage.get(path, ""),))
+
+        def on_open(event):
+            item = tree.focus()
+            path = folders.pop(item, None)
+            if path is not None:
+                tree.delete(*tree.get_children(item))
+                load_children(item, path)
+
+        folders = {}  # Carpetas cuyo contenido todavía no se cargó
+        tree.bind("<<TreeviewOpen>>", on_open)
+        load_children("", self.engine.namespace.normalize(self.engine.current_directory))
 
     def file_operations(self):
         self.clear_window()
@@ -343,109 +363,65 @@ class FileSystemApp:
         btn_create_folder = tk.Button(self.root, text="Crear Carpeta", command=self.create_folder, width=30)
         btn_create_folder.pack(pady=10)
 
+        btn_move_folder = tk.Button(self.root, text="Mover/Renombrar Carpeta", command=self.move_folder, width=30)
+        btn_move_folder.pack(pady=10)
+
         btn_back = tk.Button(self.root, text="Volver", command=self.create_main_menu, width=20)
         btn_back.pack(pady=10)
 
+    def _show_error(self, error):
+        # Mostrar el error del motor con el tipo de mensaje que corresponde
+        if error.level == "warning":
+            messagebox.showwarning(error.title, str(error))
+        else:
+            messagebox.showerror(error.title, str(error))
+
+    def _run_operation(self, operation, on_done, error_message, on_progress=None, cleanup=None):
+        # La operación y el guardado corren en el hilo de E/S; los avisos se muestran al terminar
+        def work(task):
+            result = operation(task)
+            self.engine.save_data()  # Guardar los cambios
+            return result
+
+        def done(result):
+            if cleanup is not None:
+                cleanup()
+            on_done(result)
+
+        def failed(error):
+            if cleanup is not None:
+                cleanup()
+            if isinstance(error, FileSystemError):
+                self._show_error(error)
+            else:
+                messagebox.showerror("Error", f"{error_message}: {str(error)}")
+
+        return self.executor.submit(work, on_done=done, on_error=failed, on_progress=on_progress)
+
     def create_file(self):
         file_name = simpledialog.askstring("Nombre del Archivo", "Introduce el nombre del archivo:")
         blocks = simpledialog.askinteger("Bloques Requeridos", "Introduce la cantidad de bloques que necesita el archivo:", minvalue=1)
         file_content = simpledialog.askstring("Contenido del Archivo", "Introduce el contenido del archivo:")
 
         if file_name and blocks and file_content is not None:
-            max_blocks = self.max_blocks_per_file.get(self.selected_algorithm, 0)
-            if blocks > max_blocks:
-                messagebox.showwarning("Exceso de Bloques", f"El archivo excede el número máximo de bloques permitidos para {self.selected_algorithm} ({max_blocks} bloques).")
-                return
+            def done(result):
+                messagebox.showinfo("Archivo Creado", f"Archivo '{file_name}' creado exitosamente con {blocks} bloques.\nRango de Bloques: {result['start_block']}-{result['end_block']}")
+                self.update_progress_bar()
 
-            if self.used_blocks + blocks <= self.disk_blocks:
-                file_path = os.path.join(self.current_directory, file_name)
-                try:
-                    with open(file_path, 'w') as file:
-                        file.write(file_content)
-
-                    # Registrar uso de bloques
-                    self.used_blocks += blocks
-                    start_block = self.next_available_block
-                    end_block = self.next_available_block + blocks - 1
-                    self.block_usage[file_name] = blocks
-                    self.next_available_block += blocks
-
-                    # Actualizar estructuras del sistema de archivos según el algoritmo
-                    if self.selected_algorithm == "FAT32":
-                        self.allocation_table[file_name] = {
-                            'blocks': blocks,
-                            'start_block': start_block,
-                            'end_block': end_block,
-                            'path': file_path
-                        }
-                    elif self.selected_algorithm == "EXT":
-                        self.journal.append(f"Archivo creado: {file_name}, Bloques: {blocks}, Path: {file_path}")
-                    elif self.selected_algorithm == "NTFS":
-                        self.mft[file_name] = {
-                            'size': blocks,
-                            'blocks': blocks,
-                            'path': file_path
-                        }
-
-                    messagebox.showinfo("Archivo Creado", f"Archivo '{file_name}' creado exitosamente con {blocks} bloques.\nRango de Bloques: {start_block}-{end_block}")
-                    self.update_progress_bar()
-                    self.save_data()  # Guardar los cambios
-                except Exception as e:
-                    messagebox.showerror("Error", f"No se pudo crear el archivo: {str(e)}")
-            else:
-                messagebox.showwarning("Error de Espacio", "No hay suficiente espacio disponible para crear el archivo.")
+            self._run_operation(lambda task: self.engine.create_file(file_name, blocks, file_content), done,
+                                "No se pudo crear el archivo")
 
     def save_replace_file(self):
         file_name = simpledialog.askstring("Nombre del Archivo", "Introduce el nombre del archivo para guardar/reemplazar:")
         blocks = simpledialog.askinteger("Bloques Requeridos", "Introduce la cantidad de bloques que necesita el archivo:", minvalue=1)
 
         if file_name and blocks:
-            max_blocks = self.max_blocks_per_file.get(self.selected_algorithm, 0)
-            if blocks > max_blocks:
-                messagebox.showwarning("Exceso de Bloques", f"El archivo excede el número máximo de bloques permitidos para {self.selected_algorithm} ({max_blocks} bloques).")
-                return
-
-            file_path = os.path.join(self.current_directory, file_name)
-            existing_blocks = self.block_usage.get(file_name, 0)
-
-            # Verificar si hay suficiente espacio
-            if self.used_blocks - existing_blocks + blocks > self.disk_blocks:
-                messagebox.showwarning("Error de Espacio", "No hay suficiente espacio disponible para guardar/reemplazar el archivo.")
-                return
-
-            try:
-                with open(file_path, 'w') as file:
-                    file.write("Contenido del archivo")  # Puedes modificar esto para permitir al usuario ingresar contenido
-
-                # Actualizar bloques y registros
-                self.used_blocks = self.used_blocks - existing_blocks + blocks
-                start_block = self.next_available_block
-                end_block = self.next_available_block + blocks - 1
-                self.block_usage[file_name] = blocks
-                self.next_available_block += blocks
-
-                # Actualizar estructuras del sistema de archivos
-                if self.selected_algorithm == "FAT32":
-                    self.allocation_table[file_name] = {
-                        'blocks': blocks,
-                        'start_block': start_block,
-                        'end_block': end_block,
-                        'path': file_path
-                    }
-                elif self.selected_algorithm == "EXT":
-                    self.journal.append(f"Archivo guardado/reemplazado: {file_name}, Bloques: {blocks}, Path: {file_path}")
-                elif self.selected_algorithm == "NTFS":
-                    self.mft[file_name] = {
-                        'size': blocks,
-                        'blocks': blocks,
-                        'path': file_path
-                    }
-
-                messagebox.showinfo("Archivo Guardado", f"Archivo '{file_name}' guardado/reemplazado exitosamente con {blocks} bloques.\nRango de Bloques: {start_block}-{end_block}\nUbicación: {file_path}")
+            def done(result):
+                messagebox.showinfo("Archivo Guardado", f"Archivo '{file_name}' guardado/reemplazado exitosamente con {blocks} bloques.\nRango de Bloques: {result['start_block']}-{result['end_block']}\nUbicación: {result['path']}")
                 self.update_progress_bar()
-                self.save_data()  # Guardar los cambios
-            except Exception as e:
-                messagebox.showerror("Error", f"No se pudo guardar/reemplazar el archivo: {str(e)}")
+
+            self._run_operation(lambda task: self.engine.replace_file(file_name, blocks), done,
+                                "No se pudo guardar/reemplazar el archivo")
         else:
             messagebox.showwarning("Entrada Inválida", "Por favor, completa todos los campos.")
 
@@ -454,189 +430,75 @@ class FileSystemApp:
         new_directory = simpledialog.askstring("Nuevo Directorio", "Introduce la ruta del nuevo directorio:")
 
         if file_name and new_directory:
-            file_path = os.path.join(self.current_directory, file_name)
-            new_path = os.path.join(new_directory, file_name)
-
-            if not os.path.exists(file_path):
-                messagebox.showerror("Error", f"El archivo '{file_name}' no existe en el directorio actual.")
-                return
-
-            try:
-                shutil.move(file_path, new_path)
-
-                # Actualizar la ruta en las estructuras internas del sistema de archivos
-                if self.selected_algorithm == "FAT32":
-                    if file_name in self.allocation_table:
-                        self.allocation_table[file_name]['path'] = new_path
-                elif self.selected_algorithm == "NTFS":
-                    if file_name in self.mft:
-                        self.mft[file_name]['path'] = new_path
-                elif self.selected_algorithm == "EXT":
-                    self.journal = [entry.replace(file_path, new_path) if file_name in entry else entry for entry in self.journal]
-
+            # Ventana de progreso: entre dispositivos el archivo se copia por trozos y se puede cancelar
+            progress_window = tk.Toplevel(self.root)
+            progress_window.title("Moviendo Archivo")
+            progress_label = tk.Label(progress_window, text=f"Moviendo '{file_name}'...")
+            progress_label.pack(padx=20, pady=(15, 5))
+            progress = ttk.Progressbar(progress_window, length=300, maximum=1)
+            progress.pack(padx=20, pady=5)
+            btn_cancel = tk.Button(progress_window, text="Cancelar", width=12)
+            btn_cancel.pack(pady=(5, 15))
+
+            def report(done, total):
+                progress.config(maximum=max(total, 1), value=done)
+                progress_label.config(text=f"Moviendo '{file_name}': {done} de {total} bytes")
+
+            def done(new_path):
                 messagebox.showinfo("Archivo Movido", f"Archivo '{file_name}' movido exitosamente a: {new_path}")
-                self.save_data()  # Guardar los cambios
-            except Exception as e:
-                messagebox.showerror("Error", f"No se pudo mover el archivo: {str(e)}")
+
+            task = self._run_operation(
+                lambda task: self.engine.move_file(file_name, new_directory, progress=task.report, cancel=task.cancelled),
+                done, "No se pudo mover el archivo", on_progress=report, cleanup=progress_window.destroy)
+            btn_cancel.config(command=task.cancel)
+            progress_window.protocol("WM_DELETE_WINDOW", task.cancel)
 
     def delete_file(self):
         file_name = simpledialog.askstring("Nombre del Archivo", "Introduce el nombre del archivo a eliminar:")
 
         if file_name:
-            file_path = os.path.join(self.current_directory, file_name)
-            if not os.path.exists(file_path):
-                messagebox.showerror("Error", f"El archivo '{file_name}' no existe en el directorio actual.")
-                return
-
-            try:
-                os.remove(file_path)
-
-                # Actualizar uso de bloques y estructuras internas
-                if file_name in self.block_usage:
-                    self.used_blocks -= self.block_usage[file_name]
-                    del self.block_usage[file_name]
-
-                if self.selected_algorithm == "FAT32":
-                    if file_name in self.allocation_table:
-                        del self.allocation_table[file_name]
-                elif self.selected_algorithm == "NTFS":
-                    if file_name in self.mft:
-                        del self.mft[file_name]
-                elif self.selected_algorithm == "EXT":
-                    self.journal = [entry for entry in self.journal if file_name not in entry]
-
+            def done(result):
                 messagebox.showinfo("Archivo Eliminado", f"Archivo '{file_name}' eliminado exitosamente.")
                 self.update_progress_bar()
-                self.save_data()  # Guardar los cambios
-            except Exception as e:
-                messagebox.showerror("Error", f"No se pudo eliminar el archivo: {str(e)}")
+
+            self._run_operation(lambda task: self.engine.delete_file(file_name), done,
+                                "No se pudo eliminar el archivo")
 
     def create_folder(self):
         folder_name = simpledialog.askstring("Nombre de la Carpeta", "Introduce el nombre de la carpeta:")
-        
-        if folder_name:
-            # Validar el nombre de la carpeta (opcional)
-            if any(char in folder_name for char in r'<>:"/\|?*'):
-                messagebox.showerror("Nombre Inválido", "El nombre de la carpeta contiene caracteres inválidos.")
-                return
 
-            folder_path = os.path.join(self.current_directory, folder_name)
-            
-            if os.path.exists(folder_path):
-                messagebox.showwarning("Carpeta Existente", f"La carpeta '{folder_name}' ya existe en el directorio actual.")
-                return
-            
-            try:
-                os.mkdir(folder_path)
-                messagebox.showinfo("Carpeta Creada", f"Carpeta '{folder_name}' creada exitosamente en '{self.current_directory}'.")
-                
-            except Exception as e:
-                messagebox.showerror("Error", f"No se pudo crear la carpeta: {str(e)}")
-        else:
-            messagebox.showwarning("Entrada Inválida", "El nombre de la carpeta no puede estar vacío.")
+        def done(folder_path):
+            messagebox.showinfo("Carpeta Creada", f"Carpeta '{folder_name}' creada exitosamente en '{self.engine.current_directory}'.")
 
-    def on_closing(self):
-        self.save_data()
-        self.root.destroy()
+        self._run_operation(lambda task: self.engine.create_folder(folder_name), done,
+                            "No se pudo crear la carpeta")
 
-    def save_data(self):
-        # Guardar los datos de la sesión actual en un archivo JSON
-        data = {
-            'allocation_table': self.allocation_table,
-            'journal': self.journal,
-            'mft': self.mft,
-            'disk_blocks': self.disk_blocks,
-            'used_blocks': self.used_blocks,
-            'block_usage': self.block_usage,
-            'reserved_blocks': self.reserved_blocks,
-            'selected_algorithm': self.selected_algorithm,
-            'next_available_block': self.next_available_block  # Añadido
-        }
-        with open('filesystem_data.json', 'w') as f:
-            json.dump(data, f, indent=4)
-
-    def load_data(self):
-        # Cargar los datos de la sesión anterior desde un archivo JSON
-        if os.path.exists('filesystem_data.json'):
-            with open('filesystem_data.json', 'r') as f:
-                data = json.load(f)
-                self.allocation_table = data.get('allocation_table', {})
-                self.journal = data.get('journal', [])
-                self.mft = data.get('mft', {})
-                self.disk_blocks = data.get('disk_blocks', 1000)
-                self.used_blocks = data.get('used_blocks', 0)
-                self.block_usage = data.get('block_usage', {})
-                self.reserved_blocks = data.get('reserved_blocks', 0)
-                self.selected_algorithm = data.get('selected_algorithm', "")
-                self.next_available_block = data.get('next_available_block', 1)  # Añadido
-                
-                # Recalcular bloques reservados si se ha seleccionado un algoritmo
-                if self.selected_algorithm:
-                    self.calculate_reserved_blocks()
-        else:
-            # Inicializar datos por defecto si el archivo no existe
-            self.allocation_table = {}
-            self.journal = []
-            self.mft = {}
-            self.disk_blocks = 1000
-            self.used_blocks = 0
-            self.block_usage = {}
-            self.reserved_blocks = 0
-            self.selected_algorithm = ""
-            self.next_available_block = 1  # Añadido
-
-        # **Eliminar la llamada a update_progress_bar aquí**
-        # self.update_progress_bar()
+    def move_folder(self):
+        folder_name = simpledialog.askstring("Nombre de la Carpeta", "Introduce el nombre de la carpeta a mover/renombrar:")
+        new_directory = simpledialog.askstring("Nuevo Directorio", "Introduce la ruta del directorio destino:",
+                                               initialvalue=self.engine.current_directory)
+        new_name = simpledialog.askstring("Nuevo Nombre", "Introduce el nuevo nombre (vacío para conservarlo):")
 
-    def update_progress_bar(self):
-        # Verificar si progress_frame existe
-        if not hasattr(self, 'progress_frame'):
-            return  # Salir si progress_frame no está creado
+        if folder_name and new_directory:
+            def done(new_path):
+                messagebox.showinfo("Carpeta Movida", f"Carpeta '{folder_name}' movida exitosamente a: {new_path}")
+                self.update_progress_bar()
 
-        for widget in self.progress_frame.winfo_children():
-            widget.destroy()
+            self._run_operation(lambda task: self.engine.move_folder(folder_name, new_directory, new_name=new_name or None),
+                                done, "No se pudo mover la carpeta")
+        else:
+            messagebox.showwarning("Entrada Inválida", "Por favor, completa todos los campos.")
 
-        total_width = 800
-        used_width = int((self.used_blocks / self.disk_blocks) * total_width)
-
-        # Mostrar los bloques reservados por el sistema de archivos
-        reserved_width = int((self.reserved_blocks / self.disk_blocks) * total_width)
-        reserved_label = tk.Label(
-            self.progress_frame,
-            text=f"Reservado ({self.reserved_blocks} bloques)",
-            bg="blue",
-            fg="white",
-            width=reserved_width // 10,  # Ajustar el ancho para visualización
-            anchor="w"
-        )
-        reserved_label.pack(side=tk.LEFT, padx=(0, 1))
-
-        # Mostrar los bloques usados por archivos
-        if used_width - reserved_width > 0:
-            usage_label = tk.Label(
-                self.progress_frame,
-                text=f"Usado ({self.used_blocks - self.reserved_blocks} bloques)",
-                bg="red",
-                fg="white",
-                width=(used_width - reserved_width) // 10,  # Ajustar el ancho para visualización
-                anchor="w"
-            )
-            usage_label.pack(side=tk.LEFT, padx=(0, 1))
-
-        # Mostrar el espacio libre restante
-        free_width = total_width - used_width
-        if free_width > 0:
-            free_label = tk.Label(
-                self.progress_frame,
-                text=f"Libre ({self.disk_blocks - self.used_blocks} bloques)",
-                bg="green",
-                fg="white",
-                width=free_width // 10,
-                anchor="w"
-            )
-            free_label.pack(side=tk.LEFT)
+    def on_closing(self):
+        self.executor.shutdown()  # Terminar las operaciones pendientes antes del checkpoint final
+        self.engine.close()
+        self.root.destroy()
 
 if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        # Con argumentos se ejecuta un script de comandos sin interfaz gráfica (ver cli.py)
+        import cli
+        sys.exit(cli.main())
     root = tk.Tk()
     app = FileSystemApp(root)
     root.geometry("600x500")
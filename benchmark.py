@@ -0,0 +1,503 @@
+import sys
+import json
+import time
+import random
+import string
+import argparse
+import tracemalloc
+
+from cache import POLICIES
+from defrag import Defragmenter
+from engine import ALGORITHMS, FileSystemEngine, FileSystemError, InvalidInputError
+from iosched import DEVICES, SCHEDULERS, IOTrace, simulate
+
+# Formato de traza: una operación por línea en JSON, con la misma forma que acepta engine.execute(), por ejemplo
+#   ["create", "f1.txt", 10]
+#   ["replace", "f1.txt", 12]
+#   ["move", "f1.txt", "/docs", "/"]
+#   ["delete", "f1.txt"]
+#   ["mkdir", "docs"]
+#   ["read", "f1.txt", "/"]
+
+WORKLOADS = ["uniform", "zipf", "churn", "append", "read", "dedup"]
+MAX_ERROR_LINES = 100  # Operaciones fallidas que se detallan en el reporte (el resto solo se cuenta en 'errors')
+
+# Modos de almacenamiento que se comparan con --storage-modes (opciones del motor); "plain" es la referencia
+STORAGE_MODES = {
+    "plain": {},
+    "dedup": {'dedup': True},
+    "zlib": {'compression': "zlib"},
+    "lzma": {'compression': "lzma"},
+    "dedup+zlib": {'dedup': True, 'compression': "zlib"},
+    "dedup+lzma": {'dedup': True, 'compression': "lzma"},
+}
+
+
+# Errores de una operación de la traza que no cortan la reproducción: los del motor, los de E/S y los de argumentos
+# que no corresponden a la operación (TypeError/ValueError), como en engine.execute_batch y en la CLI
+OPERATION_ERRORS = (FileSystemError, OSError, TypeError, ValueError)
+
+
+def read_trace(path):
+    """Lee una traza (una operación JSON por línea, se ignoran las líneas vacías). Una línea que no es JSON válido
+    se entrega como InvalidInputError: replay la cuenta como fallida en su lugar y sigue con las demás"""
+    with open(path, 'r', encoding='utf-8') as f:
+        for number, line in enumerate(f, 1):
+            line = line.strip()
+            if line:
+                try:
+                    yield json.loads(line)
+                except ValueError as e:
+                    yield InvalidInputError(f"Línea {number}: JSON inválido ({e})")
+
+
+def write_trace(path, operations):
+    """Guarda las operaciones en formato de traza; devuelve cuántas se escribieron"""
+    count = 0
+    with open(path, 'w', encoding='utf-8') as f:
+        for operation in operations:
+            if isinstance(operation, Exception):
+                continue  # Línea inválida de una traza leída
+            # Lo que no es una tupla se copia tal cual (las líneas JSON que no son operaciones válidas también)
+            operation = list(operation) if isinstance(operation, tuple) else operation
+            f.write(json.dumps(operation, separators=(',', ':'), ensure_ascii=False) + '\n')
+            count += 1
+    return count
+
+
+class _LiveFiles:
+    # Conjunto de archivos vivos con elección aleatoria y borrado en O(1)
+    def __init__(self, rng):
+        self.rng = rng
+        self.names = []
+        self.positions = {}
+        self.directories = {}
+        self.counter = 0
+
+    def __len__(self):
+        return len(self.names)
+
+    def new_name(self):
+        self.counter += 1
+        return f"f{self.counter}.dat"
+
+    def add(self, name, directory="/"):
+        self.positions[name] = len(self.names)
+        self.names.append(name)
+        self.directories[name] = directory
+
+    def pick(self):
+        return self.rng.choice(self.names)
+
+    def pick_hot(self, skew=3):
+        # Elección sesgada hacia los archivos más antiguos (un conjunto de trabajo "caliente")
+        return self.names[int(len(self.names) * self.rng.random() ** skew)]
+
+    def remove(self, name):
+        i = self.positions.pop(name)
+        last = self.names.pop()
+        if last != name:
+            self.names[i] = last
+            self.positions[last] = i
+        return self.directories.pop(name)
+
+
+def _zipf_sizes(rng, max_blocks, s=1.2):
+    # Tamaños con distribución de Zipf: muchos archivos pequeños y pocos grandes
+    weights = [1 / (k ** s) for k in range(1, max_blocks + 1)]
+    cumulative = []
+    total = 0
+    for w in weights:
+        total += w
+        cumulative.append(total)
+    population = range(1, max_blocks + 1)
+    while True:
+        yield from rng.choices(population, cum_weights=cumulative, k=1024)
+
+
+def _uniform_sizes(rng, max_blocks):
+    while True:
+        yield rng.randint(1, max_blocks)
+
+
+def _file_contents(rng, cluster_size=4096, templates=64, pool=256, max_clusters=8):
+    # Contenidos armados con clusters de una colección de plantillas (texto repetitivo y texto aleatorio):
+    # muchos archivos comparten clusters enteros, como copias y versiones de un mismo documento.
+    # Se elige de un conjunto fijo de contenidos para que la traza no ocupe memoria por operación
+    words = ["bloque", "archivo", "disco", "cluster", "registro", "inodo", "tabla", "datos"]
+    clusters = []
+    for i in range(templates):
+        if i % 2:
+            text = ''.join(rng.choice(string.ascii_letters) for _ in range(cluster_size))
+        else:
+            text = ' '.join(rng.choice(words) for _ in range(cluster_size // 4))
+        clusters.append(text[:cluster_size].ljust(cluster_size))
+    contents = [''.join(rng.choice(clusters) for _ in range(rng.randint(1, max_clusters))) for _ in range(pool)]
+    while True:
+        yield rng.choice(contents)
+
+
+def _mixed(rng, operations, sizes, mix, directories=8, contents=None):
+    # Mezcla de operaciones con las proporciones de 'mix' sobre un conjunto de archivos vivos;
+    # 'contents' genera el contenido de cada archivo (sin él, los archivos quedan vacíos)
+    live = _LiveFiles(rng)
+    folders = ["/"] + [f"/d{i}" for i in range(directories)]
+    kinds = list(mix)
+    weights = [mix[k] for k in kinds]
+    for _ in range(operations):
+        kind = rng.choices(kinds, weights)[0] if live else "create"
+        if kind == "create":
+            name = live.new_name()
+            directory = rng.choice(folders)
+            live.add(name, directory)
+            yield ["create", name, *_sized(sizes, contents), directory]
+        elif kind == "replace":
+            name = live.pick()
+            yield ["replace", name, *_sized(sizes, contents), live.directories[name]]
+        elif kind == "move":
+            name = live.pick()
+            target = rng.choice(folders)
+            source = live.remove(name)
+            live.add(name, target)
+            yield ["move", name, target, source]
+        elif kind == "delete":
+            name = live.pick()
+            yield ["delete", name, live.remove(name)]
+        elif kind == "mkdir":
+            folders.append(f"/d{len(folders)}")
+            yield ["mkdir", folders[-1][1:], "/"]
+        elif kind == "read":
+            name = live.pick_hot()
+            yield ["read", name, live.directories[name]]
+        elif kind == "scan":
+            # Lectura de un archivo cualquiera: rompe la localidad (una LRU pierde el conjunto caliente)
+            name = live.pick()
+            yield ["read", name, live.directories[name]]
+
+
+def _sized(sizes, contents, cluster_size=4096):
+    # (bloques, contenido) de un archivo: los bloques alcanzan siempre para el contenido
+    if contents is None:
+        return next(sizes), ""
+    content = next(contents)
+    return max(next(sizes), -(-len(content) // cluster_size)), content
+
+
+def uniform(operations, max_blocks=200, seed=0):
+    """Carga general: tamaños uniformes y mezcla de todas las operaciones"""
+    rng = random.Random(seed)
+    mix = {"create": 45, "replace": 15, "move": 10, "delete": 25, "mkdir": 5}
+    return _mixed(rng, operations, _uniform_sizes(rng, max_blocks), mix)
+
+
+def zipf(operations, max_blocks=200, seed=0):
+    """Como uniform, pero con tamaños de archivo según una distribución de Zipf"""
+    rng = random.Random(seed)
+    mix = {"create": 45, "replace": 15, "move": 10, "delete": 25, "mkdir": 5}
+    return _mixed(rng, operations, _zipf_sizes(rng, max_blocks), mix)
+
+
+def churn(operations, max_blocks=200, seed=0):
+    """Altas y bajas continuas: fragmenta el espacio libre"""
+    rng = random.Random(seed)
+    mix = {"create": 50, "delete": 48, "replace": 2}
+    return _mixed(rng, operations, _zipf_sizes(rng, max_blocks), mix)
+
+
+def append(operations, max_blocks=200, seed=0, files=64):
+    """Archivos que crecen poco a poco (cada 'append' es un replace con más bloques)"""
+    rng = random.Random(seed)
+    sizes = {}
+    emitted = 0
+    while emitted < operations:
+        name = f"log{rng.randrange(files)}.dat"
+        blocks = sizes.get(name)
+        if blocks is None:
+            sizes[name] = blocks = rng.randint(1, 4)
+            yield ["create", name, blocks, "", "/"]
+        elif blocks >= max_blocks:
+            # El archivo llegó al máximo: se rota (se borra y empieza de nuevo)
+            del sizes[name]
+            yield ["delete", name, "/"]
+        else:
+            sizes[name] = min(blocks + rng.randint(1, 4), max_blocks)
+            yield ["replace", name, sizes[name], "", "/"]
+        emitted += 1
+
+
+def read(operations, max_blocks=200, seed=0):
+    """Mayoría de lecturas sobre un conjunto caliente, con lecturas dispersas y algunas altas y bajas (para la caché)"""
+    rng = random.Random(seed)
+    mix = {"create": 12, "read": 60, "scan": 15, "replace": 5, "delete": 8}
+    return _mixed(rng, operations, _zipf_sizes(rng, max_blocks), mix)
+
+
+def dedup(operations, max_blocks=200, seed=0):
+    """Como uniform, pero con contenido: los archivos repiten clusters de unas pocas plantillas (para comparar
+    la deduplicación y la compresión con el camino normal, ver --storage-modes)"""
+    rng = random.Random(seed)
+    mix = {"create": 45, "replace": 15, "move": 10, "delete": 25, "mkdir": 5}
+    return _mixed(rng, operations, _zipf_sizes(rng, max_blocks), mix, contents=_file_contents(rng))
+
+
+GENERATORS = {"uniform": uniform, "zipf": zipf, "churn": churn, "append": append, "read": read, "dedup": dedup}
+
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))]
+
+
+def _new_engine(algorithm, disk_blocks, policy, options=None):
+    # Motor solo en memoria: sin archivos reales, sin log y sin JSON
+    engine = FileSystemEngine(data_file=None, host_io=False, load=False, wal=False,
+                              allocation_policy=policy, disk_blocks=disk_blocks, **(options or {}))
+    engine.apply_algorithm(algorithm)
+    return engine
+
+
+def _rounded(values):
+    return {k: round(v, 6) if isinstance(v, float) else v for k, v in values.items()}
+
+
+def _simulate_io(trace, engine, devices, schedulers, arrival_rate=None):
+    # Los pedidos que registró el motor, atendidos por cada combinación de dispositivo y planificador
+    io = {}
+    for device in devices:
+        io[device] = {}
+        for scheduler in schedulers:
+            model = DEVICES[device](engine.disk_blocks, engine.cluster_size)
+            result = simulate(trace.requests, model, SCHEDULERS[scheduler](), arrival_rate)
+            del result['device'], result['scheduler']
+            io[device][scheduler] = result
+    return io
+
+
+def replay(operations, algorithm, disk_blocks=100000, policy="first", measure_memory=True, defrag=False, engine_options=None,
+           metrics=False, io_devices=(), io_schedulers=("fifo",), arrival_rate=None):
+    """Reproduce una traza sobre un formato y devuelve sus métricas ('engine_options' se pasa al constructor del motor).
+    Con 'io_devices' se registran los pedidos al disco y se simulan con cada dispositivo y planificador"""
+    operations = list(operations)
+    trace = IOTrace() if io_devices else None
+    engine = _new_engine(algorithm, disk_blocks, policy, dict(engine_options or {}, io_trace=trace))
+    if metrics:
+        engine.enable_metrics()
+    latencies = {}
+    errors = {}
+    error_lines = []  # Operaciones fallidas: posición en la traza, tipo de error y mensaje (hasta MAX_ERROR_LINES)
+    ok = failed = 0
+    clock = time.perf_counter_ns
+    execute = engine.execute
+    next_operation = trace.next_operation if trace is not None else None
+
+    started = clock()
+    for position, operation in enumerate(operations, 1):
+        if next_operation is not None:
+            next_operation()
+        before = clock()
+        try:
+            if isinstance(operation, Exception):
+                raise operation
+            execute(operation)
+        except OPERATION_ERRORS as e:
+            failed += 1
+            kind = type(e).__name__
+            errors[kind] = errors.get(kind, 0) + 1
+            if len(error_lines) < MAX_ERROR_LINES:
+                error_lines.append({'operation': position, 'error': kind, 'message': str(e)})
+        else:
+            ok += 1
+        if isinstance(operation, (list, tuple)) and operation and isinstance(operation[0], str):
+            latencies.setdefault(operation[0], []).append(clock() - before)
+    elapsed = (clock() - started) / 1e9
+
+    latency = {}
+    for op, values in sorted(latencies.items()):
+        values.sort()
+        latency[op] = {
+            'count': len(values),
+            'p50_us': round(_percentile(values, 0.50) / 1000, 3),
+            'p99_us': round(_percentile(values, 0.99) / 1000, 3),
+        }
+
+    result = {
+        'operations': len(operations),
+        'ok': ok,
+        'failed': failed,
+        'errors': errors,
+        'error_lines': error_lines,
+        'elapsed_s': round(elapsed, 6),
+        'ops_per_sec': round(len(operations) / elapsed, 1) if elapsed else 0.0,
+        'latency': latency,
+        'fragmentation': _rounded(engine.fragmentation()),
+        'blocks': {
+            'total': engine.disk_blocks,
+            'reserved': engine.reserved_blocks,
+            'used': engine.used_blocks - engine.reserved_blocks,
+            'logical': engine.logical_used_blocks - engine.reserved_blocks,
+            'free': engine.disk_blocks - engine.used_blocks,
+        },
+    }
+    if engine.block_store is not None or engine.compression is not None:
+        result['storage'] = _rounded(engine.storage_usage())
+    if engine.cache is not None:
+        result['cache'] = engine.cache.stats()
+    if metrics:
+        # Contadores internos del motor (sin los buckets del histograma, que ya resume 'latency')
+        snapshot = engine.disable_metrics()
+        for entry in snapshot['operations'].values():
+            del entry['buckets']
+        result['engine_metrics'] = snapshot
+    if trace is not None:
+        # Lo que haga el desfragmentador no forma parte de la carga
+        engine.io_trace = None
+        if engine.cache is not None:
+            engine.cache.device = None
+        result['io'] = _simulate_io(trace, engine, io_devices, io_schedulers, arrival_rate)
+
+    if defrag:
+        # Desfragmentar el disco que dejó la traza: cuánto mejora y cuántos bloques hubo que mover
+        defragmenter = Defragmenter(engine)
+        started = clock()
+        report = defragmenter.run_all()
+        result['defrag'] = {
+            'elapsed_s': round((clock() - started) / 1e9, 6),
+            'moves': report['moves'],
+            'blocks_moved': report['blocks_moved'],
+            'after': _rounded(report['after']),
+        }
+
+    if measure_memory:
+        # Segunda pasada con tracemalloc: medir memoria en la pasada de tiempos la haría mucho más lenta
+        tracemalloc.start()
+        engine = _new_engine(algorithm, disk_blocks, policy, engine_options)
+        for operation in operations:
+            try:
+                if isinstance(operation, Exception):
+                    raise operation
+                engine.execute(operation)
+            except OPERATION_ERRORS:
+                pass
+        result['peak_memory_bytes'] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return result
+
+
+def compare_storage(operations, algorithm, disk_blocks=100000, policy="first", modes=STORAGE_MODES, engine_options=None):
+    """Reproduce la traza con cada modo de almacenamiento; devuelve por modo el rendimiento, su costo frente al
+    camino normal ("plain", que siempre se mide) y el uso lógico y físico del disco"""
+    operations = list(operations)
+    results = {}
+    for mode in ["plain"] + [mode for mode in modes if mode != "plain"]:
+        options = dict(engine_options or {}, **STORAGE_MODES[mode])
+        result = replay(operations, algorithm, disk_blocks, policy, False, engine_options=options)
+        summary = {
+            'ops_per_sec': result['ops_per_sec'],
+            'elapsed_s': result['elapsed_s'],
+            'failed': result['failed'],
+            'logical_blocks': result['blocks']['logical'],
+            'physical_blocks': result['blocks']['used'],
+        }
+        storage = result.get('storage')
+        if storage is not None:
+            summary['ratio'] = storage['ratio']
+            summary['compressed_files'] = storage['compressed_files']
+            if 'block_store' in storage:
+                summary['shared_blocks'] = storage['block_store']['shared_blocks']
+                summary['dedup_hits'] = storage['block_store']['hits']
+        results[mode] = summary
+    base = results["plain"]['elapsed_s']
+    for summary in results.values():
+        # Tiempo extra frente al camino normal (negativo si resultó más rápido)
+        summary['overhead_pct'] = round((summary['elapsed_s'] / base - 1) * 100, 2) if base else 0.0
+    return results
+
+
+def run(operations, algorithms=None, disk_blocks=100000, policy="first", measure_memory=True, defrag=False, metrics=False,
+        cache_blocks=0, cache_policies=("lru",), read_ahead=8, free_space_map="auto", io_devices=(),
+        io_schedulers=("fifo",), arrival_rate=None, storage_modes=(), **info):
+    """Compara los formatos con la misma traza; devuelve el reporte completo"""
+    operations = list(operations)
+    report = dict(info, disk_blocks=disk_blocks, policy=policy, operations=len(operations), formats={})
+    base_options = {'free_space_map': free_space_map}
+    io = {'io_devices': io_devices, 'io_schedulers': io_schedulers, 'arrival_rate': arrival_rate}
+    if cache_blocks:
+        report.update(cache_blocks=cache_blocks, read_ahead=read_ahead)
+    if io_devices:
+        report['arrival_rate'] = arrival_rate
+    for algorithm in algorithms or ALGORITHMS:
+        if not cache_blocks:
+            result = replay(operations, algorithm, disk_blocks, policy, measure_memory, defrag, base_options, metrics, **io)
+        else:
+            # Una pasada por política de caché; la primera da además el resto de las métricas del formato
+            caches = {}
+            for i, cache_policy in enumerate(cache_policies):
+                options = dict(base_options, cache_blocks=cache_blocks, cache_policy=cache_policy, read_ahead=read_ahead)
+                if i == 0:
+                    result = replay(operations, algorithm, disk_blocks, policy, measure_memory, defrag, options, metrics, **io)
+                    caches[cache_policy] = result.pop('cache')
+                else:
+                    caches[cache_policy] = replay(operations, algorithm, disk_blocks, policy, False,
+                                                  engine_options=options)['cache']
+            result['cache'] = caches
+        if storage_modes:
+            result['storage_modes'] = compare_storage(operations, algorithm, disk_blocks, policy, storage_modes, base_options)
+        report['formats'][algorithm] = result
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Reproduce cargas de trabajo sobre FAT32, NTFS y EXT y reporta métricas en JSON")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--workload", choices=WORKLOADS, default="uniform", help="Generador sintético de operaciones")
+    source.add_argument("--trace", help="Archivo de traza a reproducir (una operación JSON por línea)")
+    parser.add_argument("--ops", type=int, default=10000, help="Operaciones a generar")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-blocks", type=int, default=200, help="Bloques máximos por archivo en las cargas sintéticas")
+    parser.add_argument("--disk-blocks", type=int, default=100000)
+    parser.add_argument("--policy", choices=["first", "next", "best"], default="first")
+    parser.add_argument("--formats", nargs="+", choices=ALGORITHMS, default=ALGORITHMS)
+    parser.add_argument("--no-memory", action="store_true", help="No medir el pico de memoria (evita la segunda pasada)")
+    parser.add_argument("--defrag", action="store_true", help="Desfragmentar al final y reportar la mejora")
+    parser.add_argument("--metrics", action="store_true", help="Activar las métricas del motor e incluirlas en el reporte")
+    parser.add_argument("--free-space-map", choices=["auto", "bitmap", "extents"], default="auto",
+                        help="Representación del espacio libre (auto = árbol de runs en discos grandes)")
+    parser.add_argument("--cache-blocks", type=int, default=0, help="Bloques de la caché simulada (0 = sin caché)")
+    parser.add_argument("--cache-policies", nargs="+", choices=sorted(POLICIES), default=["lru"],
+                        help="Políticas de reemplazo a comparar (una pasada por política)")
+    parser.add_argument("--read-ahead", type=int, default=8, help="Bloques contiguos que se leen por adelantado en cada fallo")
+    parser.add_argument("--devices", nargs="+", choices=sorted(DEVICES), default=[],
+                        help="Simular los pedidos al disco con estos dispositivos (hdd, ssd)")
+    parser.add_argument("--schedulers", nargs="+", choices=sorted(SCHEDULERS), default=["fifo", "scan", "deadline"],
+                        help="Planificadores de E/S a comparar en cada dispositivo")
+    parser.add_argument("--arrival-rate", type=float,
+                        help="Operaciones por segundo que llegan al disco (por defecto todas encoladas a la vez)")
+    parser.add_argument("--storage-modes", nargs="+", choices=list(STORAGE_MODES), default=[],
+                        help="Comparar la traza con deduplicación y compresión frente al camino normal (--workload dedup)")
+    parser.add_argument("--save-trace", help="Guardar la traza generada en este archivo")
+    parser.add_argument("--output", help="Archivo del reporte JSON (por defecto, la salida estándar)")
+    args = parser.parse_args(argv)
+
+    if args.trace:
+        operations = list(read_trace(args.trace))
+        info = {'trace': args.trace}
+    else:
+        operations = list(GENERATORS[args.workload](args.ops, args.max_blocks, args.seed))
+        info = {'workload': args.workload, 'seed': args.seed, 'max_blocks': args.max_blocks}
+    if args.save_trace:
+        write_trace(args.save_trace, operations)
+
+    report = run(operations, args.formats, args.disk_blocks, args.policy, not args.no_memory, args.defrag,
+                 args.metrics, args.cache_blocks, args.cache_policies, args.read_ahead,
+                 args.free_space_map, args.devices, args.schedulers, args.arrival_rate, args.storage_modes, **info)
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
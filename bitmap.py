@@ -0,0 +1,301 @@
+import re
+from functools import lru_cache
+
+# Políticas de asignación soportadas
+POLICIES = ("first", "next", "best")
+
+
+def _byte_tables():
+    # Para cada valor de byte precalculamos sus bloques libres (bits en 0):
+    # cuántos hay al inicio (bit 0 hacia arriba), al final (bit 7 hacia abajo)
+    # y los runs interiores que no tocan ninguno de los dos extremos
+    lead, trail, inner = [], [], []
+    for value in range(256):
+        bits = [(value >> i) & 1 for i in range(8)]
+        n = 0
+        while n < 8 and not bits[n]:
+            n += 1
+        lead.append(n)
+        n = 0
+        while n < 8 and not bits[7 - n]:
+            n += 1
+        trail.append(n)
+
+        runs = []
+        i = lead[-1]
+        while i < 8 - trail[-1]:
+            if bits[i]:
+                i += 1
+                continue
+            j = i
+            while not bits[j]:
+                j += 1
+            runs.append((i, j - i))
+            i = j
+        inner.append(tuple(runs))
+    return lead, trail, inner
+
+
+_LEAD, _TRAIL, _INNER = _byte_tables()
+
+# Un tramo de bytes completamente libres (acotado para poder cortar la búsqueda a tiempo),
+# o un único byte parcialmente libre
+_SCAN = re.compile(rb'\x00{1,1024}|[^\xff]')
+# Primer byte con algún bloque libre
+_NOT_FULL = re.compile(rb'[^\xff]')
+
+
+@lru_cache(maxsize=64)
+def _zero_bytes(count):
+    # Patrón para 'count' bytes libres seguidos
+    return re.compile(rb'\x00{%d}' % count)
+
+
+class FreeSpaceMap:
+    """Base de los mapas de espacio libre: la asignación se apoya en find_run, count_used, iter_free_runs y mark_used"""
+
+    @property
+    def free_count(self):
+        return self.total_blocks - self.used_count
+
+    def allocate(self, count, policy="first", start=0, end=None):
+        """Reserva 'count' bloques contiguos; devuelve el bloque inicial o None si no hay un run suficiente"""
+        run_start = self.find_run(count, policy, start, end)
+        if run_start is None:
+            return None
+        self.mark_used(run_start, count)
+        self.cursor = run_start + count
+        return run_start
+
+    def allocate_extents(self, count, policy="first", start=0, end=None):
+        """Reserva 'count' bloques aunque estén repartidos en varios runs; devuelve [[inicio, longitud], ...] o None"""
+        end = self.total_blocks if end is None else min(end, self.total_blocks)
+        run_start = self.allocate(count, policy, start, end)
+        if run_start is not None:
+            return [[run_start, count]]
+        if (end - start) - self.count_used(start, end) < count:
+            return None
+
+        # No hay un run suficiente: tomar los huecos en orden (desde el cursor para next-fit)
+        extents, pending = [], count
+        origin = min(max(self.cursor, start), end) if policy == "next" else start
+        for lo, hi in ((origin, end), (start, origin)):
+            for run_start, length in self.iter_free_runs(lo, hi):
+                self.search_steps += 1
+                take = min(length, pending)
+                extents.append([run_start, take])
+                pending -= take
+                if not pending:
+                    break
+            if not pending:
+                break
+        if pending:
+            return None
+
+        for run_start, length in extents:
+            self.mark_used(run_start, length)
+        self.cursor = extents[-1][0] + extents[-1][1]
+        return extents
+
+    def largest_free_run(self, start=0, end=None):
+        """Devuelve (inicio, longitud) del mayor run libre, o (None, 0) si el disco está lleno"""
+        best = (None, 0)
+        for run in self.iter_free_runs(start, end):
+            if run[1] > best[1]:
+                best = run
+        return best
+
+
+class FreeSpaceBitmap(FreeSpaceMap):
+    """Mapa de bloques libres: un bit por bloque (1 = usado) guardado en un bytearray"""
+
+    def __init__(self, total_blocks):
+        self.total_blocks = total_blocks
+        self.bits = bytearray((total_blocks + 7) // 8)
+        self.used_count = 0
+        self.cursor = 0  # Posición desde donde continúa la política next-fit
+        self.full_prefix = 0  # Todos los bytes antes de este índice están completamente usados
+        self.search_steps = 0  # Saltos de la búsqueda y runs candidatos examinados (para las métricas)
+
+        # Los bits de relleno del último byte se marcan como usados sin contarlos
+        padding = len(self.bits) * 8 - total_blocks
+        if padding:
+            self.bits[-1] = (0xff << (8 - padding)) & 0xff
+
+    def copy(self):
+        """Copia independiente del mapa (para simular asignaciones sin tocar el disco)"""
+        clone = FreeSpaceBitmap.__new__(FreeSpaceBitmap)
+        clone.total_blocks = self.total_blocks
+        clone.bits = bytearray(self.bits)
+        clone.used_count = self.used_count
+        clone.cursor = self.cursor
+        clone.full_prefix = self.full_prefix
+        clone.search_steps = 0
+        return clone
+
+    def is_free(self, block):
+        return not (self.bits[block >> 3] >> (block & 7)) & 1
+
+    def count_used(self, start, end):
+        """Cuenta los bloques usados en el rango [start, end)"""
+        if start >= end:
+            return 0
+        first, last = start >> 3, (end - 1) >> 3
+        value = int.from_bytes(self.bits[first:last + 1], 'little')
+        value >>= start & 7
+        return (value & ((1 << (end - start)) - 1)).bit_count()
+
+    def _set_range(self, start, end, used):
+        bits = self.bits
+        first, last = start >> 3, end >> 3
+        if first == last:
+            mask = ((1 << (end - start)) - 1) << (start & 7)
+            bits[first] = bits[first] | mask if used else bits[first] & ~mask
+            return
+
+        if start & 7:
+            mask = (0xff << (start & 7)) & 0xff
+            bits[first] = bits[first] | mask if used else bits[first] & ~mask
+            first += 1
+        bits[first:last] = (b'\xff' if used else b'\x00') * (last - first)
+        if end & 7:
+            mask = (1 << (end & 7)) - 1
+            bits[last] = bits[last] | mask if used else bits[last] & ~mask
+
+    def mark_used(self, start, length):
+        """Marca un rango como usado (los bloques que ya lo estaban no se cuentan dos veces)"""
+        end = min(start + length, self.total_blocks)
+        if start >= end:
+            return
+        self.used_count += (end - start) - self.count_used(start, end)
+        self._set_range(start, end, True)
+
+    def free(self, start, length):
+        """Devuelve un rango al espacio libre"""
+        end = min(start + length, self.total_blocks)
+        if start >= end:
+            return
+        self.used_count -= self.count_used(start, end)
+        self._set_range(start, end, False)
+        self.full_prefix = min(self.full_prefix, start >> 3)
+
+    def _skip_full(self, start):
+        # Saltar el prefijo del disco que ya está lleno para no volver a recorrerlo
+        match = _NOT_FULL.search(self.bits, self.full_prefix)
+        self.full_prefix = match.start() if match else len(self.bits)
+        return max(start, self.full_prefix * 8)
+
+    def iter_free_runs(self, start=0, end=None):
+        """Recorre los runs libres maximales dentro de [start, end) como pares (inicio, longitud)"""
+        end = self.total_blocks if end is None else min(end, self.total_blocks)
+        return self._runs(self._skip_full(start), end)
+
+    def _runs(self, start, end, enough=None):
+        # Con 'enough' un run abierto se entrega en cuanto alcanza esa longitud (sin buscar su final)
+        if start >= end:
+            return
+        bits = self.bits
+        run_start = None
+        expected = None  # Byte donde debe continuar el run abierto
+
+        for match in _SCAN.finditer(bits, start >> 3, (end + 7) >> 3):
+            s, e = match.span()
+            if run_start is not None and s != expected:
+                yield from self._clip(run_start, expected * 8, start, end)
+                run_start = None
+
+            value = bits[s]
+            if value == 0:
+                if run_start is None:
+                    run_start = max(s * 8, start)
+                expected = e
+                if enough is not None and e * 8 - run_start >= enough:
+                    yield from self._clip(run_start, e * 8, start, end)
+                    run_start = None
+                continue
+
+            base = s * 8
+            lead = _LEAD[value]
+            if run_start is not None:
+                yield from self._clip(run_start, base + lead, start, end)
+                run_start = None
+            elif lead:
+                yield from self._clip(base, base + lead, start, end)
+            for offset, length in _INNER[value]:
+                yield from self._clip(base + offset, base + offset + length, start, end)
+            if _TRAIL[value]:
+                run_start = max(base + 8 - _TRAIL[value], start)
+                expected = e
+
+        if run_start is not None:
+            yield from self._clip(run_start, expected * 8, start, end)
+
+    @staticmethod
+    def _clip(run_start, run_end, start, end):
+        run_start, run_end = max(run_start, start), min(run_end, end)
+        if run_start < run_end:
+            yield run_start, run_end - run_start
+
+    def _fitting_runs(self, count, start, end, first):
+        # Runs de al menos 'count' bloques. Un run así contiene (count - 7) // 8 bytes libres
+        # seguidos, así que se salta en C (regex) hasta el siguiente lugar donde puede haber uno
+        # y solo se recorre bit a bit alrededor de esa posición
+        start = self._skip_full(start)
+        min_bytes = (count - 7) // 8
+        enough = count if first else None
+        if min_bytes < 1:
+            for run in self._runs(start, end, enough):
+                self.search_steps += 1
+                if run[1] >= count:
+                    yield run
+            return
+
+        pattern = _zero_bytes(min_bytes)
+        last_byte = (end + 7) >> 3
+        position = start
+        while position < end:
+            match = pattern.search(self.bits, position >> 3, last_byte)
+            self.search_steps += 1
+            if match is None:
+                return
+            zeros_end = match.end() * 8
+            for run_start, length in self._runs(max(position, match.start() * 8 - 8), end, enough):
+                self.search_steps += 1
+                position = run_start + length
+                if length >= count:
+                    yield run_start, length
+                if position >= zeros_end:
+                    break
+            else:
+                return
+
+    def find_run(self, count, policy="first", start=0, end=None):
+        """Busca un run libre de al menos 'count' bloques según la política; devuelve su inicio o None"""
+        end = self.total_blocks if end is None else min(end, self.total_blocks)
+        if count <= 0 or count > end - start:
+            return None
+
+        if policy == "first":
+            for run_start, _ in self._fitting_runs(count, start, end, True):
+                return run_start
+            return None
+
+        if policy == "next":
+            cursor = min(max(self.cursor, start), end)
+            for run_start, _ in self._fitting_runs(count, cursor, end, True):
+                return run_start
+            # Dar la vuelta al disco (incluye el run que pudo quedar cortado por el cursor)
+            for run_start, _ in self._fitting_runs(count, start, min(cursor + count, end), True):
+                return run_start
+            return None
+
+        if policy == "best":
+            best_start, best_length = None, None
+            for run_start, length in self._fitting_runs(count, start, end, False):
+                if length == count:
+                    return run_start
+                if best_length is None or length < best_length:
+                    best_start, best_length = run_start, length
+            return best_start
+
+        raise ValueError(f"Política de asignación desconocida: {policy}")
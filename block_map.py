@@ -0,0 +1,139 @@
+import zlib
+import tkinter as tk
+
+# Colores de cada estado de bloque
+RESERVED_COLOR = "#1f4e9c"
+FREE_COLOR = "#3c9d4e"
+FRAGMENTED_COLOR = "#f28c28"
+USED_COLOR = "#c0392b"  # Bloques usados cuyo archivo ya no se conoce (celda compartida)
+SHARED_COLOR = "#2e86c1"  # Bloques deduplicados que usan varios archivos
+# Tonos para distinguir los archivos contiguos (se elige uno por nombre de archivo)
+FILE_COLORS = ["#c0392b", "#8e44ad", "#d35400", "#a93226", "#6c3483", "#b03a2e", "#943126", "#7d3c98"]
+
+
+def file_color(file_name):
+    return FILE_COLORS[zlib.crc32(file_name.encode('utf-8')) % len(FILE_COLORS)]
+
+
+class BlockMap(tk.Frame):
+    """Mapa de bloques en un Canvas: cada celda resume uno o más bloques y solo se repintan las celdas modificadas"""
+
+    def __init__(self, parent, engine, columns=128, max_cells=4096, cell_size=6):
+        super().__init__(parent)
+        self.engine = engine
+        self.columns = columns
+        self.max_cells = max_cells
+        self.cell_size = cell_size
+        self.cells = []  # Ids de los rectángulos del Canvas
+        self.owners = []  # Último archivo escrito en cada celda (o None)
+        self.colors = []  # Color pintado en cada celda, para no repintar lo que no cambió
+        self.blocks_per_cell = 1
+        self.disk_blocks = 0
+
+        self.canvas = tk.Canvas(self, highlightthickness=0)
+        self.canvas.pack()
+        self.summary = tk.Label(self, anchor="w")
+        self.summary.pack(fill="x", pady=(5, 0))
+
+        # Leyenda de colores
+        legend = tk.Frame(self)
+        legend.pack(fill="x")
+        for text, color in (("Reservado", RESERVED_COLOR), ("Usado", USED_COLOR),
+                            ("Fragmentado", FRAGMENTED_COLOR), ("Compartido", SHARED_COLOR), ("Libre", FREE_COLOR)):
+            tk.Label(legend, bg=color, width=2).pack(side=tk.LEFT, padx=(5, 2))
+            tk.Label(legend, text=text).pack(side=tk.LEFT)
+
+        self.canvas.bind("<Motion>", self._show_cell)
+        self.refresh()
+
+    def _layout(self):
+        # Con discos grandes cada celda agrupa varios bloques (muestreo)
+        self.disk_blocks = self.engine.disk_blocks
+        self.blocks_per_cell = max(1, -(-self.disk_blocks // self.max_cells))
+        count = -(-self.disk_blocks // self.blocks_per_cell)
+        rows = -(-count // self.columns)
+        size = self.cell_size
+        self.canvas.delete("all")
+        self.canvas.config(width=self.columns * size, height=rows * size)
+        self.cells = [self.canvas.create_rectangle((i % self.columns) * size, (i // self.columns) * size,
+                                                   (i % self.columns + 1) * size, (i // self.columns + 1) * size,
+                                                   width=0, fill=FREE_COLOR)
+                      for i in range(count)]
+        self.owners = [None] * count
+        self.colors = [FREE_COLOR] * count
+
+    def refresh(self):
+        """Aplica los cambios del motor desde la última vez: solo las celdas de los rangos modificados"""
+        dirty = self.engine.take_dirty_regions()
+        if dirty is None or self.disk_blocks != self.engine.disk_blocks:
+            self._redraw_all()
+        else:
+            for start, length, file_name in dirty:
+                self._update_range(start, length, file_name)
+        self._update_summary()
+
+    def _redraw_all(self):
+        self._layout()
+        # Asignar a cada celda el último archivo con bloques en ella (una pasada por los rangos de archivos)
+        per_cell = self.blocks_per_cell
+        for file_name, extents in self.engine.file_extents.items():
+            for start, length in extents:
+                for cell in range(start // per_cell, (start + length - 1) // per_cell + 1):
+                    self.owners[cell] = file_name
+        for cell in range(len(self.cells)):
+            self._paint(cell)
+
+    def _update_range(self, start, length, file_name):
+        per_cell = self.blocks_per_cell
+        last = min(start + length - 1, self.disk_blocks - 1)
+        for cell in range(start // per_cell, last // per_cell + 1):
+            if file_name is not None:
+                self.owners[cell] = file_name
+            self._paint(cell)
+
+    def _cell_color(self, cell):
+        engine = self.engine
+        first = cell * self.blocks_per_cell
+        end = min(first + self.blocks_per_cell, self.disk_blocks)
+        if end <= engine.reserved_blocks:
+            return RESERVED_COLOR
+        if engine.free_space.count_used(max(first, engine.reserved_blocks), end) == 0:
+            return RESERVED_COLOR if first < engine.reserved_blocks else FREE_COLOR
+
+        owner = self.owners[cell]
+        extents = engine.file_extents.get(owner) if owner is not None else None
+        if not extents or not any(start < end and start + length > first for start, length in extents):
+            # El archivo anotado ya no tiene bloques aquí: la celda sigue usada por otro archivo
+            self.owners[cell] = None
+            return USED_COLOR
+        if engine.block_store is not None and engine.block_store.shared_in(first, end):
+            return SHARED_COLOR
+        return FRAGMENTED_COLOR if len(extents) > 1 else file_color(owner)
+
+    def _paint(self, cell):
+        color = self._cell_color(cell)
+        if color != self.colors[cell]:
+            self.colors[cell] = color
+            self.canvas.itemconfig(self.cells[cell], fill=color)
+
+    def _update_summary(self):
+        engine = self.engine
+        used = f"Usado: {engine.used_blocks - engine.reserved_blocks} bloques   "
+        if engine.block_store is not None or engine.compression is not None:
+            # Con deduplicación o compresión el uso físico es menor que el que piden los archivos
+            used = (f"Usado: {engine.used_blocks - engine.reserved_blocks} bloques físicos / "
+                    f"{engine.logical_used_blocks - engine.reserved_blocks} lógicos   ")
+        self.summary.config(text=f"Reservado: {engine.reserved_blocks} bloques   "
+                                 f"{used}"
+                                 f"Libre: {engine.disk_blocks - engine.used_blocks} bloques   "
+                                 f"({self.blocks_per_cell} bloque(s) por celda)")
+
+    def _show_cell(self, event):
+        # Al pasar el ratón se indica el rango de bloques y el archivo de la celda
+        cell = (event.y // self.cell_size) * self.columns + event.x // self.cell_size
+        if not 0 <= cell < len(self.cells) or event.x >= self.columns * self.cell_size:
+            return
+        first = cell * self.blocks_per_cell
+        last = min(first + self.blocks_per_cell, self.disk_blocks) - 1
+        owner = self.owners[cell] or ""
+        self.summary.config(text=f"Bloques {first}-{last}   {owner}")
@@ -0,0 +1,183 @@
+from bisect import bisect_left, bisect_right
+
+
+class _Leaf:
+    __slots__ = ("keys", "values", "next")
+
+    def __init__(self, keys=None, values=None):
+        self.keys = keys or []
+        self.values = values or []
+        self.next = None  # Hoja siguiente, para recorrer rangos en orden
+
+
+class _Node:
+    __slots__ = ("keys", "children")
+
+    def __init__(self, keys, children):
+        self.keys = keys
+        self.children = children
+
+
+class BTree:
+    """Árbol B+ ordenado por clave: búsqueda, inserción y borrado en O(log n), rangos en O(log n + k)"""
+
+    def __init__(self, order=64):
+        self.max_keys = order
+        self.min_keys = order // 2
+        self.root = _Leaf()
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
+
+    def _leaf_for(self, key):
+        node = self.root
+        while isinstance(node, _Node):
+            node = node.children[bisect_right(node.keys, key)]
+        return node
+
+    def get(self, key, default=None):
+        leaf = self._leaf_for(key)
+        i = bisect_left(leaf.keys, key)
+        if i < len(leaf.keys) and leaf.keys[i] == key:
+            return leaf.values[i]
+        return default
+
+    def insert(self, key, value):
+        """Inserta o reemplaza el valor de 'key'"""
+        split = self._insert(self.root, key, value)
+        if split is not None:
+            separator, right = split
+            self.root = _Node([separator], [self.root, right])
+
+    def _insert(self, node, key, value):
+        if isinstance(node, _Leaf):
+            i = bisect_left(node.keys, key)
+            if i < len(node.keys) and node.keys[i] == key:
+                node.values[i] = value
+                return None
+            node.keys.insert(i, key)
+            node.values.insert(i, value)
+            self.size += 1
+            if len(node.keys) <= self.max_keys:
+                return None
+            mid = len(node.keys) // 2
+            right = _Leaf(node.keys[mid:], node.values[mid:])
+            del node.keys[mid:], node.values[mid:]
+            right.next, node.next = node.next, right
+            return right.keys[0], right
+
+        i = bisect_right(node.keys, key)
+        split = self._insert(node.children[i], key, value)
+        if split is None:
+            return None
+        separator, right = split
+        node.keys.insert(i, separator)
+        node.children.insert(i + 1, right)
+        if len(node.keys) <= self.max_keys:
+            return None
+        mid = len(node.keys) // 2
+        up = node.keys[mid]
+        sibling = _Node(node.keys[mid + 1:], node.children[mid + 1:])
+        del node.keys[mid:], node.children[mid + 1:]
+        return up, sibling
+
+    def delete(self, key):
+        """Elimina 'key'; devuelve True si existía"""
+        found = self._delete(self.root, key)
+        if isinstance(self.root, _Node) and len(self.root.children) == 1:
+            self.root = self.root.children[0]
+        return found
+
+    def _delete(self, node, key):
+        if isinstance(node, _Leaf):
+            i = bisect_left(node.keys, key)
+            if i == len(node.keys) or node.keys[i] != key:
+                return False
+            del node.keys[i], node.values[i]
+            self.size -= 1
+            return True
+
+        i = bisect_right(node.keys, key)
+        child = node.children[i]
+        if not self._delete(child, key):
+            return False
+        if len(child.keys) < self.min_keys:
+            self._rebalance(node, i)
+        return True
+
+    def _rebalance(self, parent, i):
+        # Pedir prestada una clave a un hermano o, si no alcanza, fusionarse con él
+        child = parent.children[i]
+        left = parent.children[i - 1] if i > 0 else None
+        right = parent.children[i + 1] if i + 1 < len(parent.children) else None
+
+        if isinstance(child, _Leaf):
+            if left is not None and len(left.keys) > self.min_keys:
+                child.keys.insert(0, left.keys.pop())
+                child.values.insert(0, left.values.pop())
+                parent.keys[i - 1] = child.keys[0]
+            elif right is not None and len(right.keys) > self.min_keys:
+                child.keys.append(right.keys.pop(0))
+                child.values.append(right.values.pop(0))
+                parent.keys[i] = right.keys[0]
+            elif left is not None:
+                left.keys += child.keys
+                left.values += child.values
+                left.next = child.next
+                del parent.keys[i - 1], parent.children[i]
+            elif right is not None:
+                child.keys += right.keys
+                child.values += right.values
+                child.next = right.next
+                del parent.keys[i], parent.children[i + 1]
+            return
+
+        if left is not None and len(left.keys) > self.min_keys:
+            child.keys.insert(0, parent.keys[i - 1])
+            child.children.insert(0, left.children.pop())
+            parent.keys[i - 1] = left.keys.pop()
+        elif right is not None and len(right.keys) > self.min_keys:
+            child.keys.append(parent.keys[i])
+            child.children.append(right.children.pop(0))
+            parent.keys[i] = right.keys.pop(0)
+        elif left is not None:
+            left.keys += [parent.keys[i - 1]] + child.keys
+            left.children += child.children
+            del parent.keys[i - 1], parent.children[i]
+        elif right is not None:
+            child.keys += [parent.keys[i]] + right.keys
+            child.children += right.children
+            del parent.keys[i], parent.children[i + 1]
+
+    def items(self, start=None, stop=None):
+        """Recorre los pares (clave, valor) con start <= clave < stop, en orden"""
+        if start is None:
+            leaf = self.root
+            while isinstance(leaf, _Node):
+                leaf = leaf.children[0]
+            i = 0
+        else:
+            leaf = self._leaf_for(start)
+            i = bisect_left(leaf.keys, start)
+        while leaf is not None:
+            keys, values = leaf.keys, leaf.values
+            while i < len(keys):
+                if stop is not None and keys[i] >= stop:
+                    return
+                yield keys[i], values[i]
+                i += 1
+            leaf, i = leaf.next, 0
+
+    def prefix_items(self, prefix):
+        """Recorre los pares cuya clave (texto) empieza con 'prefix'"""
+        for key, value in self.items(prefix):
+            if not key.startswith(prefix):
+                return
+            yield key, value
+
+
+_MISSING = object()
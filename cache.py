@@ -0,0 +1,268 @@
+from collections import OrderedDict
+
+# Caché de bloques simulada delante del disco: no guarda datos, solo decide qué bloques estarían en memoria
+# para contar aciertos, lecturas al disco y lecturas ahorradas con cada política de reemplazo.
+
+
+class LRUCache:
+    """Reemplazo LRU: se expulsa el bloque usado hace más tiempo"""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.blocks = OrderedDict()
+
+    def __len__(self):
+        return len(self.blocks)
+
+    def __contains__(self, block):
+        return block in self.blocks
+
+    def lookup(self, block):
+        """True si el bloque está en la caché (y lo marca como usado)"""
+        if block in self.blocks:
+            self.blocks.move_to_end(block)
+            return True
+        return False
+
+    def insert(self, block, referenced=True):
+        """Agrega un bloque que no estaba; devuelve el bloque expulsado o None.
+        'referenced' = False para los bloques leídos por adelantado (LRU los trata igual)"""
+        evicted = None
+        if len(self.blocks) >= self.capacity:
+            evicted = self.blocks.popitem(last=False)[0]
+        self.blocks[block] = None
+        return evicted
+
+    def discard(self, block):
+        self.blocks.pop(block, None)
+
+
+class ClockCache:
+    """Reemplazo CLOCK (segunda oportunidad): una aguja recorre los marcos y salta los que tienen el bit de uso"""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.frames = []  # Bloque de cada marco (None = marco libre)
+        self.referenced = []  # Bit de uso de cada marco
+        self.positions = {}  # bloque -> marco
+        self.free_frames = []
+        self.hand = 0
+
+    def __len__(self):
+        return len(self.positions)
+
+    def __contains__(self, block):
+        return block in self.positions
+
+    def lookup(self, block):
+        frame = self.positions.get(block)
+        if frame is None:
+            return False
+        self.referenced[frame] = True
+        return True
+
+    def insert(self, block, referenced=True):
+        evicted = None
+        if self.free_frames:
+            frame = self.free_frames.pop()
+        elif len(self.frames) < self.capacity:
+            frame = len(self.frames)
+            self.frames.append(None)
+            self.referenced.append(False)
+        else:
+            # Dar una vuelta limpiando bits hasta encontrar un marco sin uso reciente
+            while self.referenced[self.hand]:
+                self.referenced[self.hand] = False
+                self.hand = (self.hand + 1) % self.capacity
+            frame = self.hand
+            self.hand = (self.hand + 1) % self.capacity
+            evicted = self.frames[frame]
+            del self.positions[evicted]
+        self.frames[frame] = block
+        self.referenced[frame] = referenced
+        self.positions[block] = frame
+        return evicted
+
+    def discard(self, block):
+        frame = self.positions.pop(block, None)
+        if frame is not None:
+            self.frames[frame] = None
+            self.referenced[frame] = False
+            self.free_frames.append(frame)
+
+
+class ARCCache:
+    """Adaptive Replacement Cache (Megiddo y Modha): equilibra recencia (T1) y frecuencia (T2) con listas fantasma"""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.p = 0  # Tamaño objetivo de T1
+        self.t1 = OrderedDict()  # Bloques vistos una vez
+        self.t2 = OrderedDict()  # Bloques vistos al menos dos veces
+        self.b1 = OrderedDict()  # Fantasmas (solo la clave) expulsados de T1
+        self.b2 = OrderedDict()  # Fantasmas expulsados de T2
+
+    def __len__(self):
+        return len(self.t1) + len(self.t2)
+
+    def __contains__(self, block):
+        return block in self.t1 or block in self.t2
+
+    def lookup(self, block):
+        if block in self.t1:
+            del self.t1[block]
+            self.t2[block] = None
+            return True
+        if block in self.t2:
+            self.t2.move_to_end(block)
+            return True
+        return False
+
+    def _replace(self, in_b2):
+        # Expulsar de T1 o de T2 según el objetivo p; el expulsado pasa a su lista fantasma
+        if self.t1 and (len(self.t1) > self.p or (in_b2 and len(self.t1) == self.p) or not self.t2):
+            block = self.t1.popitem(last=False)[0]
+            self.b1[block] = None
+        else:
+            block = self.t2.popitem(last=False)[0]
+            self.b2[block] = None
+        return block
+
+    def insert(self, block, referenced=True):
+        c = self.capacity
+        full = len(self.t1) + len(self.t2) >= c
+        if block in self.b1:
+            # Fantasma de T1: la recencia está perdiendo bloques útiles, T1 debe crecer
+            self.p = min(c, self.p + max(len(self.b2) // len(self.b1), 1))
+            evicted = self._replace(False) if full else None
+            del self.b1[block]
+            self.t2[block] = None
+            return evicted
+        if block in self.b2:
+            self.p = max(0, self.p - max(len(self.b1) // len(self.b2), 1))
+            evicted = self._replace(True) if full else None
+            del self.b2[block]
+            self.t2[block] = None
+            return evicted
+
+        evicted = None
+        l1 = len(self.t1) + len(self.b1)
+        if l1 >= c:
+            if len(self.t1) < c:
+                self.b1.popitem(last=False)
+                if full:
+                    evicted = self._replace(False)
+            else:
+                evicted = self.t1.popitem(last=False)[0]
+        else:
+            total = l1 + len(self.t2) + len(self.b2)
+            if total >= c:
+                if total >= 2 * c:
+                    self.b2.popitem(last=False)
+                if full:
+                    evicted = self._replace(False)
+        self.t1[block] = None
+        return evicted
+
+    def discard(self, block):
+        for table in (self.t1, self.t2, self.b1, self.b2):
+            table.pop(block, None)
+
+
+POLICIES = {"lru": LRUCache, "clock": ClockCache, "arc": ARCCache}
+
+
+class BufferCache:
+    """Caché de bloques con lectura anticipada: sigue los rangos contiguos del archivo (runs de la cadena FAT,
+    extents del inodo EXT o runs de la MFT), así que cuanto menos fragmentado el formato, menos pedidos al disco"""
+
+    def __init__(self, capacity, policy="lru", read_ahead=8):
+        if policy not in POLICIES:
+            raise ValueError(f"Política de caché desconocida: {policy}")
+        self.capacity = capacity
+        self.policy_name = policy
+        self.policy = POLICIES[policy](capacity)
+        self.read_ahead = read_ahead  # Bloques contiguos extra que se piden con cada fallo
+        self.prefetched = set()  # Bloques traídos por adelantado que todavía no se usaron
+        self.reads = 0  # Bloques pedidos por las lecturas
+        self.hits = 0
+        self.device_reads = 0  # Bloques leídos del disco (incluye los anticipados)
+        self.device_requests = 0  # Pedidos al disco (un pedido lee bloques contiguos)
+        self.prefetch_hits = 0
+        self.writes = 0  # Bloques escritos (la caché escribe a través: cada uno llega al disco)
+        self.evictions = 0
+        self.device = None  # Destino de los pedidos al disco (por ejemplo un iosched.IOTrace), opcional
+
+    def _insert(self, block, referenced=True):
+        evicted = self.policy.insert(block, referenced)
+        if evicted is not None:
+            self.evictions += 1
+            self.prefetched.discard(evicted)
+
+    def read(self, runs):
+        """Lee bloque a bloque los rangos [inicio, longitud] de un archivo, en orden"""
+        policy = self.policy
+        prefetched = self.prefetched
+        for start, length in runs:
+            end = start + length
+            for block in range(start, end):
+                self.reads += 1
+                if policy.lookup(block):
+                    self.hits += 1
+                    if prefetched and block in prefetched:
+                        prefetched.remove(block)
+                        self.prefetch_hits += 1
+                    continue
+                # Fallo: un pedido con el bloque y los siguientes del mismo run que no estén en la caché
+                self._insert(block)
+                last = min(end, block + 1 + self.read_ahead)
+                fetched = 1
+                for ahead in range(block + 1, last):
+                    if ahead in policy:
+                        break
+                    self._insert(ahead, referenced=False)
+                    prefetched.add(ahead)
+                    fetched += 1
+                self.device_requests += 1
+                self.device_reads += fetched
+                if self.device is not None:
+                    self.device.read(((block, fetched),))
+
+    def write(self, runs):
+        """Escribe los rangos: los bloques quedan en la caché y también van al disco"""
+        policy = self.policy
+        for start, length in runs:
+            self.writes += length
+            for block in range(start, start + length):
+                if not policy.lookup(block):
+                    self._insert(block)
+                self.prefetched.discard(block)
+        if self.device is not None:
+            self.device.write(runs)
+
+    def invalidate(self, runs):
+        """Descarta bloques liberados: su contenido ya no sirve"""
+        for start, length in runs:
+            for block in range(start, start + length):
+                self.policy.discard(block)
+                self.prefetched.discard(block)
+
+    def stats(self):
+        """Aciertos, pedidos al disco y E/S ahorrada frente a leer cada bloque del disco sin caché"""
+        misses = self.reads - self.hits
+        return {
+            'policy': self.policy_name,
+            'capacity_blocks': self.capacity,
+            'read_ahead': self.read_ahead,
+            'reads': self.reads,
+            'hits': self.hits,
+            'misses': misses,
+            'hit_ratio': round(self.hits / self.reads, 6) if self.reads else 0.0,
+            'device_reads': self.device_reads,
+            'device_requests': self.device_requests,
+            'prefetch_hits': self.prefetch_hits,
+            'writes': self.writes,
+            'evictions': self.evictions,
+            'io_saved_blocks': self.reads - self.device_reads,
+            'io_saved_requests': self.reads - self.device_requests,
+        }
@@ -0,0 +1,235 @@
+import sys
+import json
+import time
+import shlex
+import argparse
+import inspect
+
+from dedup import COMPRESSORS
+from engine import ALGORITHMS, FileSystemEngine, FileSystemError, InvalidInputError
+
+# Entrada por lotes sin interfaz gráfica: lee comandos línea por línea (de un archivo o de la entrada estándar),
+# los aplica al motor y escribe un resultado JSON por línea. Nada se acumula en memoria: cada línea se procesa y
+# se descarta, y el log del motor se confirma cada cierto número de comandos, así que un script de millones de
+# líneas usa la misma memoria que uno corto (sin contar lo que crece el propio disco simulado).
+#
+# Cada línea es un comando en palabras o en JSON con la misma forma que acepta engine.execute():
+#   format NTFS
+#   create informe.txt 10 "contenido" /docs
+#   ["create", "datos.csv", 8, "a,b,c", "/docs", null, "lzma"]
+#   ["replace", "informe.txt", 12]
+#   move informe.txt /archivo /docs
+#   delete informe.txt /archivo
+#   mkdir docs
+#   stats
+# Las líneas vacías y las que empiezan con '#' se ignoran.
+
+# Argumentos que se convierten a entero cuando el comando viene en palabras (posición de cada uno)
+INTEGER_ARGUMENTS = {"create": (1,), "replace": (1,)}
+
+# Tipo de cada argumento que se acepta por operación (None también vale: el motor pide los que faltan).
+# Limita además la cantidad: los parámetros internos como 'progress' o 'cancel' no se aceptan desde un script
+ARGUMENT_TYPES = {
+    "create": (str, int, str, str, list, str),
+    "replace": (str, int, str, str, list, str),
+    "move": (str, str, str),
+    "delete": (str, str),
+    "mkdir": (str, str),
+    "mvdir": (str, str, str, str),
+    "relocate": (str, list),
+    "format": (str,),
+    "read": (str, str),
+    "import": (list, str),
+}
+
+
+def read_commands(stream):
+    """Genera (número de línea, texto) por cada comando del flujo, sin las líneas vacías ni los comentarios"""
+    for number, line in enumerate(stream, 1):
+        line = line.strip()
+        if line and not line.startswith('#'):
+            yield number, line
+
+
+def parse_command(line):
+    """Convierte una línea en una operación (codigo, *argumentos)"""
+    if line.startswith('['):
+        operation = json.loads(line)
+        if not isinstance(operation, list) or not operation:
+            raise InvalidInputError("El comando JSON debe ser una lista que empiece con el código de la operación.")
+        return tuple(operation)
+    if '"' in line or "'" in line:
+        try:
+            words = shlex.split(line)
+        except ValueError as e:
+            raise InvalidInputError(f"No se pudo leer el comando: {e}") from None
+    else:
+        words = line.split()  # Sin comillas no hace falta shlex (mucho más lento)
+    op, args = words[0], words[1:]
+    for index in INTEGER_ARGUMENTS.get(op, ()):
+        if index < len(args):
+            try:
+                args[index] = int(args[index])
+            except ValueError:
+                raise InvalidInputError(f"'{args[index]}' no es una cantidad de bloques válida.") from None
+    return (op, *args)
+
+
+def check_arguments(engine, operation, signatures=None):
+    # Validar la cantidad, el tipo y el rango de los argumentos antes de ejecutar (un TypeError dentro del motor
+    # sería un error real). 'signatures' guarda la firma de cada operación entre llamadas
+    op, *args = operation
+    types = ARGUMENT_TYPES.get(op)
+    if types is not None:
+        if len(args) > len(types):
+            raise InvalidInputError(f"Demasiados argumentos para '{op}': {list(args)}")
+        for index, (value, kind) in enumerate(zip(args, types)):
+            if value is not None and (not isinstance(value, kind) or isinstance(value, bool)):
+                raise InvalidInputError(f"El argumento {index + 1} de '{op}' debe ser {kind.__name__}: {value!r}")
+        if op in INTEGER_ARGUMENTS and len(args) > 1 and args[1] is not None and args[1] < 1:
+            raise InvalidInputError(f"'{args[1]}' no es una cantidad de bloques válida (debe ser un entero positivo).")
+    signatures = {} if signatures is None else signatures
+    signature = signatures.get(op)
+    if signature is None:
+        method = engine.OPERATIONS.get(op)
+        if method is None:
+            raise InvalidInputError(f"Operación desconocida: {op}")
+        signature = signatures[op] = inspect.signature(getattr(engine, method))
+    try:
+        signature.bind(*args)
+    except TypeError:
+        raise InvalidInputError(f"Argumentos inválidos para '{op}': {list(args)}") from None
+
+
+def engine_stats(engine):
+    """Estado del volumen: formato, uso de bloques, archivos y fragmentación"""
+    stats = {
+        'format': engine.selected_algorithm,
+        'disk_blocks': engine.disk_blocks,
+        'reserved_blocks': engine.reserved_blocks,
+        'used_blocks': engine.used_blocks,
+        'logical_used_blocks': engine.logical_used_blocks,
+        'free_blocks': engine.free_space.free_count,
+        'files': len(engine.block_usage),
+        'fragmentation': {k: round(v, 6) if isinstance(v, float) else v for k, v in engine.fragmentation().items()},
+    }
+    if engine.block_store is not None or engine.compression is not None:
+        stats['storage'] = engine.storage_usage()
+    metrics = engine.metrics_snapshot()
+    if metrics is not None:
+        stats['metrics'] = metrics
+    return stats
+
+
+class BatchRunner:
+    """Aplica un flujo de comandos al motor y escribe un resultado JSON por línea en 'output'"""
+
+    def __init__(self, engine, output, save_every=1000, errors_only=False, stop_on_error=False):
+        self.engine = engine
+        self.output = output
+        self.save_every = max(1, save_every)
+        self.errors_only = errors_only  # Solo escribir los errores y las estadísticas (scripts muy largos)
+        self.stop_on_error = stop_on_error
+        self.summary = {'lines': 0, 'ok': 0, 'failed': 0, 'errors': {}, 'saves': 0}
+        self._signatures = {}
+
+    def _write(self, record):
+        self.output.write(json.dumps(record, separators=(',', ':'), ensure_ascii=False, default=str) + '\n')
+
+    def _save(self):
+        self.engine.save_data()
+        self.summary['saves'] += 1
+        self.output.flush()
+
+    def _apply(self, line):
+        operation = parse_command(line)
+        if operation[0] == "stats":
+            return operation[0], engine_stats(self.engine)
+        check_arguments(self.engine, operation, self._signatures)
+        return operation[0], self.engine.execute(operation)
+
+    def run(self, commands):
+        """Procesa los pares (número de línea, texto); devuelve el resumen, que también se escribe al final"""
+        summary = self.summary
+        errors = summary['errors']
+        started = time.perf_counter()
+        pending = 0  # Comandos aplicados desde la última vez que se guardó
+        for number, line in commands:
+            summary['lines'] += 1
+            try:
+                op, result = self._apply(line)
+            except Exception as e:
+                # Cualquier error queda en su línea: una línea inválida no puede cortar un script de millones.
+                # Los que no son del motor (ni de E/S o del formato de la línea) se marcan como inesperados
+                summary['failed'] += 1
+                kind = type(e).__name__
+                errors[kind] = errors.get(kind, 0) + 1
+                record = {'line': number, 'ok': False, 'error': kind, 'message': str(e)}
+                if not isinstance(e, (FileSystemError, OSError, ValueError)):
+                    record['unexpected'] = True
+                self._write(record)
+                if self.stop_on_error:
+                    break
+            else:
+                summary['ok'] += 1
+                if not self.errors_only or op == "stats":
+                    self._write({'line': number, 'op': op, 'ok': True, 'result': result})
+                if op != "stats":
+                    pending += 1
+            if pending >= self.save_every:
+                self._save()
+                pending = 0
+        if pending:
+            self._save()
+        elapsed = time.perf_counter() - started
+        summary['elapsed_s'] = round(elapsed, 6)
+        summary['commands_per_sec'] = round(summary['lines'] / elapsed, 1) if elapsed else 0.0
+        self._write({'summary': summary})
+        self.output.flush()
+        return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ejecuta comandos del simulador desde un script o la entrada estándar "
+                                                 "y escribe los resultados como líneas JSON")
+    parser.add_argument("script", nargs="?", default="-", help="Archivo de comandos (por defecto, la entrada estándar)")
+    parser.add_argument("--data-file", help="Archivo de estado (.json, o .db para SQLite); sin él, todo queda en memoria")
+    parser.add_argument("--directory", default="/", help="Carpeta actual para los comandos sin carpeta")
+    parser.add_argument("--format", choices=ALGORITHMS, help="Formato a aplicar antes del primer comando")
+    parser.add_argument("--disk-blocks", type=int, default=1000)
+    parser.add_argument("--cluster-size", type=int, default=4096)
+    parser.add_argument("--policy", choices=["first", "next", "best"], default="first")
+    parser.add_argument("--dedup", action="store_true", help="Guardar los clusters iguales una sola vez (almacén por contenido)")
+    parser.add_argument("--compression", choices=sorted(COMPRESSORS), help="Compresión por defecto de los archivos nuevos")
+    parser.add_argument("--save-every", type=int, default=1000, help="Comandos entre cada confirmación del estado")
+    parser.add_argument("--checkpoint-interval", type=int, default=1000,
+                        help="Operaciones del log entre checkpoints completos del archivo de estado")
+    parser.add_argument("--host-io", action="store_true", help="Crear y borrar también los archivos reales")
+    parser.add_argument("--errors-only", action="store_true", help="Escribir solo los errores, las estadísticas y el resumen")
+    parser.add_argument("--stop-on-error", action="store_true", help="Detenerse en el primer comando que falle")
+    parser.add_argument("--metrics", action="store_true", help="Activar las métricas e incluirlas en 'stats'")
+    parser.add_argument("--output", help="Archivo de resultados (por defecto, la salida estándar)")
+    args = parser.parse_args(argv)
+
+    engine = FileSystemEngine(args.directory, args.data_file, host_io=args.host_io, allocation_policy=args.policy,
+                              checkpoint_interval=args.checkpoint_interval, cluster_size=args.cluster_size,
+                              disk_blocks=args.disk_blocks, dedup=args.dedup, compression=args.compression)
+    if args.metrics:
+        engine.enable_metrics()
+    source = sys.stdin if args.script == "-" else open(args.script, 'r', encoding='utf-8')
+    output = sys.stdout if args.output is None else open(args.output, 'w', encoding='utf-8')
+    try:
+        if args.format:
+            engine.apply_algorithm(args.format)
+        summary = BatchRunner(engine, output, args.save_every, args.errors_only, args.stop_on_error).run(read_commands(source))
+    finally:
+        engine.close()
+        if source is not sys.stdin:
+            source.close()
+        if output is not sys.stdout:
+            output.close()
+    return 1 if summary['failed'] and args.stop_on_error else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,255 @@
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+
+import benchmark
+from engine import ALGORITHMS, FileSystemError, NoSpaceError
+from locks import InstrumentedLock, LockTable
+
+# Clientes que trabajan a la vez sobre un mismo volumen. En modo "fine" el motor se crea con grupos de asignación
+# (allocation_groups): cada cliente reserva bloques con el candado de un grupo tomado y sin el candado del motor,
+# que queda para las estructuras comunes (MFT, journal, árbol de directorios). En modo "global" un único candado
+# del volumen serializa todo. Dentro de cada candado se pasa la latencia simulada del dispositivo.
+
+# Fracción de la latencia de metadatos de una asignación que se pasa con el candado del grupo tomado; el resto
+# va con el candado del motor (las estructuras comunes del formato)
+GROUP_SHARE = {
+    "FAT32": 1.0,  # Una sola FAT: el único grupo es toda la cadena de clusters
+    "NTFS": 0.5,  # $Bitmap por zonas, pero el registro del archivo va a la MFT común
+    "EXT": 0.8,  # Mapa de bits e inodos por grupo; al journal común solo va la transacción
+}
+# Fracción de la latencia de mover o crear carpetas que se pasa con el candado del motor
+NAMESPACE_SHARE = {
+    "FAT32": 0.0,  # Las entradas de directorio están en los clusters del propio directorio
+    "NTFS": 1.0,
+    "EXT": 1.0,
+}
+
+
+class ConcurrentVolume:
+    """Volumen compartido por varios clientes: con los grupos de asignación del motor ("fine") o bajo un candado
+    global. Los candados que se miden son los del motor: sus grupos y su candado de estado ("engine")"""
+
+    def __init__(self, engine, mode="fine", metadata_latency=0.0005, data_latency=0.00002):
+        if mode == "fine" and engine.groups is None:
+            raise FileSystemError("El modo 'fine' necesita un motor con grupos de asignación (allocation_groups).")
+        self.engine = engine
+        self.mode = mode
+        self.metadata_latency = metadata_latency  # Segundos por actualización de metadatos
+        self.data_latency = data_latency  # Segundos por bloque de datos escrito
+        self.locks = engine.groups.locks if mode == "fine" else LockTable()
+        # El candado del motor protege las estructuras comunes en memoria: también se mide su contención
+        engine.lock = self.locks.add("engine", InstrumentedLock(engine.lock))
+        self.conflicts = {'busy_groups': 0, 'full_groups': 0}  # Grupo preferido ocupado o sin espacio
+        self._conflicts_lock = threading.Lock()
+        self.regions = engine.group_regions()
+        self.group_share = GROUP_SHARE[engine.selected_algorithm]
+        self.namespace_share = NAMESPACE_SHARE[engine.selected_algorithm]
+
+    def _count(self, conflict):
+        with self._conflicts_lock:
+            self.conflicts[conflict] += 1
+
+    def _shared_latency(self, fraction):
+        # La parte de la latencia que corresponde a las estructuras comunes pasa con el candado del motor
+        if fraction:
+            with self.engine.lock:
+                time.sleep(self.metadata_latency * fraction)
+
+    def execute(self, client, operation):
+        """Ejecuta una operación (misma forma que engine.execute) en nombre de un cliente"""
+        if self.mode == "global":
+            with self.locks.get("volume"):
+                result = self.engine.execute(operation)
+                time.sleep(self.metadata_latency + self._data_time(operation))
+            return result
+
+        op = operation[0]
+        if op in ("create", "replace"):
+            result = self._store(client, operation)
+        elif op == "delete":
+            result = self._delete(operation)
+        elif op in ("move", "mkdir"):
+            # Solo cambian entradas de directorio: no se toma ningún grupo
+            result = self.engine.execute(operation)
+            time.sleep(self.metadata_latency * (1 - self.namespace_share))
+            self._shared_latency(self.namespace_share)
+        else:
+            raise FileSystemError(f"Operación no soportada por el modo concurrente: {op}")
+        # Los datos se escriben fuera de los candados: los bloques ya son del archivo
+        time.sleep(self._data_time(operation))
+        return result
+
+    def _data_time(self, operation):
+        return self.data_latency * operation[2] if operation[0] in ("create", "replace") else 0.0
+
+    def _store(self, client, operation):
+        # Cada cliente empieza por "su" grupo; si está ocupado prueba el siguiente sin esperar (como los grupos de
+        # asignación de XFS/EXT4). Solo si todos están ocupados espera por alguno
+        op, name, blocks, content, directory = operation[:5]
+        engine = self.engine
+        method = engine.create_file if op == "create" else engine.replace_file
+        count = len(self.regions)
+        order = [(client + i) % count for i in range(count)]
+        full = set()
+        for blocking in (False, True):
+            for group in order:
+                if group in full:
+                    continue
+                region = self.regions[group]
+                # También los grupos de los bloques anteriores del archivo, que se liberan al reemplazarlo
+                needed = engine._select_groups("_store_groups", (name, blocks, content, directory, region), {})
+                if not engine.groups.acquire(needed, blocking):
+                    self._count('busy_groups')
+                    continue
+                try:
+                    result = method(name, blocks, content, directory, region)
+                    time.sleep(self.metadata_latency * self.group_share)
+                    self._shared_latency(1 - self.group_share)
+                    return result
+                except NoSpaceError:
+                    self._count('full_groups')
+                    full.add(group)
+                finally:
+                    engine.groups.release(needed)
+        raise NoSpaceError("No hay suficiente espacio disponible en ningún grupo de asignación.")
+
+    def _delete(self, operation):
+        _, name, directory = operation
+        engine = self.engine
+        with engine.groups.hold(engine._select_groups("_delete_groups", (name, directory), {})):
+            result = engine.execute(operation)
+            time.sleep(self.metadata_latency * self.group_share)
+            self._shared_latency(1 - self.group_share)
+        return result
+
+
+def client_operations(client, operations, max_blocks=64, seed=0, directories=8):
+    """Operaciones de un cliente: sus propios archivos, repartidos en carpetas compartidas con los demás"""
+    rng = random.Random(seed * 1000003 + client)
+    sizes = benchmark._zipf_sizes(rng, max_blocks)
+    folders = [f"/d{i}" for i in range(directories)]
+    live = {}  # archivo -> carpeta
+    names = []
+    created = 0
+    for _ in range(operations):
+        kind = rng.choices(("create", "replace", "delete", "move", "mkdir"), (50, 15, 23, 10, 2))[0] if names else "create"
+        if kind == "create":
+            created += 1
+            name = f"c{client}_{created}.dat"
+            live[name] = rng.choice(folders)
+            names.append(name)
+            yield ["create", name, next(sizes), "", live[name]]
+        elif kind == "replace":
+            name = rng.choice(names)
+            yield ["replace", name, next(sizes), "", live[name]]
+        elif kind == "delete":
+            name = names.pop(rng.randrange(len(names)))
+            yield ["delete", name, live.pop(name)]
+        elif kind == "move":
+            name = rng.choice(names)
+            target = rng.choice(folders)
+            source, live[name] = live[name], target
+            yield ["move", name, target, source]
+        else:
+            created += 1
+            yield ["mkdir", f"c{client}_dir{created}", rng.choice(folders)]
+
+
+def run(algorithm, threads, ops_per_client=500, mode="fine", groups=16, disk_blocks=100000, max_blocks=64,
+        directories=8, metadata_latency=0.0005, data_latency=0.00002, seed=0):
+    """Ejecuta 'threads' clientes a la vez y devuelve rendimiento, espera en candados y conflictos de asignación"""
+    # En modo "fine" el motor divide su zona de datos en grupos de asignación con candado propio
+    options = {'allocation_groups': groups} if mode == "fine" else None
+    engine = benchmark._new_engine(algorithm, disk_blocks, "first", options)
+    for i in range(directories):
+        engine.create_folder(f"d{i}", "/")
+    volume = ConcurrentVolume(engine, mode, metadata_latency, data_latency)
+    streams = [list(client_operations(client, ops_per_client, max_blocks, seed, directories)) for client in range(threads)]
+    outcomes = [[0, 0] for _ in range(threads)]  # [correctas, fallidas] por cliente
+    barrier = threading.Barrier(threads + 1)
+
+    def work(client):
+        barrier.wait()
+        outcome = outcomes[client]
+        for operation in streams[client]:
+            try:
+                volume.execute(client, operation)
+            except FileSystemError:
+                outcome[1] += 1
+            else:
+                outcome[0] += 1
+
+    workers = [threading.Thread(target=work, args=(client,), name=f"client-{client}") for client in range(threads)]
+    for worker in workers:
+        worker.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - started
+
+    total = threads * ops_per_client
+    return {
+        'threads': threads,
+        'operations': total,
+        'ok': sum(ok for ok, _ in outcomes),
+        'failed': sum(failed for _, failed in outcomes),
+        'elapsed_s': round(elapsed, 6),
+        'ops_per_sec': round(total / elapsed, 1) if elapsed else 0.0,
+        'locks': volume.locks.stats(),
+        'conflicts': dict(volume.conflicts),
+    }
+
+
+def scaling(algorithm, thread_counts, mode="fine", **options):
+    """Corre la simulación con cada cantidad de hilos y agrega la aceleración respecto del primero"""
+    runs = [run(algorithm, threads, mode=mode, **options) for threads in thread_counts]
+    base = runs[0]['ops_per_sec'] if runs else 0
+    for result in runs:
+        result['speedup'] = round(result['ops_per_sec'] / base, 3) if base else 0.0
+    return runs
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Clientes concurrentes sobre un volumen: escalado, espera en candados y conflictos de asignación (JSON)")
+    parser.add_argument("--formats", nargs="+", choices=ALGORITHMS, default=ALGORITHMS)
+    parser.add_argument("--threads", nargs="+", type=int, default=[1, 2, 4, 8])
+    parser.add_argument("--modes", nargs="+", choices=["fine", "global"], default=["fine", "global"])
+    parser.add_argument("--ops", type=int, default=300, help="Operaciones por cliente")
+    parser.add_argument("--groups", type=int, default=16, help="Grupos de asignación del volumen")
+    parser.add_argument("--disk-blocks", type=int, default=100000)
+    parser.add_argument("--max-blocks", type=int, default=64, help="Bloques máximos por archivo en la carga")
+    parser.add_argument("--directories", type=int, default=8, help="Carpetas compartidas por los clientes")
+    parser.add_argument("--metadata-latency-us", type=float, default=500.0, help="Latencia simulada por actualización de metadatos")
+    parser.add_argument("--data-latency-us", type=float, default=20.0, help="Latencia simulada por bloque de datos")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Archivo del reporte JSON (por defecto, la salida estándar)")
+    args = parser.parse_args(argv)
+
+    options = {
+        'ops_per_client': args.ops,
+        'groups': args.groups,
+        'disk_blocks': args.disk_blocks,
+        'max_blocks': args.max_blocks,
+        'directories': args.directories,
+        'metadata_latency': args.metadata_latency_us / 1e6,
+        'data_latency': args.data_latency_us / 1e6,
+        'seed': args.seed,
+    }
+    report = dict(options, formats={})
+    for algorithm in args.formats:
+        report['formats'][algorithm] = {mode: scaling(algorithm, args.threads, mode, **options) for mode in args.modes}
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
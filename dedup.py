@@ -0,0 +1,235 @@
+import lzma
+import zlib
+import hashlib
+
+from btree import BTree
+
+# Almacenamiento por contenido: el contenido de un archivo (comprimido o no) se corta en clusters, cada cluster se
+# identifica por su huella y los clusters con la misma huella se guardan una sola vez en el disco, con un contador
+# de referencias. Los clusters del final del archivo que no tienen contenido quedan sin bloques (archivo disperso).
+
+# Modos de compresión por archivo (de la biblioteca estándar): nombre -> (comprimir, descomprimir)
+COMPRESSORS = {
+    "zlib": (zlib.compress, zlib.decompress),
+    "lzma": (lzma.compress, lzma.decompress),
+}
+
+DIGEST_SIZE = 16  # Bytes de la huella BLAKE2b de cada cluster
+
+
+def compress(data, mode):
+    """Comprime 'data' con el modo dado; devuelve (contenido, modo), con modo None si comprimir no ahorra nada"""
+    if mode is None:
+        return data, None
+    payload = COMPRESSORS[mode][0](data)
+    if len(payload) >= len(data):
+        # Como en NTFS: si no se gana espacio el archivo se guarda sin comprimir
+        return data, None
+    return payload, mode
+
+
+def decompress(payload, mode):
+    return COMPRESSORS[mode][1](payload) if mode is not None else payload
+
+
+def chunk_count(payload, cluster_size):
+    """Clusters que ocupa el contenido (como mínimo uno: el motor no admite archivos sin bloques)"""
+    return max(1, -(-len(payload) // cluster_size))
+
+
+def chunk_digests(payload, cluster_size, count=None):
+    """Huella de cada cluster del contenido; el último se completa con ceros como en el disco"""
+    count = chunk_count(payload, cluster_size) if count is None else count
+    view = memoryview(payload)
+    digests = []
+    for i in range(count):
+        chunk = view[i * cluster_size:(i + 1) * cluster_size]
+        digest = hashlib.blake2b(chunk, digest_size=DIGEST_SIZE)
+        if len(chunk) < cluster_size:
+            digest.update(bytes(cluster_size - len(chunk)))
+        digests.append(digest.hexdigest())
+    return digests
+
+
+class BlockStore:
+    """Almacén direccionado por contenido: huella -> bloque físico (una sola copia por huella) y referencias de cada
+    bloque. Solo se registran los bloques escritos por contenido; el resto pertenece a un único archivo"""
+
+    def __init__(self):
+        self.blocks = {}  # huella -> bloque
+        self.digests = BTree()  # bloque -> huella, ordenado para buscar los bloques registrados dentro de un rango
+        self.refs = {}  # bloque -> archivos (o posiciones de un archivo) que lo usan
+        self.changed = set()  # Bloques agregados, quitados o con otras referencias desde el último checkpoint
+        self.lookups = 0
+        self.hits = 0
+
+    def __len__(self):
+        return len(self.refs)
+
+    def lookup(self, digest):
+        """Bloque que ya guarda ese contenido, o None"""
+        self.lookups += 1
+        block = self.blocks.get(digest)
+        if block is not None:
+            self.hits += 1
+        return block
+
+    def add(self, block, digest):
+        """Registra un bloque nuevo con su contenido (una referencia)"""
+        if digest in self.blocks:
+            return  # Ya hay una copia registrada (en FAT32 no se comparte): este bloque queda como propio
+        self.blocks[digest] = block
+        self.digests.insert(block, digest)
+        self.refs[block] = 1
+        self.changed.add(block)
+
+    def _forget(self, block):
+        digest = self.digests.get(block)
+        self.digests.delete(block)
+        del self.blocks[digest]
+        del self.refs[block]
+        self.changed.add(block)
+
+    def _registered(self, runs):
+        # Bloques registrados dentro de los rangos (los rangos de un archivo pueden repetir un bloque)
+        for start, length in runs:
+            for block, _ in list(self.digests.items(start, start + length)):
+                yield block
+
+    def positions(self, runs):
+        """Clusters registrados de un archivo como [(posición dentro del archivo, huella)], para volver a
+        registrarlos si el archivo se restaura o se mueve"""
+        found = []
+        position = 0
+        for start, length in runs:
+            for block, digest in self.digests.items(start, start + length):
+                found.append((position + block - start, digest))
+            position += length
+        return found
+
+    def shared(self, runs):
+        """True si algún bloque de los rangos también lo usa otro archivo"""
+        uses = {}
+        for block in self._registered(runs):
+            uses[block] = uses.get(block, 0) + 1
+        return any(self.refs[block] > count for block, count in uses.items())
+
+    def shared_in(self, start, end):
+        """True si hay un bloque compartido en [start, end) (para el mapa de bloques)"""
+        return any(self.refs[block] > 1 for block, _ in self.digests.items(start, end))
+
+    def register(self, chunks):
+        """Suma los clusters [(bloque, huella)] de un archivo recién escrito: los bloques que ya están en el almacén
+        ganan una referencia y los nuevos se registran con su huella"""
+        for block, digest in chunks:
+            if block in self.refs:
+                self.refs[block] += 1
+                self.changed.add(block)
+            else:
+                self.add(block, digest)
+
+    def release(self, runs):
+        """Quita una referencia a cada bloque registrado de los rangos; devuelve los rangos que quedan libres
+        (los bloques que siguen usando otros archivos no se liberan)"""
+        uses = {}
+        for block in self._registered(runs):
+            uses[block] = uses.get(block, 0) + 1
+        kept = set()
+        for block, count in uses.items():
+            refs = self.refs[block] - count
+            if refs > 0:
+                self.refs[block] = refs
+                self.changed.add(block)
+                kept.add(block)
+            else:
+                self._forget(block)
+        if not kept:
+            return runs
+        freed = []
+        for start, length in runs:
+            run_start = start
+            for block in range(start, start + length):
+                if block in kept:
+                    if block > run_start:
+                        freed.append([run_start, block - run_start])
+                    run_start = block + 1
+            if start + length > run_start:
+                freed.append([run_start, start + length - run_start])
+        return freed
+
+    def unshare(self, runs, kept):
+        """Posiciones de los clusters de un archivo cuyo bloque ya tiene dueño en 'kept' (que se actualiza): para
+        pasar a un formato que no comparte bloques, cada bloque queda para el primer archivo que lo usa"""
+        moving = set()
+        position = 0
+        for start, length in runs:
+            for block, _ in self.digests.items(start, start + length):
+                if block in kept:
+                    moving.add(position + block - start)
+                else:
+                    kept.add(block)
+            position += length
+        return moving
+
+    def retain(self, runs, positions=None):
+        """Suma una referencia a cada bloque registrado de los rangos (un archivo que vuelve a usarlos).
+        'positions' (de positions()) vuelve a registrar los clusters que se olvidaron al liberarlos, salvo que otro
+        bloque ya guarde ese contenido (entonces el bloque queda como propio del archivo)"""
+        if positions:
+            blocks = [block for start, length in runs for block in range(start, start + length)]
+            for position, digest in positions:
+                block = blocks[position]
+                if block not in self.refs and digest not in self.blocks:
+                    self.add(block, digest)
+                    self.refs[block] = 0  # La cuenta de abajo suma cada uso
+        for block in self._registered(runs):
+            self.refs[block] += 1
+            self.changed.add(block)
+
+    def recount(self, extents, data_start=0):
+        """Recalcula las referencias desde los rangos de todos los archivos; olvida los bloques que ya nadie usa
+        o que quedaron dentro de la zona reservada"""
+        refs = dict.fromkeys(self.refs, 0)
+        for runs in extents.values():
+            for start, length in runs:
+                for block, _ in self.digests.items(start, start + length):
+                    refs[block] += 1
+        for block, count in refs.items():
+            if count == 0 or block < data_start:
+                self._forget(block)
+            elif count != self.refs[block]:
+                self.refs[block] = count
+                self.changed.add(block)
+
+    def shared_blocks(self):
+        """Bloques que usa más de un archivo"""
+        return sum(1 for refs in self.refs.values() if refs > 1)
+
+    def stats(self):
+        return {
+            'blocks': len(self.refs),
+            'references': sum(self.refs.values()),
+            'shared_blocks': self.shared_blocks(),
+            'lookups': self.lookups,
+            'hits': self.hits,
+        }
+
+    def entry(self, block):
+        """[huella, referencias] de un bloque registrado, como se guarda en el estado"""
+        return [self.digests.get(block), self.refs[block]]
+
+    def items(self):
+        """Pares (bloque, [huella, referencias]) para guardar el almacén"""
+        for block, digest in self.digests.items():
+            yield block, [digest, self.refs[block]]
+
+    @classmethod
+    def rebuild(cls, entries):
+        """Reconstruye el almacén desde los pares (bloque, [huella, referencias]) guardados; no necesita los
+        rangos de los archivos, así que se puede cargar en cualquier momento"""
+        store = cls()
+        for block, (digest, refs) in sorted((int(block), entry) for block, entry in entries):
+            store.add(block, digest)
+            store.refs[block] = refs
+        store.changed.clear()
+        return store
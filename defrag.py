@@ -0,0 +1,194 @@
+import heapq
+import time
+from bisect import bisect_right
+from collections import deque, namedtuple
+
+from engine import FileSystemError
+
+# Movimiento planificado: archivo, rangos actuales, rangos de destino y bloques que realmente cambian de lugar
+Move = namedtuple("Move", "file source target cost")
+
+
+def _moved_blocks(source, target_start, blocks):
+    # Bloques que ya están en su lugar de destino no cuentan como movidos
+    target_end = target_start + blocks
+    in_place = sum(max(0, min(start + length, target_end) - max(start, target_start)) for start, length in source)
+    return blocks - in_place
+
+
+class Defragmenter:
+    """Desfragmentador en línea para FAT32, NTFS y EXT: planifica movimientos de costo mínimo y los aplica por intervalos"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.moves = deque()  # Movimientos pendientes, en el orden en que deben aplicarse
+        self.planned_cost = 0  # Bloques a mover según el último plan
+        self.applied = 0
+        self.skipped = 0  # Movimientos descartados porque el disco cambió entre el plan y su aplicación
+        self.blocks_moved = 0
+        self.before = None
+
+    def plan(self):
+        """Calcula el plan sobre una copia del mapa de bloques; devuelve (movimientos, bloques a mover)"""
+        engine = self.engine
+        with engine.exclusive():
+            if self.before is None:
+                self.before = engine.fragmentation()
+            bitmap = engine.free_space.copy()
+            extents = {path: runs for path, runs in engine.file_extents.items()}
+            data_start = engine._data_start()
+
+        moves = []
+        # Primero se une cada archivo fragmentado; si no hay un hueco donde quepa, compactar junta el
+        # espacio libre y se vuelve a intentar. Se repite mientras alguna pasada logre algo
+        pending = [path for path, runs in extents.items() if len(runs) > 1]
+        while True:
+            pending = self._join_runs(bitmap, extents, pending, moves, data_start)
+            compacted = self._compact(bitmap, extents, moves, data_start)
+            if not pending or not compacted:
+                break
+            retry = self._join_runs(bitmap, extents, pending, moves, data_start)
+            if len(retry) == len(pending):
+                break
+            pending = retry
+
+        self.moves = deque(moves)
+        self.planned_cost = sum(move.cost for move in moves)
+        return moves, self.planned_cost
+
+    @staticmethod
+    def _join_runs(bitmap, extents, paths, moves, data_start):
+        # Fase 1: cada archivo fragmentado pasa a un único run (best fit), empezando por los más grandes.
+        # Devuelve los archivos que no cupieron en ningún hueco
+        failed = []
+        for path in sorted(paths, key=lambda path: -sum(length for _, length in extents[path])):
+            runs = extents[path]
+            blocks = sum(length for _, length in runs)
+            for start, length in runs:
+                bitmap.free(start, length)
+            target = bitmap.find_run(blocks, "best", data_start)
+            if target is None:
+                for start, length in runs:
+                    bitmap.mark_used(start, length)
+                failed.append(path)
+                continue
+            bitmap.mark_used(target, blocks)
+            moves.append(Move(path, runs, [[target, blocks]], _moved_blocks(runs, target, blocks)))
+            extents[path] = [[target, blocks]]
+        return failed
+
+    @staticmethod
+    def _compact(bitmap, extents, moves, data_start):
+        # Fase 2: compactar. Cada hueco se rellena con los archivos más cercanos al final del disco que
+        # quepan en él (el más grande primero): mueve muchos menos bloques que desplazar todo el disco.
+        # Devuelve cuántos archivos se movieron
+        by_size = {}  # tamaño -> [(inicio, archivo)] ordenado por inicio
+        tail = []  # Montículo de (-inicio, archivo) para saber dónde termina el último archivo movible
+        for path, runs in extents.items():
+            if len(runs) == 1:
+                start, length = runs[0]
+                by_size.setdefault(length, []).append((start, path))
+                heapq.heappush(tail, (-start, path))
+        for candidates in by_size.values():
+            candidates.sort()
+        sizes = sorted(by_size)
+        moved = set()
+
+        position = data_start
+        while True:
+            # Descartar del montículo los archivos que ya se movieron
+            while tail and tail[0][1] in moved:
+                heapq.heappop(tail)
+            hole = next(bitmap.iter_free_runs(position), None)
+            if hole is None or not tail or -tail[0][0] < hole[0]:
+                break  # No queda ningún archivo después del hueco
+            hole_start, hole_length = hole
+            filled = 0
+            while filled < hole_length:
+                target = hole_start + filled
+                choice = None
+                i = bisect_right(sizes, hole_length - filled) - 1
+                while i >= 0:
+                    size = sizes[i]
+                    candidates = by_size[size]
+                    while candidates and candidates[-1][1] in moved:
+                        candidates.pop()
+                    if candidates and candidates[-1][0] > target:
+                        choice = candidates.pop()
+                        break
+                    # Los huecos se recorren en orden creciente: si ningún archivo de este tamaño
+                    # está después del hueco actual, ese tamaño ya no sirve para ningún hueco
+                    del sizes[i], by_size[size]
+                    i -= 1
+                if choice is None:
+                    break
+                start, path = choice
+                bitmap.free(start, size)
+                bitmap.mark_used(target, size)
+                moves.append(Move(path, [[start, size]], [[target, size]], size))
+                extents[path] = [[target, size]]
+                moved.add(path)
+                filled += size
+            position = hole_start + hole_length
+        return len(moved)
+
+    def _still_valid(self, move):
+        # El plan se calculó antes: el archivo debe seguir donde estaba y el destino libre
+        engine = self.engine
+        if engine.file_extents.get(move.file) != move.source:
+            return False
+        for start, length in move.target:
+            used = engine.free_space.count_used(start, start + length)
+            own = sum(max(0, min(s + l, start + length) - max(s, start)) for s, l in move.source)
+            if used > own:
+                return False
+        return True
+
+    def run(self, time_slice=0.01):
+        """Aplica movimientos hasta agotar 'time_slice' segundos; devuelve True si todavía queda trabajo"""
+        if self.before is None:
+            self.plan()
+        deadline = time.perf_counter() + time_slice
+        engine = self.engine
+        while self.moves:
+            move = self.moves.popleft()
+            # Cada movimiento toma el candado por separado: las operaciones normales pueden intercalarse
+            with engine.exclusive():
+                if not self._still_valid(move):
+                    self.skipped += 1
+                    continue
+                try:
+                    engine.relocate_file(move.file, move.target)
+                except FileSystemError:
+                    self.skipped += 1
+                    continue
+            self.applied += 1
+            self.blocks_moved += move.cost
+            if time.perf_counter() >= deadline:
+                break
+        return bool(self.moves)
+
+    def run_all(self, time_slice=0.05, replan=True):
+        """Desfragmenta hasta terminar; si se descartaron movimientos vuelve a planificar una vez"""
+        while self.run(time_slice):
+            pass
+        if replan and self.skipped:
+            self.skipped = 0
+            self.plan()
+            while self.run(time_slice):
+                pass
+        return self.report()
+
+    def report(self):
+        """Fragmentación antes y después, con los movimientos y bloques movidos"""
+        with self.engine.lock:
+            after = self.engine.fragmentation()
+        return {
+            'before': self.before,
+            'after': after,
+            'moves': self.applied,
+            'skipped': self.skipped,
+            'blocks_moved': self.blocks_moved,
+            'planned_blocks': self.planned_cost,
+            'pending': len(self.moves),
+        }
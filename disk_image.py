@@ -0,0 +1,79 @@
+import os
+import mmap
+
+
+class DiskImage:
+    """Disco simulado en un único archivo preasignado (bloques x tamaño de cluster), accedido con mmap"""
+
+    def __init__(self, path, total_blocks, cluster_size=4096):
+        self.path = path
+        self.total_blocks = total_blocks
+        self.cluster_size = cluster_size
+        self.size = total_blocks * cluster_size
+        self.bytes_written = 0
+        self.bytes_read = 0
+
+        mode = 'r+b' if os.path.exists(path) else 'w+b'
+        self.file = open(path, mode)
+        if os.fstat(self.file.fileno()).st_size < self.size:
+            # Preasignar el espacio real cuando el sistema lo permite (si no, queda como archivo disperso)
+            if hasattr(os, 'posix_fallocate'):
+                os.posix_fallocate(self.file.fileno(), 0, self.size)
+            else:
+                self.file.truncate(self.size)
+        self.map = mmap.mmap(self.file.fileno(), self.size)
+        self.view = memoryview(self.map)
+
+    def capacity(self, blocks):
+        return blocks * self.cluster_size
+
+    def clusters(self, start, count=1):
+        """Vista (sin copia) de 'count' clusters a partir de 'start'"""
+        offset = start * self.cluster_size
+        return self.view[offset:offset + count * self.cluster_size]
+
+    def write(self, extents, data):
+        """Escribe 'data' repartido en los rangos [inicio, longitud]; devuelve los bytes escritos"""
+        source = memoryview(data)
+        position = 0
+        for start, length in extents:
+            if position >= len(source):
+                break
+            chunk = min(length * self.cluster_size, len(source) - position)
+            offset = start * self.cluster_size
+            self.view[offset:offset + chunk] = source[position:position + chunk]
+            position += chunk
+        self.bytes_written += position
+        return position
+
+    def read_views(self, extents, length):
+        """Vistas (sin copia) de los primeros 'length' bytes guardados en los rangos, en orden"""
+        views = []
+        pending = length
+        for start, count in extents:
+            if pending <= 0:
+                break
+            chunk = min(count * self.cluster_size, pending)
+            views.append(self.clusters(start, count)[:chunk])
+            pending -= chunk
+        self.bytes_read += length - max(pending, 0)
+        return views
+
+    def read(self, extents, length):
+        """Copia los datos de los rangos en un único objeto bytes"""
+        return b''.join(self.read_views(extents, length))
+
+    def copy(self, source_extents, target_extents):
+        """Copia el contenido de unos clusters a otros (para reubicar archivos)"""
+        data = bytearray()
+        for start, count in source_extents:
+            data += self.clusters(start, count)
+        return self.write(target_extents, data)
+
+    def flush(self):
+        self.map.flush()
+
+    def close(self):
+        self.view.release()
+        self.map.close()
+        self.file.close()
@@ -0,0 +1,2077 @@
+import os
+import shutil
+import json
+import time
+import functools
+import threading
+import contextlib
+from collections import ChainMap
+
+from bitmap import FreeSpaceBitmap
+from cache import BufferCache
+from dedup import COMPRESSORS, BlockStore, chunk_count, chunk_digests, compress, decompress
+from extent_tree import FreeExtentTree
+from disk_image import DiskImage
+from fat import MAX_CLUSTERS, FileAllocationTable
+from groups import AllocationGroups, SharedFreeSpace, with_cursor
+from journal import Journal
+from metrics import Metrics, MetricsExporter
+from namespace import Namespace
+from snapshot import FileState, Snapshot
+from state_store import DELETED, LazyJournal, LazyTable, StateStore
+from mft import MAX_NAME_BYTES, RECORD_SIZE, FIRST_USER_RECORD, MasterFileTable, MftFullError
+from wal import WriteAheadLog
+
+# Sistemas de archivos soportados por el simulador
+ALGORITHMS = ["FAT32", "NTFS", "EXT"]
+
+
+class FileSystemError(Exception):
+    """Error de una operación del simulador, independiente de la interfaz gráfica"""
+
+    title = "Error"
+    level = "error"  # "error" o "warning", según cómo debe mostrarlo la interfaz
+
+    def __init__(self, message, title=None):
+        super().__init__(message)
+        if title is not None:
+            self.title = title
+
+
+class InvalidInputError(FileSystemError):
+    title = "Entrada Inválida"
+    level = "warning"
+
+
+class InvalidNameError(FileSystemError):
+    title = "Nombre Inválido"
+
+
+class BlockLimitError(FileSystemError):
+    title = "Exceso de Bloques"
+    level = "warning"
+
+
+class NoSpaceError(FileSystemError):
+    title = "Error de Espacio"
+    level = "warning"
+
+
+class MissingFileError(FileSystemError):
+    pass
+
+
+class AlreadyExistsError(FileSystemError):
+    title = "Carpeta Existente"
+    level = "warning"
+
+
+class OperationCancelledError(FileSystemError):
+    title = "Operación Cancelada"
+    level = "warning"
+
+
+def locked(method):
+    # Las operaciones que modifican el estado se serializan con el candado del motor
+    # (la interfaz las ejecuta en un hilo aparte y lee el estado desde el hilo de Tk)
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+def grouped(selector=None):
+    # Con grupos de asignación (allocation_groups) la operación toma los candados de los grupos cuyos bloques asigna
+    # o libera antes que el candado del motor: los que devuelve el método 'selector' o, sin selector, todos.
+    # Si el hilo ya tiene grupos (un lote, ConcurrentVolume) deben alcanzar: no se toman otros fuera de orden
+    def decorate(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            groups = self.groups
+            if groups is None:
+                return method(self, *args, **kwargs)
+            held = groups.held()
+            while True:
+                needed = self._select_groups(selector, args, kwargs)
+                if needed <= held:
+                    return method(self, *args, **kwargs)
+                if held:
+                    raise FileSystemError("La operación necesita grupos de asignación que no se tomaron antes.",
+                                          title="Grupos de Asignación")
+                with groups.hold(needed):
+                    # Los bloques del archivo pueden haber cambiado de grupo mientras se esperaba
+                    if self._select_groups(selector, args, kwargs) <= needed:
+                        return method(self, *args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def timed(method):
+    # Con las métricas activas se mide la latencia de la operación (incluida la espera por el candado);
+    # desactivadas, el único costo es comprobar que self.metrics es None
+    name = method.__name__
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        metrics = self.metrics
+        if metrics is None:
+            return method(self, *args, **kwargs)
+        started = time.perf_counter()
+        try:
+            result = method(self, *args, **kwargs)
+        except BaseException:
+            metrics.observe(name, time.perf_counter() - started, failed=True)
+            raise
+        metrics.observe(name, time.perf_counter() - started)
+        return result
+    return wrapper
+
+
+def _split_runs(runs, limit, moving=()):
+    # Segmentos [inicio, longitud, se_mueve] de los rangos de un archivo: se mueve la parte anterior a 'limit'
+    # y los clusters de las posiciones de 'moving' (posición = número de cluster dentro del archivo)
+    segments = []
+    position = 0
+    for start, length in runs:
+        points = {start, start + length}
+        if start < limit < start + length:
+            points.add(limit)
+        for offset in moving:
+            if position <= offset < position + length:
+                block = start + offset - position
+                points.update((block, block + 1))
+        points = sorted(points)
+        for first, last in zip(points, points[1:]):
+            segments.append([first, last - first, first < limit or first - start + position in moving])
+        position += length
+    return segments
+
+
+def _replace_runs(segments, target):
+    # Rangos de un archivo con los segmentos que se mueven reemplazados, en orden, por los rangos de 'target'
+    # (se unen los rangos consecutivos que quedan pegados)
+    pending = [list(run) for run in target]
+    result = []
+    for start, length, moved in segments:
+        pieces = []
+        while moved and length > 0:
+            take = min(length, pending[0][1])
+            pieces.append([pending[0][0], take])
+            pending[0][0] += take
+            pending[0][1] -= take
+            if not pending[0][1]:
+                pending.pop(0)
+            length -= take
+        if not moved:
+            pieces.append([start, length])
+        for piece in pieces:
+            if result and result[-1][0] + result[-1][1] == piece[0]:
+                result[-1][1] += piece[1]
+            else:
+                result.append(piece)
+    return result
+
+
+class FileSystemEngine:
+    """Motor de simulación sin interfaz: mantiene el estado del disco y ejecuta las operaciones"""
+
+    # Sistemas de archivos que pueden repartir un archivo en varios rangos no contiguos
+    FRAGMENTED_FORMATS = {"FAT32", "NTFS"}
+
+    # Tamaño de cada trozo al copiar un archivo entre dispositivos (para informar el progreso)
+    COPY_CHUNK = 1024 * 1024
+
+    # Fracción del disco que reserva cada formato para sus estructuras (valores por defecto)
+    RESERVE_RATIOS = {"FAT32": 0.16, "NTFS": 0.125, "EXT": 0.05}
+
+    # Bloques máximos por archivo según el sistema de archivos (valores por defecto)
+    MAX_BLOCKS_PER_FILE = {"FAT32": 200, "NTFS": 800, "EXT": 800}
+
+    # Rangos modificados que se acumulan antes de pasar a "redibujar todo"
+    MAX_DIRTY_REGIONS = 4096
+
+    # Representaciones del espacio libre: un bit por bloque, o un árbol de runs que no depende del tamaño del disco
+    FREE_SPACE_MAPS = {"bitmap": FreeSpaceBitmap, "extents": FreeExtentTree}
+
+    # Con free_space_map="auto", discos más grandes que esto usan el árbol de runs (el mapa de bits ocuparía más de 2 MB)
+    BITMAP_MAX_BLOCKS = 1 << 24
+
+    # Extensiones del archivo de estado que se guardan en SQLite con carga diferida (las demás, en JSON)
+    STORE_SUFFIXES = ('.db', '.sqlite')
+
+    # Tablas por archivo del motor que se guardan en el estado
+    FILE_TABLES = ("block_usage", "file_extents", "file_sizes", "allocation_table", "inodes", "file_compression")
+
+    # Códigos de operación aceptados por execute() y execute_batch()
+    OPERATIONS = {
+        "create": "create_file",
+        "replace": "replace_file",
+        "move": "move_file",
+        "delete": "delete_file",
+        "mkdir": "create_folder",
+        "mvdir": "move_folder",
+        "relocate": "relocate_file",
+        "format": "apply_algorithm",
+        "read": "read_blocks",
+        "import": "import_batch",
+    }
+
+    def __init__(self, current_directory=None, data_file='filesystem_data.json', host_io=True, load=True, allocation_policy="first",
+                 wal=True, wal_sync_interval=0.0, checkpoint_interval=1000, disk_image=None, cluster_size=4096, disk_blocks=1000,
+                 reserve_ratios=None, max_blocks_per_file=None, cache_blocks=0, cache_policy="lru", read_ahead=8,
+                 free_space_map="auto", io_trace=None, dedup=False, compression=None, allocation_groups=None):
+        self.current_directory = current_directory or os.getcwd()  # Directorio inicial (Donde está el proyecto)
+        self.lock = threading.RLock()  # Protege el estado entre el hilo de E/S y el de la interfaz
+        # Grupos de asignación con candado propio (None = solo el candado del motor, ver grouped)
+        self.groups = AllocationGroups(allocation_groups) if allocation_groups else None
+        self._busy = set()  # Rutas con una operación en curso que soltó el candado (copia de un movimiento, reserva de bloques)
+        self.data_file = data_file  # Archivo donde se guarda el estado entre sesiones (None = solo en memoria)
+        # Con extensión .db el estado va a SQLite y al abrir solo se lee el superbloque (ver _load_store)
+        self.store = StateStore(data_file) if data_file and data_file.endswith(self.STORE_SUFFIXES) else None
+        self._lazy = {}  # Estructuras que se cargan la primera vez que se usan: nombre -> función que la carga
+        self._stored_mft = None  # MFT guardada en el último checkpoint (para escribir solo sus cambios)
+        # Si es False no se escribe nada en el disco real (útil para simulaciones masivas).
+        # Con una imagen de disco el contenido va a la imagen y tampoco se tocan los archivos reales
+        self.host_io = host_io and disk_image is None
+        self.disk_image_path = disk_image  # Imagen preasignada del disco simulado (opcional)
+        self.disk_image = None
+        self.cluster_size = cluster_size  # Bytes por bloque (cluster) en la imagen
+        self.allocation_table = {}  # Allocation Table FAT32
+        self.fat = None  # Tabla FAT con las cadenas de clusters (solo con FAT32)
+        self.journal = Journal()  # Journal EXT
+        self.inodes = {}  # Tabla de inodos EXT (archivo -> inodo, bloques y ruta)
+        self.next_inode = 11  # Los inodos 1-10 están reservados en EXT
+        self.mft = MasterFileTable()  # MFT NTFS (registros de 1 KB con índice por directorio)
+        self.disk_blocks = disk_blocks  # N total de bloques(clusters) para la simulación
+        # Los archivos se identifican por su ruta completa (dos archivos con el mismo nombre en carpetas distintas no chocan)
+        self.namespace = Namespace()  # Árbol de directorios del disco simulado
+        self.block_usage = {}  # Uso de bloques por archivo
+        self.file_extents = {}  # Rangos [inicio, longitud] ocupados por cada archivo
+        self.file_sizes = {}  # Tamaño en bytes del contenido de cada archivo
+        self.file_compression = {}  # Archivos guardados comprimidos: ruta -> [modo, bytes guardados]
+        if compression is not None and compression not in COMPRESSORS:
+            raise ValueError(f"Modo de compresión desconocido: {compression}")
+        self.compression = compression  # Compresión de los archivos nuevos si no se indica otra (None = sin comprimir)
+        # Almacén por contenido: los clusters iguales se guardan una sola vez (None = sin deduplicación)
+        self.block_store = BlockStore() if dedup else None
+        self._stored_blocks = None  # Almacén guardado en el último checkpoint (para escribir solo sus cambios)
+        self.reserved_blocks = 0  # Bloques reservados para estructuras de sistema de archivos (al inicio del disco)
+        self.selected_algorithm = ""  # Algoritmo seleccionado por el usuario
+        self.allocation_policy = allocation_policy  # first, next o best fit
+        if free_space_map != "auto" and free_space_map not in self.FREE_SPACE_MAPS:
+            raise ValueError(f"Mapa de espacio libre desconocido: {free_space_map}")
+        self.free_space_map = free_space_map  # "bitmap", "extents" o "auto" (según el tamaño del disco)
+        self.free_space = self._new_free_space()  # Mapa de bloques libres
+        # Cursor de next-fit de cada región de asignación (inicio de la región -> bloque); no se guarda: empieza de
+        # nuevo en cada checkpoint y en cada formato, igual al reproducir el log
+        self.region_cursors = {}
+        # Rangos modificados desde la última consulta, como (inicio, longitud, archivo o None);
+        # None en lugar de la lista significa "todo el disco" (la vista lo redibuja completo)
+        self.dirty_regions = None
+
+        # Mapeo de bloques máximos por archivo y fracción reservada según el sistema de archivos
+        # (se pueden cambiar por formato, por ejemplo para comparar configuraciones)
+        self.max_blocks_per_file = dict(self.MAX_BLOCKS_PER_FILE, **(max_blocks_per_file or {}))
+        self.reserve_ratios = dict(self.RESERVE_RATIOS, **(reserve_ratios or {}))
+
+        # Log de operaciones: cada operación se anexa al log y el estado completo
+        # solo se escribe en los checkpoints (cada checkpoint_interval operaciones)
+        self.wal = WriteAheadLog(data_file + '.wal', sync_interval=wal_sync_interval) if wal and data_file else None
+        self.checkpoint_interval = checkpoint_interval
+        self._replaying = False
+
+        # Instantáneas en memoria, de la más antigua a la más reciente; solo la última registra cambios
+        self.snapshots = []
+
+        # Caché de bloques simulada delante del disco (None = sin caché); solo lleva la cuenta de aciertos y E/S
+        self.cache = BufferCache(cache_blocks, cache_policy, read_ahead) if cache_blocks else None
+        # Registro de los pedidos que llegan al disco (iosched.IOTrace) para simularlos con un planificador
+        # y un modelo de HDD o SSD; con caché solo llegan los fallos y las escrituras
+        self.io_trace = io_trace
+        if self.cache is not None:
+            self.cache.device = io_trace
+
+        # Métricas de las operaciones (None = desactivadas, ver enable_metrics)
+        self.metrics = None
+        self.metrics_exporter = None
+
+        if load:
+            self.load_data()
+        else:
+            self._open_disk_image()
+
+    def _open_disk_image(self):
+        if self.disk_image_path and self.disk_image is None:
+            self.disk_image = DiskImage(self.disk_image_path, self.disk_blocks, self.cluster_size)
+
+    @property
+    def used_blocks(self):
+        # Bloques ya usados (incluye los reservados), según el mapa de bloques libres
+        return self.free_space.used_count
+
+    @property
+    def logical_used_blocks(self):
+        # Bloques que ocuparían los archivos sin deduplicación ni compresión (más los reservados); recorre los archivos
+        return self.reserved_blocks + sum(self.block_usage.values())
+
+    @locked
+    def storage_usage(self):
+        """Uso lógico (bloques pedidos por los archivos) frente al físico (bloques ocupados en el disco), con
+        lo que ahorran la deduplicación y la compresión"""
+        logical = self.logical_used_blocks - self.reserved_blocks
+        physical = self.used_blocks - self.reserved_blocks
+        usage = {
+            'logical_blocks': logical,
+            'physical_blocks': physical,
+            'saved_blocks': logical - physical,
+            'ratio': logical / physical if physical else 1.0,
+            'compressed_files': len(self.file_compression),
+            'compression': self.compression,
+            'dedup': self.block_store is not None,
+        }
+        if self.block_store is not None:
+            usage['block_store'] = self.block_store.stats()
+        return usage
+
+    @property
+    def next_available_block(self):
+        # Siguiente bloque desde donde continúa la búsqueda (política next-fit)
+        return self.free_space.cursor
+
+    @timed
+    @grouped()
+    @locked
+    def apply_algorithm(self, algorithm):
+        """Convierte el volumen al formato 'algorithm' sin perder archivos: lee los rangos de cada archivo desde las
+        estructuras del formato actual, saca de la nueva zona reservada los bloques que quedaron dentro y arma las
+        estructuras del formato nuevo (cadena FAT, registros MFT o inodos con su journal). Devuelve un resumen"""
+        if algorithm not in ALGORITHMS:
+            raise FileSystemError("Por favor, selecciona un sistema de archivos válido.", title="Selección Inválida")
+        if algorithm == "FAT32" and self.disk_blocks > MAX_CLUSTERS:
+            raise FileSystemError(f"FAT32 admite como máximo {MAX_CLUSTERS} clusters; el disco tiene {self.disk_blocks}.",
+                                  title="Selección Inválida")
+
+        self._load_derived()
+        started = time.perf_counter()
+        source = self.selected_algorithm
+        reserved = self._reserved_for(algorithm)
+        data_start = max(reserved, 2) if algorithm == "FAT32" else reserved
+        # Orden fijo: al reproducir el log la conversión asigna exactamente los mismos bloques
+        files = sorted(self.file_extents)
+        self._check_conversion(algorithm, files)
+
+        # Todo lo que puede fallar se calcula antes de tocar el disco. Una cadena FAT no puede compartir
+        # clusters: al pasar a FAT32 cada bloque compartido queda para un archivo y los demás reciben una copia
+        unshare = self.block_store is not None and algorithm == "FAT32"
+        free_space, moves = self._plan_conversion(files, reserved, data_start, unshare)
+        mft = None
+        if algorithm == "NTFS":
+            new_extents = {file_path: extents for file_path, _, _, extents in moves}
+            mft = self._convert_mft(source, files, ChainMap(new_extents, self.file_extents), reserved)
+
+        if self.snapshots:
+            self.snapshots[-1].formatted = True
+            for file_path in files:
+                self._capture(file_path)
+        blocks_moved = 0
+        for file_path, inside, target, extents in moves:
+            # Copiar los bloques que quedaron dentro de la nueva zona reservada
+            self._read_runs(inside)
+            if self.disk_image is not None:
+                self.disk_image.copy(inside, target)
+            if self.cache is not None:
+                self.cache.invalidate(inside)
+            self._write_runs(target)
+            self.file_extents[file_path] = extents
+            blocks_moved += sum(length for _, length in target)
+        if self.block_store is not None:
+            # Las copias son bloques propios de cada archivo y lo que quedó en la zona reservada deja el almacén
+            self.block_store.recount(self.file_extents, data_start)
+
+        self.selected_algorithm = algorithm
+        self.reserved_blocks = reserved
+        self.free_space = free_space
+        self.region_cursors = {}
+        self.dirty_regions = None
+        self._convert_structures(source, files, mft)
+        self._log("format", algorithm)
+        return {
+            'source': source or None,
+            'target': algorithm,
+            'files': len(files),
+            'files_moved': len(moves),
+            'blocks_moved': blocks_moved,
+            'reserved_blocks': reserved,
+            'elapsed_s': round(time.perf_counter() - started, 6),
+        }
+
+    def _check_conversion(self, algorithm, files):
+        # Archivos que el formato nuevo no puede representar: la conversión no empieza
+        max_blocks = self.max_blocks_per_file.get(algorithm, 0)
+        for file_path in files:
+            if self.block_usage.get(file_path, 0) > max_blocks:
+                raise BlockLimitError(f"El archivo '{file_path}' excede el número máximo de bloques permitidos para "
+                                      f"{algorithm} ({max_blocks} bloques).")
+            if algorithm == "NTFS" and len(os.path.basename(file_path).encode('utf-8')) > MAX_NAME_BYTES:
+                raise InvalidNameError(f"El nombre de '{file_path}' excede los {MAX_NAME_BYTES} bytes que admite un registro de la MFT.")
+
+    def _plan_conversion(self, files, reserved, data_start, unshare=False):
+        # Mapa de bloques libres del formato nuevo y movimientos (archivo, rangos que se mueven, rangos de destino,
+        # rangos finales del archivo). Se mueve lo que quedó dentro de la zona reservada y, con 'unshare', los
+        # clusters cuyo bloque ya conserva otro archivo. Los rangos salen de las estructuras del formato actual
+        free_space = self._new_free_space()
+        free_space.search_steps = self.free_space.search_steps
+        free_space.mark_used(0, reserved)
+        overlapping = []
+        kept = set()
+        for file_path in files:
+            runs = self.file_runs(file_path)
+            for start, length in runs:
+                free_space.mark_used(start, length)
+            moving = self.block_store.unshare(runs, kept) if unshare else ()
+            if moving or any(start < data_start for start, _ in runs):
+                overlapping.append((file_path, _split_runs(runs, data_start, moving)))
+
+        free_space.cursor = data_start
+        moves = []
+        for file_path, segments in overlapping:
+            inside = [[start, length] for start, length, moved in segments if moved]
+            target = free_space.allocate_extents(sum(length for _, length in inside), self.allocation_policy, data_start)
+            if target is None:
+                raise NoSpaceError(f"No hay espacio para sacar '{file_path}' de la zona reservada de {self.disk_blocks} bloques.")
+            moves.append((file_path, inside, target, _replace_runs(segments, target)))
+        free_space.cursor = min(max(self.free_space.cursor, data_start), self.disk_blocks)
+        return free_space, moves
+
+    def _convert_mft(self, source, files, extents, reserved):
+        # MFT del formato nuevo armada en memoria (los números de registro se conservan si ya era NTFS);
+        # se comprueba que quepa en la zona reservada de la imagen antes de empezar a mover bloques
+        entries = {}
+        for file_path in files:
+            entry = {'size': self.file_sizes.get(file_path, 0), 'blocks': self.block_usage[file_path], 'path': file_path}
+            if source == "NTFS" and file_path in self.mft:
+                entry['record'] = self.mft.files[file_path]
+            entries[file_path] = entry
+        mft = MasterFileTable.rebuild(entries, extents)
+        if self.disk_image is not None:
+            capacity = self.disk_image.capacity(reserved)
+            if FIRST_USER_RECORD * RECORD_SIZE <= capacity < mft.nbytes:
+                raise NoSpaceError(f"La MFT ({mft.nbytes} bytes) no cabe en la zona reservada ({capacity} bytes).")
+        return mft
+
+    def _convert_structures(self, source, files, mft):
+        # Vaciar las estructuras de todos los formatos y armar las del nuevo con los rangos finales de cada archivo
+        numbers = {file_path: inode['inode'] for file_path, inode in self.inodes.items()} if source == "EXT" else {}
+        for table in (self.allocation_table, self.inodes):
+            for file_path in list(table):
+                del table[file_path]
+        written = self.mft.records_written
+        self.mft.detach()
+        self.mft = mft if mft is not None else MasterFileTable()
+        self.mft.records_written += written  # El contador de las métricas sigue acumulando
+        self._place_mft()
+        self._rebuild_fat()
+
+        for file_path in files:
+            extents = self.file_extents[file_path]
+            blocks = self.block_usage[file_path]
+            end_block = extents[-1][0] + extents[-1][1] - 1
+            if self.selected_algorithm == "FAT32":
+                self.allocation_table[file_path] = {'blocks': blocks, 'start_block': self.fat.link(extents),
+                                                    'end_block': end_block, 'path': file_path}
+            elif self.selected_algorithm == "EXT":
+                number = numbers.get(file_path)
+                if number is None:
+                    number = self.next_inode
+                    self.next_inode += 1
+                self.inodes[file_path] = {'inode': number, 'blocks': blocks, 'extents': extents, 'path': file_path}
+                self.journal.append(file_path, "convert", number, extents[0][0], end_block, file_path)
+                if self.metrics is not None:
+                    self.metrics.inc('journal_appends_total')
+            self._write_metadata(file_path, extents)
+
+    def _reserved_for(self, algorithm):
+        # Fórmula Base: Porcentaje de Reserva = (Size Particion) / (Size Cluster)
+        # En este caso, se utiliza el porcentaje común de espacio reservado por File System
+
+        if algorithm == "FAT32":
+            # Suponemos que la Allocation Table ocupa 16% del disco en total (por defecto)
+            return int(self.disk_blocks * self.reserve_ratios["FAT32"])
+        elif algorithm == "NTFS":
+            # NTFS reserva aproximadamente el 12.5% del espacio del disco para la MFT (por defecto)
+            return int(self.disk_blocks * self.reserve_ratios["NTFS"])
+        elif algorithm == "EXT":
+            # EXT reserva el 5% del espacio total de la partición para el Journal (por defecto)
+            return int(self.disk_blocks * self.reserve_ratios["EXT"])
+        return 0
+
+    def calculate_reserved_blocks(self):
+        """Calcula los bloques reservados según el algoritmo seleccionado"""
+        self.reserved_blocks = self._reserved_for(self.selected_algorithm)
+        self._rebuild_free_space()
+
+    def _new_free_space(self):
+        kind = self.free_space_map
+        if kind == "auto":
+            kind = "bitmap" if self.disk_blocks <= self.BITMAP_MAX_BLOCKS else "extents"
+        space = self.FREE_SPACE_MAPS[kind](self.disk_blocks)
+        return SharedFreeSpace(space) if self.groups is not None else space
+
+    def group_regions(self):
+        """Rangos [inicio, fin) de los grupos de asignación del formato actual (vacío sin grupos). En FAT32 hay uno
+        solo porque la FAT es una única cadena; en los demás cada grupo puede guardar el archivo más grande"""
+        if self.groups is None:
+            return []
+        start = self._data_start()
+        span = max(self.disk_blocks - start, 1)
+        count = 1
+        if self.selected_algorithm != "FAT32":
+            largest = max(self.max_blocks_per_file.get(self.selected_algorithm, 1), 1)
+            count = max(1, min(self.groups.count, span // largest))
+        size = span // count
+        return [(start + i * size, self.disk_blocks if i == count - 1 else start + (i + 1) * size) for i in range(count)]
+
+    def _groups_of(self, extents):
+        # Grupos donde caen los rangos (los bloques antes de la zona de datos cuentan como del primero)
+        regions = self.group_regions()
+        if not regions:
+            return set()
+        start, size = regions[0][0], regions[0][1] - regions[0][0]
+        last = len(regions) - 1
+        found = set()
+        for run_start, length in extents:
+            first = min(max(run_start - start, 0) // size, last)
+            end = min(max(run_start + length - 1 - start, 0) // size, last)
+            found.update(range(first, end + 1))
+        return found
+
+    def _groups_in(self, region):
+        # Grupos que se solapan con la región [inicio, fin) (todos sin región)
+        if region is None:
+            return set(range(self.groups.count))
+        return self._groups_of([[region[0], max(region[1] - region[0], 1)]])
+
+    def _select_groups(self, selector, args, kwargs):
+        if selector is None:
+            return set(range(self.groups.count))
+        with self.lock:
+            try:
+                return getattr(self, selector)(*args, **kwargs)
+            except (FileSystemError, TypeError, ValueError, IndexError):
+                # Argumentos inválidos: la operación los rechaza después; mientras tanto se toman todos
+                return set(range(self.groups.count))
+
+    def _store_groups(self, file_name, blocks=None, file_content=None, directory=None, region=None, compression=None):
+        # Guardar un archivo asigna en la región (o en cualquier grupo) y libera sus bloques anteriores
+        extents = self.file_extents.get(self._key(file_name, directory)) or ()
+        return self._groups_in(region) | self._groups_of(extents)
+
+    def _delete_groups(self, file_name, directory=None):
+        return self._groups_of(self.file_extents.get(self._key(file_name, directory)) or ())
+
+    @contextlib.contextmanager
+    def exclusive(self):
+        """Contexto con todos los grupos de asignación (si hay) y el candado del motor: lo que usa quien trabaja con
+        el estado y llama a operaciones que asignan o liberan bloques (por ejemplo, el desfragmentador)"""
+        with (self.groups.hold() if self.groups is not None else contextlib.nullcontext()), self.lock:
+            yield
+
+    def _rebuild_free_space(self):
+        # Reconstruir el mapa de bloques libres a partir de la región reservada y los archivos
+        cursor = self.free_space.cursor
+        steps = self.free_space.search_steps
+        self.free_space = self._new_free_space()
+        self.free_space.search_steps = steps  # El contador de búsquedas sigue acumulando
+        self.free_space.mark_used(0, self.reserved_blocks)
+        for extents in self.file_extents.values():
+            for start, length in extents:
+                self.free_space.mark_used(start, length)
+        self.free_space.cursor = min(max(cursor, self.reserved_blocks), self.disk_blocks)
+        self.dirty_regions = None
+        self._rebuild_fat()
+        self._place_mft()
+
+    def _rebuild_fat(self):
+        # La FAT se deriva de los rangos de cada archivo, por eso no se guarda en el JSON
+        if self.selected_algorithm != "FAT32":
+            self.fat = None
+            return
+        self.fat = FileAllocationTable(self.disk_blocks, self._data_start())
+        for file_name, entry in self.allocation_table.items():
+            extents = self.file_extents.get(file_name)
+            if extents:
+                start_block = self.fat.link(extents)
+                if entry['start_block'] != start_block:
+                    entry['start_block'] = start_block
+                    self.allocation_table[file_name] = entry  # Reasignar: el estado en SQLite guarda lo reasignado
+
+    def _mft_storage(self):
+        # Con NTFS y una imagen de disco, la MFT vive en la zona reservada al inicio de la imagen
+        if self.selected_algorithm != "NTFS" or self.disk_image is None:
+            return None
+        if self.disk_image.capacity(self.reserved_blocks) < FIRST_USER_RECORD * RECORD_SIZE:
+            return None
+        return self.disk_image.clusters(0, self.reserved_blocks)
+
+    def _place_mft(self):
+        # Mover la MFT a la zona reservada de la imagen (o de vuelta a memoria) si cambió el formato
+        storage = self._mft_storage()
+        if storage is None:
+            self.mft.detach()
+        elif not self.mft.fixed or len(self.mft.data) != len(storage):
+            self._rebuild_mft(storage)
+
+    def _rebuild_mft(self, storage=None):
+        # Los runs de cada registro se derivan de los rangos de cada archivo
+        written = self.mft.records_written
+        self.mft = MasterFileTable.rebuild(self.mft.to_dict(), self.file_extents, storage)
+        self.mft.records_written += written
+
+    @locked
+    def fragmentation(self):
+        """Métricas de fragmentación: archivos partidos, rangos por archivo y fragmentación del espacio libre"""
+        files = len(self.file_extents)
+        extents = sum(len(runs) for runs in self.file_extents.values())
+        fragmented = sum(1 for runs in self.file_extents.values() if len(runs) > 1)
+        free = self.free_space.free_count
+        largest = self.free_space.largest_free_run()[1]
+        return {
+            'files': files,
+            'fragmented_files': fragmented,
+            'extents_per_file': extents / files if files else 0.0,
+            # Fracción de rangos que sobran (0 = cada archivo ocupa un único rango contiguo)
+            'score': (extents - files) / extents if extents else 0.0,
+            # 0 = todo el espacio libre es un único hueco, cerca de 1 = espacio libre muy disperso
+            'free_space_fragmentation': 1 - largest / free if free else 0.0,
+        }
+
+    def _check_block_limit(self, blocks):
+        max_blocks = self.max_blocks_per_file.get(self.selected_algorithm, 0)
+        if blocks > max_blocks:
+            raise BlockLimitError(f"El archivo excede el número máximo de bloques permitidos para {self.selected_algorithm} ({max_blocks} bloques).")
+
+    def _free_extents(self, extents):
+        # Los bloques que quedaron dentro de la región reservada siguen perteneciendo a ella.
+        # Con deduplicación solo se liberan los bloques que ya no usa ningún otro archivo
+        freed = 0
+        runs = extents if self.block_store is None else self.block_store.release(extents)
+        for start, length in runs:
+            if start + length > self.reserved_blocks:
+                first = max(start, self.reserved_blocks)
+                self.free_space.free(first, start + length - first)
+                freed += start + length - first
+        if self.metrics is not None:
+            self.metrics.inc('blocks_freed_total', freed)
+        if self.cache is not None:
+            self.cache.invalidate(runs)
+        self._touch(extents)
+
+    def _mark_extents(self, extents, file_path=None, digests=None):
+        # 'digests' (posiciones y huellas de sus clusters) vuelve a registrar el archivo en el almacén por contenido
+        if self.block_store is not None:
+            self.block_store.retain(extents, digests)
+        for start, length in extents:
+            self.free_space.mark_used(start, length)
+        if self.metrics is not None:
+            self.metrics.inc('blocks_allocated_total', sum(length for _, length in extents))
+        self._touch(extents, file_path)
+
+    def _touch(self, extents, file_path=None):
+        # Anotar los rangos modificados para que el mapa de bloques redibuje solo esa zona
+        dirty = self.dirty_regions
+        if dirty is None:
+            return
+        if len(dirty) + len(extents) > self.MAX_DIRTY_REGIONS:
+            # Demasiados cambios sin consultar: es más barato redibujar todo
+            self.dirty_regions = None
+            return
+        for start, length in extents:
+            dirty.append((start, length, file_path))
+
+    @locked
+    def take_dirty_regions(self):
+        """Devuelve los rangos modificados desde la llamada anterior (None = todo el disco) y reinicia la cuenta"""
+        dirty, self.dirty_regions = self.dirty_regions, []
+        return dirty
+
+    def _data_start(self):
+        # Primer bloque que pueden usar los archivos; en FAT32 los clusters de datos empiezan en el 2
+        if self.selected_algorithm == "FAT32":
+            return max(self.reserved_blocks, 2)
+        return self.reserved_blocks
+
+    def _allocate(self, blocks, region=None):
+        # Devuelve los rangos asignados o None si no hay espacio.
+        # 'region' = [inicio, fin) limita la búsqueda a un grupo de bloques (como los grupos de asignación de EXT)
+        if blocks > self.free_space.free_count:
+            return None
+        start, end = self._data_start(), None
+        if region is not None:
+            start, end = max(start, region[0]), region[1]
+        if self.selected_algorithm in self.FRAGMENTED_FORMATS:
+            # Se prefiere un run contiguo, pero la cadena puede saltar los huecos del disco
+            extents = self._allocate_in(region, 'allocate_extents', blocks, self.allocation_policy, start, end)
+        else:
+            start_block = self._allocate_in(region, 'allocate', blocks, self.allocation_policy, start, end)
+            extents = None if start_block is None else [[start_block, blocks]]
+        if extents is not None and self.metrics is not None:
+            self.metrics.inc('blocks_allocated_total', blocks)
+        return extents
+
+    def _allocate_in(self, region, name, *args):
+        # Dentro de una región next-fit sigue el cursor propio de la región y no mueve el del disco: con grupos de
+        # asignación el orden en que asignan grupos distintos no cambia dónde asigna cada uno (el log se reproduce igual)
+        if region is None:
+            return getattr(self.free_space, name)(*args)
+        cursor = self.region_cursors.get(region[0], region[0])
+        if self.groups is not None:
+            result, cursor = self.free_space.with_cursor(cursor, name, *args)
+        else:
+            result, cursor = with_cursor(self.free_space, cursor, name, *args)
+        self.region_cursors[region[0]] = cursor
+        return result
+
+    def _allocate_content(self, payload, blocks, region=None):
+        # Asignación según el contenido: solo los clusters con datos ocupan bloques (los vacíos del final quedan
+        # sin asignar, como en un archivo disperso) y con deduplicación los clusters que ya están en el almacén
+        # reutilizan su bloque. Devuelve (rangos del archivo, rangos nuevos, [(bloque, huella)] por cluster)
+        count = min(chunk_count(payload, self.cluster_size), blocks)
+        store = self.block_store
+        if store is None:
+            extents = self._allocate(count, region)
+            return extents, extents, None
+
+        digests = chunk_digests(payload, self.cluster_size, count)
+        share = self.selected_algorithm != "FAT32"  # Una cadena FAT no puede compartir clusters con otra
+        slots = []  # Por cluster: (bloque que ya existe, None) o (None, índice del bloque nuevo)
+        fresh = {}  # huella -> índice del bloque nuevo que la guarda (clusters repetidos dentro del archivo)
+        new_blocks = 0
+        for digest in digests:
+            if share:
+                block = store.lookup(digest)
+                if block is not None:
+                    slots.append((block, None))
+                    continue
+                if digest in fresh:
+                    slots.append((None, fresh[digest]))
+                    continue
+                fresh[digest] = new_blocks
+            slots.append((None, new_blocks))
+            new_blocks += 1
+
+        allocated = self._allocate(new_blocks, region) if new_blocks else []
+        if allocated is None:
+            return None, None, None
+        new = [block for start, length in allocated for block in range(start, start + length)]
+        chunks = [(new[index] if block is None else block, digest) for (block, index), digest in zip(slots, digests)]
+        extents = []
+        for block, _ in chunks:
+            if extents and extents[-1][0] + extents[-1][1] == block:
+                extents[-1][1] += 1
+            else:
+                extents.append([block, 1])
+        return extents, allocated, chunks
+
+    def _write_chunks(self, payload, chunks, allocated):
+        # Con el almacén solo se escriben los clusters nuevos, completos con ceros: la huella incluye el relleno
+        # y otro archivo puede reutilizar el cluster entero
+        size = self.cluster_size
+        data = memoryview(payload.ljust(len(chunks) * size, b'\0'))
+        new = {block for start, length in allocated for block in range(start, start + length)}
+        writes = []  # [posición del cluster, bloque, cantidad]
+        for position, (block, _) in enumerate(chunks):
+            if block not in new:
+                continue
+            new.discard(block)
+            last = writes[-1] if writes else None
+            if last is not None and last[0] + last[2] == position and last[1] + last[2] == block:
+                last[2] += 1
+            else:
+                writes.append([position, block, 1])
+        for position, block, count in writes:
+            self.disk_image.write([[block, count]], data[position * size:(position + count) * size])
+
+    @staticmethod
+    def _check_file_arguments(file_name, blocks, file_content, directory=None, region=None):
+        # Tipos y rangos antes de tocar cualquier estructura: un valor inválido que llega a la asignación
+        # dejaría el motor a medio actualizar (y se guardaría en el siguiente checkpoint)
+        if not isinstance(file_name, str) or not isinstance(file_content, str):
+            raise InvalidInputError("El nombre y el contenido del archivo deben ser texto.")
+        if not isinstance(blocks, int) or isinstance(blocks, bool) or blocks < 1:
+            raise InvalidInputError(f"'{blocks}' no es una cantidad de bloques válida (debe ser un entero positivo).")
+        if directory is not None and not isinstance(directory, str):
+            raise InvalidInputError("La carpeta debe ser una ruta en texto.")
+        if region is not None and (not isinstance(region, (list, tuple)) or len(region) != 2 or not all(
+                isinstance(limit, int) and not isinstance(limit, bool) and limit >= 0 for limit in region)):
+            raise InvalidInputError("La región debe ser [inicio, fin) con dos bloques enteros.")
+
+    def _stored_size(self, file_path):
+        # Bytes guardados en los bloques del archivo (los del contenido comprimido si está comprimido)
+        entry = self.file_compression.get(file_path)
+        return entry[1] if entry is not None else self.file_sizes.get(file_path, 0)
+
+    def _store_file(self, file_name, blocks, file_content, directory, journal_op, space_message, region=None,
+                    compression=None):
+        # Con grupos de asignación los bloques de un archivo sin deduplicación ni compresión se reservan soltando el
+        # candado del motor: solo quedan tomados los de sus grupos (grouped) y la ruta queda ocupada mientras tanto
+        self.lock.acquire()
+        reserving = False
+        try:
+            self._check_block_limit(blocks)
+            if self.selected_algorithm == "NTFS" and len(file_name.encode('utf-8')) > MAX_NAME_BYTES:
+                raise InvalidNameError(f"El nombre del archivo excede los {MAX_NAME_BYTES} bytes que admite un registro de la MFT.")
+            requested = self.compression if compression is None else compression
+            mode = None if requested == "none" else requested
+            if mode is not None and mode not in COMPRESSORS:
+                raise InvalidInputError(f"Modo de compresión desconocido: {requested}")
+            directory = directory or self.current_directory
+            file_path = self._key(file_name, directory)
+            self._check_not_busy(file_path)
+            self._load_derived()
+            data = file_content.encode('utf-8')
+            payload, stored_mode = compress(data, mode)
+            if self.disk_image is not None and len(payload) > self.disk_image.capacity(blocks):
+                raise NoSpaceError(f"El contenido ({len(payload)} bytes) no cabe en {blocks} bloques de {self.cluster_size} bytes.")
+
+            self._capture(file_path)
+            # Liberar primero los bloques anteriores del archivo para que puedan reutilizarse
+            old_extents = self.file_extents.get(file_path)
+            old_digests = None
+            if old_extents:
+                if self.block_store is not None:
+                    old_digests = self.block_store.positions(old_extents)
+                self._free_extents(old_extents)
+
+            chunks = None
+            if self.block_store is not None or mode is not None:
+                extents, allocated, chunks = self._allocate_content(payload, blocks, region)
+            elif self.groups is not None:
+                reserving = True
+                self._busy.add(file_path)
+                self.lock.release()
+                try:
+                    extents = allocated = self._allocate(blocks, region)
+                finally:
+                    self.lock.acquire()
+            else:
+                extents = allocated = self._allocate(blocks, region)
+            if extents is None:
+                if old_extents:
+                    self._mark_extents(old_extents, file_path, old_digests)
+                raise NoSpaceError(space_message)
+
+            if self.selected_algorithm == "NTFS":
+                # El registro de la MFT se escribe antes que el contenido: si la zona está llena no queda nada a medias
+                previous_entry = self.mft.get(file_path)
+                try:
+                    self.mft.write_file(file_path, file_path, len(data), blocks, extents)
+                except MftFullError:
+                    self._free_extents(allocated)
+                    if old_extents:
+                        self._mark_extents(old_extents, file_path, old_digests)
+                    raise NoSpaceError("La MFT no tiene más registros libres en la zona reservada.") from None
+
+            if self.disk_image is not None:
+                # El contenido se guarda en los clusters asignados dentro de la imagen
+                if chunks is not None:
+                    self._write_chunks(payload, chunks, allocated)
+                else:
+                    self.disk_image.write(extents, payload)
+            elif self.host_io:
+                try:
+                    with open(file_path, 'w') as file:
+                        file.write(file_content)
+                except OSError:
+                    # Deshacer la asignación si no se pudo escribir el archivo real
+                    self._free_extents(allocated)
+                    if old_extents:
+                        self._mark_extents(old_extents, file_path, old_digests)
+                    if self.selected_algorithm == "NTFS":
+                        self._restore_mft_entry(file_path, previous_entry)
+                    raise
+
+            if chunks is not None:
+                self.block_store.register(chunks)
+            if stored_mode is not None:
+                self.file_compression[file_path] = [stored_mode, len(payload)]
+            elif file_path in self.file_compression:
+                del self.file_compression[file_path]
+            result = self._register_file(file_name, blocks, extents, file_path, journal_op, len(data))
+            self._write_runs(allocated)  # Los clusters compartidos ya estaban en el disco
+            self._touch(extents, file_path)
+            # La región y la compresión forman parte del registro: al reproducir el log los bloques deben ser los mismos
+            extra = [list(region)] if region else []
+            if requested is not None:
+                extra = [list(region) if region else None, requested]
+            self._log(journal_op, file_name, blocks, file_content, directory, *extra)
+            return result
+        finally:
+            if reserving:
+                self._busy.discard(file_path)
+            self.lock.release()
+
+    def _register_file(self, file_name, blocks, extents, file_path, journal_op, size=0):
+        # Registrar uso de bloques
+        start_block = extents[0][0]
+        end_block = extents[-1][0] + extents[-1][1] - 1
+        self.block_usage[file_path] = blocks
+        self.file_extents[file_path] = extents
+        self.file_sizes[file_path] = size
+        self.namespace.add_file(file_path)
+
+        # Actualizar estructuras del sistema de archivos según el algoritmo
+        if self.selected_algorithm == "FAT32":
+            if file_path in self.allocation_table:
+                self.fat.release(self.allocation_table[file_path]['start_block'])
+            self.allocation_table[file_path] = {
+                'blocks': blocks,
+                'start_block': self.fat.link(extents),
+                'end_block': end_block,
+                'path': file_path
+            }
+        elif self.selected_algorithm == "EXT":
+            inode = self.inodes.get(file_path)
+            if inode is None:
+                inode = {'inode': self.next_inode}
+                self.next_inode += 1
+            inode.update({'blocks': blocks, 'extents': extents, 'path': file_path})
+            self.inodes[file_path] = inode
+            self.journal.append(file_path, journal_op, inode['inode'], start_block, end_block, file_path)
+            if self.metrics is not None:
+                self.metrics.inc('journal_appends_total')
+        self._write_metadata(file_path, extents)
+
+        return {'file': file_name, 'blocks': blocks, 'start_block': start_block, 'end_block': end_block, 'path': file_path}
+
+    @timed
+    @grouped()
+    @locked
+    def import_batch(self, entries, directory=None):
+        """Registra un lote de archivos y carpetas que ya existen fuera del volumen (importador del host) sin escribir
+        su contenido. Cada entrada es (ruta relativa, bloques, tamaño); las carpetas llevan bloques None.
+        Devuelve un resumen con archivos, carpetas, bloques asignados y errores por tipo"""
+        directory = directory or self.current_directory
+        self._load_derived()
+        summary = {'files': 0, 'directories': 0, 'blocks': 0, 'failed': 0, 'errors': {}}
+        for path, blocks, size in entries:
+            try:
+                file_path = self._key(path, directory)
+                if blocks is None:
+                    if not self.namespace.is_dir(file_path):
+                        if self.snapshots:
+                            self.snapshots[-1].directories.append(("mkdir", self.namespace.missing_directories(file_path)))
+                        self.namespace.mkdir(file_path)
+                        summary['directories'] += 1
+                    continue
+                if file_path in self.block_usage or self.namespace.is_dir(file_path):
+                    raise AlreadyExistsError(f"El archivo '{path}' ya existe en el volumen.")
+                self._check_block_limit(blocks)
+                if self.selected_algorithm == "NTFS" and len(os.path.basename(file_path).encode('utf-8')) > MAX_NAME_BYTES:
+                    raise InvalidNameError(f"El nombre del archivo excede los {MAX_NAME_BYTES} bytes que admite un registro de la MFT.")
+
+                self._capture(file_path)
+                extents = self._allocate(blocks)
+                if extents is None:
+                    raise NoSpaceError("No hay suficiente espacio disponible para importar el archivo.")
+                if self.selected_algorithm == "NTFS":
+                    try:
+                        self.mft.write_file(file_path, file_path, size, blocks, extents)
+                    except MftFullError:
+                        self._free_extents(extents)
+                        raise NoSpaceError("La MFT no tiene más registros libres en la zona reservada.") from None
+                self._register_file(os.path.basename(file_path), blocks, extents, file_path, "import", size)
+                self._write_runs(extents)
+                self._touch(extents, file_path)
+                summary['files'] += 1
+                summary['blocks'] += blocks
+            except FileSystemError as e:
+                summary['failed'] += 1
+                kind = type(e).__name__
+                summary['errors'][kind] = summary['errors'].get(kind, 0) + 1
+        # Un solo registro por lote: al reproducir el log se importa el mismo lote con los mismos resultados
+        self._log("import", [list(entry) for entry in entries], directory)
+        return summary
+
+    def _restore_mft_entry(self, file_path, entry):
+        # Volver el registro de la MFT al estado anterior a una escritura fallida
+        if entry is None:
+            self.mft.remove(file_path)
+        else:
+            self.mft.write_file(file_path, entry['path'], entry['size'], entry['blocks'], entry['runs'])
+
+    @timed
+    @grouped("_store_groups")
+    def create_file(self, file_name, blocks, file_content="", directory=None, region=None, compression=None):
+        """Crea un archivo y le asigna bloques (dentro de 'region' = [inicio, fin) si se indica); devuelve el rango asignado.
+        'compression' ("zlib", "lzma" o "none") reemplaza la compresión por defecto del motor para este archivo"""
+        if not file_name or not blocks or file_content is None:
+            raise InvalidInputError("Por favor, completa todos los campos.")
+        self._check_file_arguments(file_name, blocks, file_content, directory, region)
+        return self._store_file(file_name, blocks, file_content, directory, "create",
+                                "No hay suficiente espacio disponible para crear el archivo.", region, compression)
+
+    @timed
+    @grouped("_store_groups")
+    def replace_file(self, file_name, blocks, file_content="Contenido del archivo", directory=None, region=None,
+                     compression=None):
+        """Guarda o reemplaza un archivo, liberando los bloques que tuviera antes"""
+        if not file_name or not blocks:
+            raise InvalidInputError("Por favor, completa todos los campos.")
+        self._check_file_arguments(file_name, blocks, file_content, directory, region)
+        return self._store_file(file_name, blocks, file_content, directory, "replace",
+                                "No hay suficiente espacio disponible para guardar/reemplazar el archivo.", region,
+                                compression)
+
+    @timed
+    @grouped()
+    @locked
+    def relocate_file(self, file_path, extents):
+        """Mueve los bloques de un archivo a 'extents' sin cambiar su contenido (lo usa el desfragmentador)"""
+        self._load_derived()
+        old_extents = self.file_extents.get(file_path)
+        if old_extents is None:
+            raise MissingFileError(f"El archivo '{file_path}' no existe.")
+        if sum(length for _, length in extents) != sum(length for _, length in old_extents):
+            raise InvalidInputError("Los rangos nuevos deben tener la misma cantidad de bloques que el archivo.")
+        digests = None
+        if self.block_store is not None:
+            if self.block_store.shared(old_extents):
+                raise InvalidInputError(f"El archivo '{file_path}' comparte bloques con otros archivos y no se puede mover.")
+            digests = self.block_store.positions(old_extents)
+
+        self._capture(file_path)
+        self._read_runs(old_extents)  # Copiar el archivo implica leerlo
+        # Los bloques de destino pueden solaparse con los actuales del propio archivo
+        self._free_extents(old_extents)
+        if any(self.free_space.count_used(start, start + length) for start, length in extents):
+            self._mark_extents(old_extents, file_path, digests)
+            raise NoSpaceError("Los bloques de destino no están libres.")
+        self._mark_extents(extents, file_path, digests)
+        self._write_runs(extents)
+
+        if self.disk_image is not None:
+            self.disk_image.copy(old_extents, extents)
+        blocks = self.block_usage[file_path]  # Los clusters vacíos del final no tienen bloques
+        size = self.file_sizes.get(file_path, 0)
+        if self.selected_algorithm == "NTFS" and file_path in self.mft:
+            self.mft.write_file(file_path, file_path, size, blocks, extents)
+        self._register_file(os.path.basename(file_path), blocks, extents, file_path, "relocate", size)
+        self._log("relocate", file_path, extents)
+
+    def _key(self, name, directory=None):
+        # Clave de un archivo o carpeta: su ruta completa normalizada
+        return self.namespace.normalize(os.path.join(directory or self.current_directory, name))
+
+    def _exists(self, file_path):
+        # Los archivos importados del host solo están en el volumen (no se copia su contenido): también existen
+        return file_path in self.block_usage or (self.host_io and os.path.exists(file_path))
+
+    def _on_host(self, file_path):
+        # El archivo tiene copia real en el disco (los importados y los de antes de activar host_io no la tienen)
+        return self.host_io and os.path.exists(file_path)
+
+    def _rekey_file(self, file_path, new_path):
+        # Cambiar la ruta (clave) de un archivo en todas las estructuras, sin tocar sus bloques
+        self._load_derived()
+        self._capture(file_path)
+        self._capture(new_path)
+        for table in (self.block_usage, self.file_extents, self.file_sizes, self.allocation_table, self.inodes,
+                      self.file_compression):
+            if file_path in table:
+                table[new_path] = table.pop(file_path)
+        for entry in (self.allocation_table.get(new_path), self.inodes.get(new_path)):
+            if entry is not None:
+                entry['path'] = new_path
+        if file_path in self.mft:
+            self.mft.rename(file_path, new_path)
+        # El journal no se reescribe: un registro "move" enlaza la nueva ruta con los registros de la anterior
+        if new_path in self.inodes or self.journal.latest(file_path) is not None:
+            self._journal_file(new_path, "move", origin=file_path)
+        # El mapa de bloques identifica a cada archivo por su ruta: repintar sus bloques con la nueva
+        self._touch(self.file_extents.get(new_path, ()), new_path)
+
+    @timed
+    def move_file(self, file_name, new_directory, directory=None, progress=None, cancel=None):
+        """Mueve un archivo a otro directorio y actualiza su ruta; devuelve la nueva ruta.
+        'progress(copiados, total)' informa el avance y 'cancel' (threading.Event) permite interrumpir la copia"""
+        if not file_name or not new_directory:
+            raise InvalidInputError("Por favor, completa todos los campos.")
+
+        directory = directory or self.current_directory
+        file_path = self._key(file_name, directory)
+        new_path = self._key(file_name, new_directory)
+
+        with self.lock:
+            self._check_not_busy(file_path, new_path)
+            if not self._exists(file_path):
+                raise MissingFileError(f"El archivo '{file_name}' no existe en el directorio actual.")
+            if new_path != file_path and (new_path in self.block_usage or (self.host_io and os.path.exists(new_path))):
+                raise AlreadyExistsError(f"Ya existe un archivo '{file_name}' en '{new_directory}'.", title="Archivo Existente")
+            if new_path == file_path:
+                return new_path
+            # Guardar el estado antes de mover el archivo real (después ya no estaría en su ruta)
+            self._capture(file_path)
+            self._capture(new_path)
+            # Mientras se copia sin el candado, ninguna otra operación puede usar el origen ni el destino
+            self._busy.update((file_path, new_path))
+            tracked = file_path in self.block_usage  # Un archivo real que el volumen no conoce también se mueve
+            on_host = self._on_host(file_path)
+
+        try:
+            # La copia entre dispositivos puede tardar: se hace sin el candado
+            if on_host:
+                self._move_host_file(file_path, new_path, progress, cancel)
+
+            with self.lock:
+                # Se vuelve a comprobar lo que se comprobó antes de soltar el candado
+                if (tracked and file_path not in self.block_usage) or new_path in self.block_usage:
+                    if on_host:
+                        self._move_host_file(new_path, file_path)
+                    raise FileSystemError(f"El archivo '{file_name}' cambió durante el movimiento; no se movió.",
+                                          title="Movimiento Cancelado")
+                # Actualizar la ruta en las estructuras internas del sistema de archivos (si el volumen lo conoce)
+                if tracked:
+                    self._rekey_file(file_path, new_path)
+                    self.namespace.move_file(file_path, new_path)
+                    self._log("move", file_name, new_directory, directory)
+        finally:
+            with self.lock:
+                self._busy.difference_update((file_path, new_path))
+        return new_path
+
+    def _check_not_busy(self, *paths):
+        # Un archivo que se está copiando a otro dispositivo (o su destino) no se puede tocar hasta que termine
+        for path in paths:
+            if path in self._busy:
+                raise FileSystemError(f"'{path}' se está moviendo; intenta de nuevo cuando termine.", title="Archivo en Uso")
+
+    def _move_host_file(self, source, target, progress=None, cancel=None):
+        # En el mismo dispositivo basta con renombrar; si no se puede, se copia por trozos
+        if os.path.exists(target):
+            # os.rename reemplazaría un archivo real que el volumen no conoce
+            raise AlreadyExistsError(f"Ya existe '{target}' en el disco real.", title="Archivo Existente")
+        try:
+            os.rename(source, target)
+        except OSError:
+            if os.path.exists(target) or not os.path.exists(source):
+                raise
+        else:
+            if progress is not None:
+                size = os.path.getsize(target)
+                progress(size, size)
+            return
+
+        total = os.path.getsize(source)
+        copied = 0
+        # 'xb' falla si el destino apareció mientras tanto (y entonces no es nuestro: no se borra)
+        dst = open(target, 'xb')
+        try:
+            with open(source, 'rb') as src, dst:
+                while True:
+                    if cancel is not None and cancel.is_set():
+                        raise OperationCancelledError(f"Se canceló el movimiento de '{os.path.basename(source)}'.")
+                    chunk = src.read(self.COPY_CHUNK)
+                    if not chunk:
+                        break
+                    dst.write(chunk)
+                    copied += len(chunk)
+                    if progress is not None:
+                        progress(copied, total)
+            shutil.copystat(source, target)
+        except BaseException:
+            # No dejar una copia a medias en el destino
+            try:
+                os.remove(target)
+            except OSError:
+                pass
+            raise
+        os.remove(source)
+
+    @timed
+    @grouped("_delete_groups")
+    @locked
+    def delete_file(self, file_name, directory=None):
+        """Elimina un archivo y libera sus bloques"""
+        if not file_name:
+            raise InvalidInputError("Por favor, completa todos los campos.")
+
+        directory = directory or self.current_directory
+        file_path = self._key(file_name, directory)
+        self._check_not_busy(file_path)
+        self._load_derived()
+        if not self._exists(file_path):
+            raise MissingFileError(f"El archivo '{file_name}' no existe en el directorio actual.")
+
+        self._capture(file_path)
+        if self._on_host(file_path):
+            os.remove(file_path)
+
+        # Actualizar uso de bloques y estructuras internas
+        self.block_usage.pop(file_path, None)
+        self.file_sizes.pop(file_path, None)
+        self.file_compression.pop(file_path, None)
+        self.namespace.remove_file(file_path)
+        extents = self.file_extents.pop(file_path, None)
+        if extents:
+            self._free_extents(extents)
+            self._write_metadata(file_path, extents)
+
+        if self.selected_algorithm == "FAT32":
+            if file_path in self.allocation_table:
+                self.fat.release(self.allocation_table.pop(file_path)['start_block'])
+        elif self.selected_algorithm == "NTFS":
+            if file_path in self.mft:
+                self.mft.remove(file_path)
+        elif self.selected_algorithm == "EXT":
+            if file_path in self.inodes:
+                self._journal_file(file_path, "delete", extents)
+                del self.inodes[file_path]
+
+        self._log("delete", file_name, directory)
+
+    def _log(self, op, *args):
+        # Anexar la operación al log (salvo cuando se está reproduciendo el propio log)
+        if self.wal is not None and not self._replaying:
+            self.wal.append((op,) + args)
+
+    def _journal_file(self, file_path, op, extents=None, origin=None):
+        # Anexar un registro con el estado actual del inodo del archivo ('origin': ruta anterior de un "move";
+        # un archivo sin inodo, de otro formato, solo deja el enlace)
+        inode = self.inodes.get(file_path)
+        extents = extents or self.file_extents.get(file_path)
+        start_block = extents[0][0] if extents else None
+        end_block = extents[-1][0] + extents[-1][1] - 1 if extents else None
+        self.journal.append(file_path, op, inode['inode'] if inode is not None else None, start_block, end_block,
+                            origin or inode['path'])
+        if self.metrics is not None:
+            self.metrics.inc('journal_appends_total')
+
+    def fat_runs(self, file_path):
+        """Recorre la cadena FAT de un archivo y la devuelve como lista de rangos [inicio, longitud]"""
+        entry = self.allocation_table.get(file_path)
+        if entry is None or self.fat is None:
+            return []
+        return self.fat.runs(entry['start_block'])
+
+    def file_runs(self, file_path):
+        """Rangos de un archivo según el formato: cadena FAT, extents del inodo EXT o runs de la MFT"""
+        if self.selected_algorithm == "FAT32" and file_path in self.allocation_table:
+            return self.fat_runs(file_path)
+        if self.selected_algorithm == "EXT" and file_path in self.inodes:
+            return self.inodes[file_path].get('extents') or self.file_extents.get(file_path, [])
+        if self.selected_algorithm == "NTFS" and file_path in self.mft:
+            return self.mft.runs(file_path)
+        return self.file_extents.get(file_path, [])
+
+    def read_file_views(self, file_name, directory=None):
+        """Vistas sin copia (memoryview) del contenido del archivo dentro de la imagen de disco"""
+        if self.disk_image is None:
+            raise FileSystemError("No hay una imagen de disco configurada.")
+        file_path = self._key(file_name, directory)
+        if file_path not in self.block_usage:
+            raise MissingFileError(f"El archivo '{file_name}' no existe en el directorio actual.")
+        runs = self.file_runs(file_path)
+        self._cache_read(runs)
+        # En un archivo comprimido son las vistas del contenido comprimido
+        return self.disk_image.read_views(runs, self._stored_size(file_path))
+
+    def read_file(self, file_name, directory=None):
+        """Lee el contenido de un archivo (desde la imagen de disco o desde el disco real)"""
+        if self.disk_image is not None:
+            data = b''.join(self.read_file_views(file_name, directory))
+            entry = self.file_compression.get(self._key(file_name, directory))
+            if entry is not None:
+                data = decompress(data, entry[0])
+            return data.decode('utf-8')
+        file_path = self._key(file_name, directory)
+        if not self._exists(file_path):
+            raise MissingFileError(f"El archivo '{file_name}' no existe en el directorio actual.")
+        if file_path in self.block_usage:
+            self._cache_read(self.file_runs(file_path))
+        if not os.path.exists(file_path):
+            raise FileSystemError(f"El archivo '{file_name}' solo está en el volumen simulado (se importó sin su "
+                                  "contenido): no hay datos que leer.", title="Archivo Simulado")
+        with open(file_path, 'r') as file:
+            return file.read()
+
+    @timed
+    @locked
+    def read_blocks(self, file_name, directory=None):
+        """Simula la lectura completa de un archivo bloque a bloque (a través de la caché si hay una); devuelve los bloques leídos"""
+        file_path = self._key(file_name, directory)
+        if file_path not in self.block_usage:
+            raise MissingFileError(f"El archivo '{file_name}' no existe en el directorio actual.")
+        runs = self.file_runs(file_path)
+        self._read_runs(runs)
+        return sum(length for _, length in runs)
+
+    @locked
+    def _cache_read(self, runs):
+        # Las lecturas pueden venir del hilo de Tk: la caché se actualiza con el candado tomado
+        self._read_runs(runs)
+
+    def _read_runs(self, runs):
+        # Lectura de bloques de datos: pasa por la caché si hay una; lo que llega al disco queda en el registro de E/S
+        if self.cache is not None:
+            self.cache.read(runs)
+        elif self.io_trace is not None:
+            self.io_trace.read(runs)
+
+    def _write_runs(self, runs):
+        if self.cache is not None:
+            self.cache.write(runs)
+        elif self.io_trace is not None:
+            self.io_trace.write(runs)
+
+    def _write_metadata(self, file_path, extents):
+        # Escritura de las estructuras del formato en la zona reservada (al inicio del disco): en un HDD
+        # la distancia entre los datos y sus metadatos es parte del costo de cada operación
+        if self.io_trace is None or not self.reserved_blocks:
+            return
+        last = self.reserved_blocks - 1
+        runs = []
+        if self.selected_algorithm == "FAT32":
+            # Bloques de la FAT con las entradas de la cadena (4 bytes por cluster)
+            for start, length in sorted(extents):
+                first = min(start * 4 // self.cluster_size, last)
+                end = min((start + length - 1) * 4 // self.cluster_size, last) + 1
+                if runs and runs[-1][0] + runs[-1][1] >= first:
+                    runs[-1][1] = max(runs[-1][1], end - runs[-1][0])
+                else:
+                    runs.append([first, end - first])
+        elif self.selected_algorithm == "NTFS":
+            # Bloque del registro base del archivo en la MFT
+            record = self.mft.files.get(file_path)
+            if record is not None:
+                runs.append([min(record * RECORD_SIZE // self.cluster_size, last), 1])
+        elif self.selected_algorithm == "EXT":
+            # El journal se escribe en forma secuencial y circular dentro de la zona reservada
+            runs.append([len(self.journal) % self.reserved_blocks, 1])
+        self.io_trace.write(runs)
+
+    def list_directory(self, directory=None):
+        """Entradas (nombre, es_directorio) de una carpeta del disco simulado, generadas bajo demanda"""
+        return self.namespace.listdir(self.namespace.normalize(directory or self.current_directory))
+
+    @timed
+    @locked
+    def create_folder(self, folder_name, directory=None):
+        """Crea una carpeta en el directorio indicado; devuelve su ruta"""
+        if not folder_name:
+            raise InvalidInputError("El nombre de la carpeta no puede estar vacío.")
+
+        # Validar el nombre de la carpeta
+        if any(char in folder_name for char in r'<>:"/\|?*'):
+            raise InvalidNameError("El nombre de la carpeta contiene caracteres inválidos.")
+
+        folder_path = self._key(folder_name, directory)
+        if self.namespace.exists(folder_path) or (self.host_io and os.path.exists(folder_path)):
+            raise AlreadyExistsError(f"La carpeta '{folder_name}' ya existe en el directorio actual.")
+
+        if self.snapshots:
+            self.snapshots[-1].directories.append(("mkdir", self.namespace.missing_directories(folder_path)))
+        if self.host_io:
+            os.mkdir(folder_path)
+        self.namespace.mkdir(folder_path)
+        self._log("mkdir", folder_name, directory or self.current_directory)
+        return folder_path
+
+    @timed
+    @locked
+    def move_folder(self, folder_name, new_directory, directory=None, new_name=None):
+        """Mueve o renombra una carpeta con todo su contenido; solo se actualizan los archivos de ese subárbol"""
+        if not folder_name or not new_directory:
+            raise InvalidInputError("Por favor, completa todos los campos.")
+
+        folder_path = self._key(folder_name, directory)
+        new_path = self._key(new_name or folder_name, new_directory)
+        if not self.namespace.is_dir(folder_path):
+            raise MissingFileError(f"La carpeta '{folder_name}' no existe en el directorio actual.")
+        if self.namespace.exists(new_path) or (self.host_io and os.path.exists(new_path)):
+            raise AlreadyExistsError(f"Ya existe '{os.path.basename(new_path)}' en '{new_directory}'.")
+        if (new_path + os.sep).startswith(folder_path + os.sep):
+            raise InvalidInputError("No se puede mover una carpeta dentro de sí misma.")
+        for path in (folder_path, new_path):
+            self._check_not_busy(*(busy for busy in self._busy if busy.startswith(path + os.sep)))
+
+        if self.snapshots:
+            # Guardar el estado de los archivos del subárbol antes de mover la carpeta real
+            prefix = len(folder_path)
+            for file_path in self.namespace.files_under(folder_path):
+                self._capture(file_path)
+                self._capture(new_path + file_path[prefix:])
+            created = self.namespace.missing_directories(os.path.dirname(new_path))
+            self.snapshots[-1].directories.append(("mvdir", folder_path, new_path, created))
+
+        if self._on_host(folder_path):
+            shutil.move(folder_path, new_path)
+
+        # Reenganchar el nodo del árbol y actualizar la clave de los archivos que cuelgan de él
+        self.namespace.move_directory(folder_path, new_path)
+        prefix = len(new_path)
+        for file_path in list(self.namespace.files_under(new_path)):
+            old_path = folder_path + file_path[prefix:]
+            self._rekey_file(old_path, file_path)
+
+        self._log("mvdir", folder_name, new_directory, directory or self.current_directory, new_name)
+        return new_path
+
+    def execute(self, operation):
+        """Ejecuta una operación con la forma (codigo, *argumentos), por ejemplo ("create", "a.txt", 10)"""
+        op, *args = operation
+        try:
+            method = self.OPERATIONS[op]
+        except KeyError:
+            raise InvalidInputError(f"Operación desconocida: {op}") from None
+        return getattr(self, method)(*args)
+
+    @timed
+    @grouped()
+    @locked
+    def execute_batch(self, operations, stop_on_error=False, save=True):
+        """Ejecuta un iterable de operaciones y devuelve un resumen con aciertos y errores por tipo"""
+        summary = {'ok': 0, 'failed': 0, 'errors': {}}
+        errors = summary['errors']
+        for operation in operations:
+            try:
+                self.execute(operation)
+            except (FileSystemError, OSError, TypeError, ValueError) as e:
+                # TypeError/ValueError: argumentos que no corresponden a la operación; el lote sigue
+                summary['failed'] += 1
+                kind = type(e).__name__
+                errors[kind] = errors.get(kind, 0) + 1
+                if stop_on_error:
+                    break
+            else:
+                summary['ok'] += 1
+
+        if save:
+            self.save_data()
+        return summary
+
+    # Variantes por lotes de cada operación
+    def create_files(self, files, **kwargs):
+        return self.execute_batch((("create",) + tuple(spec) for spec in files), **kwargs)
+
+    def replace_files(self, files, **kwargs):
+        return self.execute_batch((("replace",) + tuple(spec) for spec in files), **kwargs)
+
+    def move_files(self, moves, **kwargs):
+        return self.execute_batch((("move",) + tuple(spec) for spec in moves), **kwargs)
+
+    def delete_files(self, file_names, **kwargs):
+        return self.execute_batch((("delete", name) for name in file_names), **kwargs)
+
+    def create_folders(self, folder_names, **kwargs):
+        return self.execute_batch((("mkdir", name) for name in folder_names), **kwargs)
+
+    @grouped()
+    @locked
+    def create_snapshot(self, name=None):
+        """Crea una instantánea con nombre del estado actual; cuesta O(1) porque no copia nada"""
+        name = name or f"snapshot-{len(self.snapshots) + 1}"
+        if any(snapshot.name == name for snapshot in self.snapshots):
+            raise AlreadyExistsError(f"Ya existe una instantánea llamada '{name}'.", title="Instantánea Existente")
+        wal_mark = self.wal.mark() if self.wal is not None else None
+        self.snapshots.append(Snapshot(name, self.selected_algorithm, len(self.journal), self.next_inode,
+                                       self.free_space.cursor, wal_mark, dict(self.region_cursors)))
+        return name
+
+    def list_snapshots(self):
+        """Nombres de las instantáneas con la cantidad de archivos modificados desde cada una"""
+        return [(snapshot.name, len(snapshot)) for snapshot in self.snapshots]
+
+    def _snapshot_index(self, name):
+        for index, snapshot in enumerate(self.snapshots):
+            if snapshot.name == name:
+                return index
+        raise MissingFileError(f"La instantánea '{name}' no existe.", title="Instantánea Inexistente")
+
+    @grouped()
+    @locked
+    def release_snapshot(self, name):
+        """Elimina una instantánea; sus cambios pasan a la anterior para que esta pueda seguir restaurándose"""
+        index = self._snapshot_index(name)
+        snapshot = self.snapshots.pop(index)
+        if index > 0:
+            self.snapshots[index - 1].absorb(snapshot)
+
+    @timed
+    @grouped()
+    @locked
+    def rollback_snapshot(self, name):
+        """Vuelve al estado de la instantánea en O(archivos modificados); descarta las instantáneas posteriores.
+        La instantánea se conserva, así que se puede volver a ella tantas veces como se quiera"""
+        index = self._snapshot_index(name)
+        while len(self.snapshots) > index + 1:
+            self._restore(self.snapshots.pop())
+        target = self.snapshots[index]
+        self._restore(target)
+        target.reset()
+        if self.wal is not None and not self.wal.truncate(target.wal_mark):
+            # Un checkpoint ya consolidó operaciones posteriores: se guarda el estado restaurado
+            self.checkpoint()
+
+    def _capture(self, file_path):
+        # Copy-on-write: la primera vez que cambia un archivo después de la instantánea se guarda su estado
+        if not self.snapshots:
+            return
+        files = self.snapshots[-1].files
+        if file_path not in files:
+            files[file_path] = self._file_state(file_path)
+
+    def _file_state(self, file_path):
+        if file_path not in self.block_usage:
+            return None
+        extents = [list(run) for run in self.file_extents.get(file_path, ())]
+        size = self.file_sizes.get(file_path, 0)
+        allocation = self.allocation_table.get(file_path)
+        inode = self.inodes.get(file_path)
+        compression = self.file_compression.get(file_path)
+        content = None
+        if self.disk_image is not None:
+            content = self.disk_image.read(extents, self._stored_size(file_path))
+        elif self.host_io and os.path.isfile(file_path):
+            with open(file_path, 'rb') as f:
+                content = f.read()
+        return FileState(self.block_usage[file_path], extents, size,
+                         dict(allocation) if allocation is not None else None,
+                         dict(inode) if inode is not None else None,
+                         self.mft.get(file_path) if file_path in self.mft else None, content,
+                         list(compression) if compression is not None else None,
+                         self.block_store.positions(extents) if self.block_store is not None else None)
+
+    def _restore(self, snapshot):
+        # Deshacer los cambios de una instantánea: primero se quita el estado actual de cada archivo
+        # modificado, después se deshacen las operaciones de carpetas y por último se recrea el estado guardado
+        self._load_derived()
+        self.journal.truncate(snapshot.journal_length)
+
+        for file_path in snapshot.files:
+            self._drop_file(file_path)
+
+        for operation in reversed(snapshot.directories):
+            if operation[0] == "mvdir":
+                _, folder_path, new_path, created = operation
+                if self.host_io and os.path.exists(new_path):
+                    shutil.move(new_path, folder_path)
+                self.namespace.move_directory(new_path, folder_path)
+            else:
+                created = operation[1]
+            for folder_path in reversed(created):
+                if self.namespace.rmdir(folder_path) and self.host_io:
+                    try:
+                        os.rmdir(folder_path)
+                    except OSError:
+                        pass
+
+        if snapshot.formatted:
+            self.selected_algorithm = snapshot.algorithm
+        for file_path, state in snapshot.files.items():
+            if state is not None:
+                self._put_file(file_path, state)
+
+        self.next_inode = snapshot.next_inode
+        self.free_space.cursor = snapshot.cursor
+        self.region_cursors = dict(snapshot.region_cursors)
+        if snapshot.formatted:
+            # Con otro formato cambió la región reservada: se reconstruyen el mapa, la FAT y la MFT
+            self.calculate_reserved_blocks()
+            if self.block_store is not None:
+                self.block_store.recount(self.file_extents)
+
+    def _drop_file(self, file_path):
+        # Quitar un archivo de todas las estructuras (sin journal ni log: es parte de una restauración).
+        # Se revisan todas las tablas: tras un cambio de formato pueden quedar entradas del formato anterior
+        if self.block_usage.pop(file_path, None) is not None:
+            self.namespace.remove_file(file_path)
+        self.file_sizes.pop(file_path, None)
+        self.file_compression.pop(file_path, None)
+        extents = self.file_extents.pop(file_path, None)
+        if extents:
+            self._free_extents(extents)
+        entry = self.allocation_table.pop(file_path, None)
+        if entry is not None and self.fat is not None:
+            self.fat.release(entry['start_block'])
+        self.inodes.pop(file_path, None)
+        if file_path in self.mft:
+            self.mft.remove(file_path)
+        if self.host_io and os.path.isfile(file_path):
+            os.remove(file_path)
+
+    def _put_file(self, file_path, state):
+        # Recrear un archivo con el estado guardado en la instantánea
+        extents = state.extents
+        self.block_usage[file_path] = state.blocks
+        self.file_extents[file_path] = extents
+        self.file_sizes[file_path] = state.size
+        if state.compression is not None:
+            self.file_compression[file_path] = list(state.compression)
+        self.namespace.add_file(file_path)
+        if extents:
+            self._mark_extents(extents, file_path, state.digests)
+        if state.allocation is not None:
+            entry = dict(state.allocation)
+            if self.fat is not None and extents:
+                entry['start_block'] = self.fat.link(extents)
+            self.allocation_table[file_path] = entry
+        if state.inode is not None:
+            inode = dict(state.inode)
+            if 'extents' in inode:
+                inode['extents'] = extents
+            self.inodes[file_path] = inode
+        if state.mft is not None:
+            entry = state.mft
+            self.mft.write_file(file_path, entry['path'], entry['size'], entry['blocks'], entry['runs'],
+                                number=self.mft.claim_record(entry['record']))
+        if state.content is not None:
+            if self.disk_image is not None:
+                content = state.content
+                if self.block_store is not None:
+                    # Clusters completos con ceros, como los escribe el almacén (su huella incluye el relleno)
+                    content = content.ljust(sum(length for _, length in extents) * self.cluster_size, b'\0')
+                self.disk_image.write(extents, content)
+            elif self.host_io and state.content is not None:
+                with open(file_path, 'wb') as f:
+                    f.write(state.content)
+
+    @timed
+    @grouped()
+    @locked
+    def save_data(self):
+        """Confirma los cambios: con el log activo solo lo sincroniza y cada cierto número de operaciones hace un checkpoint"""
+        if self.data_file is None:
+            return
+        if self.wal is None:
+            self.checkpoint()
+            return
+        self.wal.commit()
+        if self.wal.records_since_checkpoint >= self.checkpoint_interval:
+            self.checkpoint()
+
+    @timed
+    @grouped()
+    @locked
+    def checkpoint(self):
+        """Escribe el estado en el archivo de datos de forma atómica y vacía el log (en SQLite, solo lo que cambió)"""
+        if self.data_file is None:
+            return
+        self.region_cursors = {}
+        if self.store is not None:
+            written = self._save_store()
+            if self.metrics is not None:
+                self.metrics.inc('checkpoint_bytes_total', written)
+            if self.wal is not None:
+                self.wal.reset()
+            return
+        data = {
+            'allocation_table': self.allocation_table,
+            'journal': self.journal.to_list(),
+            'inodes': self.inodes,
+            'next_inode': self.next_inode,
+            'mft': self.mft.to_dict(),
+            'directories': list(self.namespace.empty_directories()),
+            'disk_blocks': self.disk_blocks,
+            'used_blocks': self.used_blocks,
+            'block_usage': self.block_usage,
+            'file_extents': self.file_extents,
+            'file_sizes': self.file_sizes,
+            'file_compression': self.file_compression,
+            'reserved_blocks': self.reserved_blocks,
+            'selected_algorithm': self.selected_algorithm,
+            'allocation_policy': self.allocation_policy,
+            'reserve_ratios': self.reserve_ratios,
+            'max_blocks_per_file': self.max_blocks_per_file,
+            'next_available_block': self.next_available_block,  # Añadido
+            'log_sequence': self.wal.sequence if self.wal is not None else 0  # Último registro del log incluido
+        }
+        if self.block_store is not None:
+            data['block_digests'] = {str(block): entry for block, entry in self.block_store.items()}
+        # Escribir en un temporal y reemplazar: una caída a mitad nunca deja el JSON cortado
+        temp_file = self.data_file + '.tmp'
+        with open(temp_file, 'w') as f:
+            json.dump(data, f, separators=(',', ':'))
+            f.flush()
+            os.fsync(f.fileno())
+            if self.metrics is not None:
+                self.metrics.inc('checkpoint_bytes_total', f.tell())
+        os.replace(temp_file, self.data_file)
+        self.mft.changed.clear()
+        if self.block_store is not None:
+            self.block_store.changed.clear()
+        if self.wal is not None:
+            self.wal.reset()
+
+    def _save_store(self):
+        # Checkpoint en SQLite: contadores del superbloque y solo las entradas que cambiaron; lo que nunca se
+        # cargó no cambió y no se vuelve a escribir
+        loaded = self.__dict__
+        superblock = {
+            'next_inode': self.next_inode,
+            'disk_blocks': self.disk_blocks,
+            'reserved_blocks': self.reserved_blocks,
+            'selected_algorithm': self.selected_algorithm,
+            'allocation_policy': self.allocation_policy,
+            'reserve_ratios': self.reserve_ratios,
+            'max_blocks_per_file': self.max_blocks_per_file,
+            'log_sequence': self.wal.sequence if self.wal is not None else 0,
+        }
+        tables = {}
+        for name in self.FILE_TABLES:
+            table = getattr(self, name)
+            tables[name] = (False, table.changes()) if isinstance(table, LazyTable) else (True, list(table.items()))
+        mft = loaded.get('mft')
+        if mft is not None:
+            if mft is self._stored_mft:
+                tables['mft'] = (False, [(key, mft.entry(key) if key in mft else DELETED) for key in mft.changed])
+            else:
+                tables['mft'] = (True, list(mft.to_dict().items()))
+        journal = self.journal.changes() if isinstance(self.journal, LazyJournal) else (0, list(self.journal))
+        free_runs = None
+        if 'free_space' in loaded:
+            superblock['used_blocks'] = self.used_blocks
+            superblock['next_available_block'] = self.next_available_block
+            free_runs = list(self.free_space.iter_free_runs())
+        directories = list(self.namespace.empty_directories()) if 'namespace' in loaded else None
+        block_store = loaded.get('block_store')
+        if block_store is not None:
+            superblock['dedup'] = True
+            if block_store is self._stored_blocks:
+                tables['block_digests'] = (False, [(str(block), block_store.entry(block) if block in block_store.refs
+                                                    else DELETED) for block in block_store.changed])
+            else:
+                tables['block_digests'] = (True, [(str(block), entry) for block, entry in block_store.items()])
+
+        written = self.store.save(superblock, tables, journal, free_runs, directories)
+        for name in self.FILE_TABLES:
+            table = getattr(self, name)
+            if isinstance(table, LazyTable):
+                table.saved()
+        if isinstance(self.journal, LazyJournal):
+            self.journal.saved()
+        if mft is not None:
+            mft.changed.clear()
+            self._stored_mft = mft
+        if block_store is not None:
+            block_store.changed.clear()
+            self._stored_blocks = block_store
+        return written
+
+    @grouped()
+    @locked
+    def close(self):
+        """Hace un checkpoint final y cierra el log"""
+        self.checkpoint()
+        self.disable_metrics()
+        if self.wal is not None:
+            self.wal.close()
+        if self.store is not None:
+            self.store.close()
+        if self.disk_image is not None:
+            if 'mft' in self.__dict__:
+                self.mft.detach()  # La MFT no puede seguir apuntando a la imagen cerrada
+            self.disk_image.flush()
+            self.disk_image.close()
+            self.disk_image = None
+
+    def enable_metrics(self, export_path=None, interval=10.0):
+        """Activa las métricas; con 'export_path' (.json o texto de Prometheus) las escribe cada 'interval' segundos"""
+        if self.metrics is None:
+            metrics = Metrics(('blocks_allocated_total', 'blocks_freed_total', 'journal_appends_total',
+                               'checkpoint_bytes_total'))
+            # Los contadores de las estructuras (MFT, mapa de bits, log) acumulan desde antes: se informa la diferencia
+            base_records = self.mft.records_written
+            base_steps = self.free_space.search_steps
+            base_wal = self.wal.bytes_written if self.wal is not None else 0
+            metrics.add_collector(lambda: {
+                'mft_record_writes_total': self.mft.records_written - base_records,
+                'free_space_search_steps_total': self.free_space.search_steps - base_steps,
+                'wal_bytes_total': (self.wal.bytes_written if self.wal is not None else 0) - base_wal,
+                # Bytes que llegaron al disco real para persistir el estado: log más checkpoints
+                'persistence_bytes_total': ((self.wal.bytes_written if self.wal is not None else 0) - base_wal
+                                            + metrics.counters.get('checkpoint_bytes_total', 0)),
+                'free_blocks': self.free_space.free_count,
+                'used_blocks': self.free_space.used_count,
+                'reserved_blocks': self.reserved_blocks,
+                'files': len(self.file_extents),
+                **self._cache_counters(),
+                **self._store_counters(),
+            })
+            self.metrics = metrics
+        if export_path is not None:
+            if self.metrics_exporter is not None:
+                self.metrics_exporter.stop()
+            self.metrics_exporter = MetricsExporter(self.metrics, export_path, interval)
+        return self.metrics
+
+    def _cache_counters(self):
+        # Contadores de la caché de bloques para las métricas (vacío si no hay caché)
+        cache = self.cache
+        if cache is None:
+            return {}
+        return {
+            'cache_reads_total': cache.reads,
+            'cache_hits_total': cache.hits,
+            'cache_device_reads_total': cache.device_reads,
+            'cache_device_requests_total': cache.device_requests,
+        }
+
+    def _store_counters(self):
+        # Contadores del almacén por contenido para las métricas (vacío sin deduplicación o si todavía no se cargó)
+        store = self.__dict__.get('block_store')
+        if store is None:
+            return {}
+        return {
+            'dedup_blocks': len(store),
+            'dedup_shared_blocks': store.shared_blocks(),
+            'dedup_lookups_total': store.lookups,
+            'dedup_hits_total': store.hits,
+        }
+
+    def disable_metrics(self):
+        """Desactiva las métricas (con una última exportación); devuelve su estado final o None si no estaban activas"""
+        if self.metrics_exporter is not None:
+            self.metrics_exporter.stop()
+            self.metrics_exporter = None
+        metrics, self.metrics = self.metrics, None
+        return metrics.snapshot() if metrics is not None else None
+
+    def metrics_snapshot(self):
+        """Estado actual de las métricas como dict (None si están desactivadas)"""
+        metrics = self.metrics
+        return metrics.snapshot() if metrics is not None else None
+
+    def load_data(self):
+        # Cargar los datos del último checkpoint y reproducir el log posterior
+        log_sequence = 0
+        if self.store is not None:
+            log_sequence = self._load_store()
+        elif self.data_file is not None and os.path.exists(self.data_file):
+            with open(self.data_file, 'r') as f:
+                data = json.load(f)
+                self.allocation_table = data.get('allocation_table', {})
+                self.journal = Journal.from_list(data.get('journal', []))
+                self.inodes = data.get('inodes', {})
+                self.next_inode = data.get('next_inode', 11)
+                mft_entries = data.get('mft', {})
+                self.disk_blocks = data.get('disk_blocks', self.disk_blocks)
+                self.block_usage = data.get('block_usage', {})
+                self.file_extents = data.get('file_extents', {})
+                self.file_sizes = data.get('file_sizes', {})
+                self.file_compression = data.get('file_compression', {})
+                self.reserved_blocks = data.get('reserved_blocks', 0)
+                self.selected_algorithm = data.get('selected_algorithm', "")
+                self.allocation_policy = data.get('allocation_policy', self.allocation_policy)
+                self.reserve_ratios.update(data.get('reserve_ratios', {}))
+                self.max_blocks_per_file.update(data.get('max_blocks_per_file', {}))
+                self.free_space.cursor = data.get('next_available_block', 1)  # Añadido
+                log_sequence = data.get('log_sequence', 0)
+                self._migrate_file_keys(mft_entries)
+                self._rebuild_namespace(data.get('directories', []))
+
+                # Recalcular bloques reservados si se ha seleccionado un algoritmo
+                self.mft = MasterFileTable.rebuild(mft_entries, self.file_extents)
+                if 'block_digests' in data:
+                    # El estado se guardó con deduplicación: se sigue usando aunque no se pida
+                    self.block_store = BlockStore.rebuild(data['block_digests'].items())
+                self._open_disk_image()
+                self.calculate_reserved_blocks()
+                self._place_legacy_files()
+        else:
+            # Inicializar datos por defecto si el archivo no existe
+            self.allocation_table = {}
+            self.journal = Journal()
+            self.inodes = {}
+            self.next_inode = 11
+            self.mft = MasterFileTable()
+            self.namespace = Namespace()
+            self.block_usage = {}
+            self.file_extents = {}
+            self.file_sizes = {}
+            self.file_compression = {}
+            self.reserved_blocks = 0
+            self.selected_algorithm = ""
+            self.free_space = self._new_free_space()
+
+        self._open_disk_image()
+        if self.wal is not None:
+            self.wal.sequence = log_sequence
+            self._replay_log(log_sequence)
+
+    def __getattr__(self, name):
+        # Solo se llama si el atributo no existe: las estructuras diferidas se cargan acá la primera vez
+        lazy = self.__dict__.get('_lazy')
+        if not lazy or name not in lazy:
+            raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
+        with self.lock:
+            if name not in self.__dict__:
+                self.__dict__[name] = lazy.pop(name)()
+            return self.__dict__[name]
+
+    def _defer(self, name, loader):
+        self.__dict__.pop(name, None)
+        self._lazy[name] = loader
+
+    def _load_derived(self):
+        # La MFT, la FAT y el árbol diferidos se reconstruyen a partir de las tablas por archivo: se cargan antes
+        # de modificarlas, si no saldrían de un estado a medio cambiar (runs vacíos, archivos con la ruta nueva)
+        for name in ("namespace", "fat", "mft"):
+            if name in self._lazy:
+                getattr(self, name)
+
+    def _load_store(self):
+        # Estado en SQLite: al abrir solo se leen los contadores del superbloque; las tablas y el journal se leen
+        # por entrada o por página, y la MFT, la FAT, el árbol de directorios y el mapa de bloques libres se
+        # reconstruyen la primera vez que se usan. Devuelve la secuencia del log incluida en el estado
+        store = self.store
+        if store.is_empty():
+            legacy = os.path.splitext(self.data_file)[0] + '.json'
+            if os.path.exists(legacy):
+                self._migrate_json(legacy)
+        new = store.is_empty()
+        superblock = store.superblock()
+        self.next_inode = superblock.get('next_inode', 11)
+        self.disk_blocks = superblock.get('disk_blocks', self.disk_blocks)
+        self.reserved_blocks = superblock.get('reserved_blocks', 0)
+        self.selected_algorithm = superblock.get('selected_algorithm', "")
+        self.allocation_policy = superblock.get('allocation_policy', self.allocation_policy)
+        self.reserve_ratios.update(superblock.get('reserve_ratios', {}))
+        self.max_blocks_per_file.update(superblock.get('max_blocks_per_file', {}))
+        for name in self.FILE_TABLES:
+            table = LazyTable(store, name)
+            table.complete = new
+            setattr(self, name, table)
+        self.journal = LazyJournal(store)
+
+        if new:
+            self.mft = MasterFileTable()
+            self.namespace = Namespace()
+            self.free_space = self._new_free_space()
+            self.fat = None
+            self._stored_mft = self.mft
+            self._stored_blocks = self.block_store
+            return 0
+        if superblock.get('dedup'):
+            # Las referencias se guardan con cada huella: el almacén no depende de los rangos de los archivos
+            self._defer('block_store', self._load_block_store)
+        cursor = superblock.get('next_available_block', 1)
+        self._defer('free_space', lambda: self._load_free_space(cursor))
+        self._defer('namespace', self._load_namespace)
+        self._defer('fat', self._load_fat)
+        self._defer('mft', self._load_mft)
+        self.dirty_regions = None
+        return superblock.get('log_sequence', 0)
+
+    def _load_free_space(self, cursor):
+        free_space = self._new_free_space()
+        free_space.mark_used(0, self.disk_blocks)
+        for start, length in self.store.free_runs():
+            free_space.free(start, length)
+        free_space.cursor = cursor
+        return free_space
+
+    def _load_namespace(self):
+        # El árbol sale de las claves de los archivos (sin leer sus valores) y de las carpetas vacías
+        namespace = Namespace()
+        for folder_path in self.store.directories():
+            namespace.mkdir(folder_path)
+        for file_path in self.block_usage.iter_keys():
+            namespace.add_file(file_path)
+        return namespace
+
+    def _load_fat(self):
+        self._rebuild_fat()
+        return self.fat
+
+    def _load_block_store(self):
+        block_store = BlockStore.rebuild(LazyTable(self.store, 'block_digests').items())
+        self._stored_blocks = block_store
+        return block_store
+
+    def _load_mft(self):
+        entries = LazyTable(self.store, 'mft')
+        self._open_disk_image()
+        mft = MasterFileTable.rebuild(dict(entries.items()), self.file_extents, self._mft_storage())
+        mft.changed.clear()
+        self._stored_mft = mft
+        return mft
+
+    def _migrate_json(self, legacy):
+        # Migración única: el estado JSON (con su log) se carga con el código de siempre y se guarda completo
+        engine = FileSystemEngine(self.current_directory, legacy, host_io=False, cluster_size=self.cluster_size,
+                                  disk_blocks=self.disk_blocks, reserve_ratios=self.reserve_ratios,
+                                  max_blocks_per_file=self.max_blocks_per_file, free_space_map=self.free_space_map)
+        engine.store = self.store
+        engine._save_store()
+        engine.store = None
+        if engine.wal is not None:
+            engine.wal.close()
+        # El log del JSON ya quedó incluido: el nuevo empieza de cero
+        self.store.save({'log_sequence': 0})
+
+    def _replay_log(self, after_sequence):
+        # Rehacer las operaciones confirmadas después del checkpoint, sin tocar el disco real
+        host_io, self.host_io = self.host_io, False
+        self._replaying = True
+        try:
+            for _, op, args in self.wal.replay(after_sequence):
+                try:
+                    self.execute([op] + args)
+                except FileSystemError:
+                    pass
+        finally:
+            self.host_io = host_io
+            self._replaying = False
+
+    def _migrate_file_keys(self, mft_entries):
+        # Las versiones anteriores identificaban los archivos solo por su nombre: se pasan a la ruta completa
+        tables = (self.block_usage, self.file_extents, self.file_sizes, self.allocation_table, self.inodes, mft_entries)
+        names = {name for table in tables for name in table if not os.path.isabs(name)}
+        for name in names:
+            path = None
+            for table in (self.allocation_table, self.inodes, mft_entries):
+                if name in table and table[name].get('path'):
+                    path = table[name]['path']
+                    break
+            if path is None:
+                record = self.journal.latest(name)
+                path = record.path if record is not None else os.path.join(self.current_directory, name)
+            path = self.namespace.normalize(path)
+            for table in tables:
+                if name in table:
+                    table[path] = table.pop(name)
+                    if isinstance(table[path], dict) and 'path' in table[path]:
+                        table[path]['path'] = path
+            if self.journal.latest(name) is not None:
+                self.journal.append(path, "move", None, None, None, name)
+
+    def _rebuild_namespace(self, directories):
+        self.namespace = Namespace()
+        for folder_path in directories:
+            self.namespace.mkdir(folder_path)
+        for file_path in self.block_usage:
+            self.namespace.add_file(file_path)
+
+    def _place_legacy_files(self):
+        # Los datos guardados por versiones anteriores no tienen rangos por archivo ni inodos:
+        # se asignan ahora para que el mapa de bloques y el journal reflejen su uso
+        if self.selected_algorithm == "EXT":
+            for file_path, blocks in self.block_usage.items():
+                record = self.journal.latest(file_path)
+                if file_path not in self.inodes and record is not None:
+                    self.inodes[file_path] = {'inode': self.next_inode, 'blocks': blocks, 'path': file_path}
+                    self.next_inode += 1
+
+        placed = False
+        for file_path, blocks in self.block_usage.items():
+            if file_path in self.file_extents:
+                continue
+            extents = self._allocate(blocks)
+            if extents is not None:
+                self.file_extents[file_path] = extents
+                placed = True
+        if placed:
+            self.dirty_regions = None
+            self._rebuild_fat()
+            self._rebuild_mft(self._mft_storage())
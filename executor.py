@@ -0,0 +1,100 @@
+import queue
+import threading
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+
+from engine import OperationCancelledError
+
+
+class Task:
+    """Operación enviada al hilo de E/S: permite cancelarla e informar su progreso"""
+
+    def __init__(self, executor, on_progress=None):
+        self.executor = executor
+        self.on_progress = on_progress
+        self.cancelled = threading.Event()  # La operación la revisa entre trozos de trabajo
+        self.future = None
+
+    def cancel(self):
+        """Cancela la operación: si no empezó no se ejecuta, si está en curso se interrumpe en el siguiente trozo"""
+        self.cancelled.set()
+        if self.future is not None:
+            self.future.cancel()
+
+    def report(self, done, total):
+        # Se llama desde el hilo de trabajo: el aviso se entrega en el hilo de Tk
+        if self.on_progress is not None:
+            self.executor.events.put((self.on_progress, (done, total)))
+
+
+class BackgroundExecutor:
+    """Ejecuta operaciones en un hilo aparte y entrega los resultados al hilo de Tk mediante root.after"""
+
+    def __init__(self, root, workers=1, poll_interval=50):
+        # Con un solo hilo las operaciones se aplican en el mismo orden en que se enviaron
+        self.root = root
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="fs-io")
+        self.events = queue.SimpleQueue()  # (callback, argumentos) pendientes de entregar en el hilo de Tk
+        self.poll_interval = poll_interval
+        self.pending = 0
+        self.watchers = []  # Se llaman en el hilo de Tk cada vez que termina una operación (p. ej. refrescar tablas)
+        self._closed = False
+        self._poll_id = self.root.after(self.poll_interval, self._poll)
+
+    def submit(self, func, on_done=None, on_error=None, on_progress=None):
+        """Envía func(task) al hilo de E/S; on_done(resultado) u on_error(excepción) se llaman en el hilo de Tk"""
+        task = Task(self, on_progress)
+
+        def run():
+            if task.cancelled.is_set():
+                raise OperationCancelledError("La operación se canceló antes de empezar.")
+            return func(task)
+
+        def finished(future):
+            try:
+                result = future.result()
+            except CancelledError:
+                callback, args = on_error, (OperationCancelledError("La operación se canceló antes de empezar."),)
+            except Exception as e:
+                callback, args = on_error, (e,)
+            else:
+                callback, args = on_done, (result,)
+            self.events.put((self._finish, (callback, args)))
+
+        self.pending += 1
+        task.future = self.pool.submit(run)
+        task.future.add_done_callback(finished)
+        return task
+
+    def _finish(self, callback, args):
+        self.pending -= 1
+        try:
+            if callback is not None:
+                callback(*args)
+        finally:
+            for watcher in list(self.watchers):
+                watcher()
+
+    def watch(self, callback):
+        """Registra callback() para después de cada operación terminada (correcta, fallida o cancelada)"""
+        self.watchers.append(callback)
+
+    def unwatch(self, callback):
+        if callback in self.watchers:
+            self.watchers.remove(callback)
+
+    def _poll(self):
+        # Entregar en el hilo de Tk todo lo que terminaron los hilos de trabajo
+        while True:
+            try:
+                callback, args = self.events.get_nowait()
+            except queue.Empty:
+                break
+            callback(*args)
+        if not self._closed:
+            self._poll_id = self.root.after(self.poll_interval, self._poll)
+
+    def shutdown(self, wait=True):
+        """Espera las operaciones en curso (para que el estado quede consistente) y detiene el hilo"""
+        self._closed = True
+        self.root.after_cancel(self._poll_id)
+        self.pool.shutdown(wait=wait)
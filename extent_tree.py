@@ -0,0 +1,333 @@
+import random
+
+from bitmap import FreeSpaceMap
+from btree import BTree
+
+
+class _Run:
+    # Nodo del treap: un run libre [start, start + length) con los agregados de su subárbol
+    __slots__ = ("start", "length", "priority", "left", "right", "max_length", "total")
+
+    def __init__(self, start, length):
+        self.start = start
+        self.length = length
+        self.priority = random.random()
+        self.left = None
+        self.right = None
+        self.max_length = length  # Run libre más largo del subárbol
+        self.total = length  # Bloques libres del subárbol
+
+
+def _update(node):
+    best = total = node.length
+    left, right = node.left, node.right
+    if left is not None:
+        total += left.total
+        if left.max_length > best:
+            best = left.max_length
+    if right is not None:
+        total += right.total
+        if right.max_length > best:
+            best = right.max_length
+    node.max_length = best
+    node.total = total
+
+
+def _split(node, key):
+    # Parte el treap en (runs que empiezan antes de 'key', runs que empiezan en 'key' o después)
+    if node is None:
+        return None, None
+    if node.start < key:
+        node.right, right = _split(node.right, key)
+        _update(node)
+        return node, right
+    left, node.left = _split(node.left, key)
+    _update(node)
+    return left, node
+
+
+def _merge(left, right):
+    # Une dos treaps donde todos los runs de 'left' están antes que los de 'right'
+    if left is None:
+        return right
+    if right is None:
+        return left
+    if left.priority > right.priority:
+        left.right = _merge(left.right, right)
+        _update(left)
+        return left
+    right.left = _merge(left, right.left)
+    _update(right)
+    return right
+
+
+def _last(node):
+    if node is None:
+        return None
+    while node.right is not None:
+        node = node.right
+    return node
+
+
+def _runs_in_order(node):
+    stack = []
+    while stack or node is not None:
+        while node is not None:
+            stack.append(node)
+            node = node.left
+        node = stack.pop()
+        yield node
+        node = node.right
+
+
+def _clone(node):
+    if node is None:
+        return None
+    clone = _Run.__new__(_Run)
+    clone.start, clone.length, clone.priority = node.start, node.length, node.priority
+    clone.max_length, clone.total = node.max_length, node.total
+    clone.left, clone.right = _clone(node.left), _clone(node.right)
+    return clone
+
+
+class FreeExtentTree(FreeSpaceMap):
+    """Espacio libre como árbol ordenado de runs (treap por inicio con el run más largo y los bloques libres de
+    cada subárbol, más un árbol B+ por tamaño para best fit). La memoria depende de la cantidad de runs, no del
+    tamaño del disco; asignar, liberar y buscar el mayor run cuestan O(log n)"""
+
+    def __init__(self, total_blocks):
+        self.total_blocks = total_blocks
+        self.used_count = 0
+        self.cursor = 0  # Posición desde donde continúa la política next-fit
+        self.search_steps = 0  # Nodos visitados por las búsquedas (para las métricas)
+        self.root = _Run(0, total_blocks) if total_blocks else None
+        self.by_size = BTree()  # (longitud, inicio) -> None
+        if total_blocks:
+            self.by_size.insert((total_blocks, 0), None)
+
+    def copy(self):
+        """Copia independiente del árbol (para simular asignaciones sin tocar el disco)"""
+        clone = FreeExtentTree.__new__(FreeExtentTree)
+        clone.total_blocks = self.total_blocks
+        clone.used_count = self.used_count
+        clone.cursor = self.cursor
+        clone.search_steps = 0
+        clone.root = _clone(self.root)
+        clone.by_size = BTree()
+        for run in _runs_in_order(clone.root):
+            clone.by_size.insert((run.length, run.start), None)
+        return clone
+
+    def __len__(self):
+        # Cantidad de runs libres (lo que determina la memoria usada)
+        return len(self.by_size)
+
+    def _run_at(self, block):
+        # Run libre que contiene 'block', o None si el bloque está usado
+        node = self.root
+        while node is not None:
+            if block < node.start:
+                node = node.left
+            elif block >= node.start + node.length:
+                node = node.right
+            else:
+                return node
+        return None
+
+    def _free_before(self, block):
+        # Bloques libres antes de 'block', sumando los totales de los subárboles en un solo descenso
+        free = 0
+        node = self.root
+        while node is not None:
+            if block <= node.start:
+                node = node.left
+                continue
+            left_total = node.left.total if node.left is not None else 0
+            if block < node.start + node.length:
+                return free + left_total + (block - node.start)
+            free += left_total + node.length
+            node = node.right
+        return free
+
+    def is_free(self, block):
+        return self._run_at(block) is not None
+
+    def count_used(self, start, end):
+        """Cuenta los bloques usados en el rango [start, end)"""
+        if start >= end:
+            return 0
+        return (end - start) - (self._free_before(end) - self._free_before(start))
+
+    def mark_used(self, start, length):
+        """Marca un rango como usado (los bloques que ya lo estaban no se cuentan dos veces)"""
+        end = min(start + length, self.total_blocks)
+        if start >= end:
+            return
+        left, rest = _split(self.root, start)
+        middle, right = _split(rest, end)
+        removed = 0
+        tail = None  # Parte de un run que sigue libre después de 'end'
+
+        previous = _last(left)
+        if previous is not None and previous.start + previous.length > start:
+            # El run anterior entra en el rango: queda su parte inicial
+            previous_end = previous.start + previous.length
+            left, _ = _split(left, previous.start)
+            self.by_size.delete((previous.length, previous.start))
+            removed += min(previous_end, end) - start
+            head = _Run(previous.start, start - previous.start)
+            self.by_size.insert((head.length, head.start), None)
+            left = _merge(left, head)
+            if previous_end > end:
+                tail = (end, previous_end - end)
+
+        for run in _runs_in_order(middle):
+            run_end = run.start + run.length
+            self.by_size.delete((run.length, run.start))
+            removed += min(run_end, end) - run.start
+            if run_end > end:
+                tail = (end, run_end - end)
+
+        if tail is not None:
+            self.by_size.insert((tail[1], tail[0]), None)
+            right = _merge(_Run(*tail), right)
+        self.root = _merge(left, right)
+        self.used_count += removed
+
+    def free(self, start, length):
+        """Devuelve un rango al espacio libre, uniéndolo con los runs vecinos"""
+        end = min(start + length, self.total_blocks)
+        if start >= end:
+            return
+        left, rest = _split(self.root, start)
+        middle, right = _split(rest, end + 1)  # Incluye un run que empiece justo en 'end' (vecino)
+        new_start, new_end = start, end
+        already_free = 0
+
+        for run in _runs_in_order(middle):
+            run_end = run.start + run.length
+            self.by_size.delete((run.length, run.start))
+            already_free += min(run_end, end) - run.start
+            new_end = max(new_end, run_end)
+
+        previous = _last(left)
+        if previous is not None and previous.start + previous.length >= start:
+            previous_end = previous.start + previous.length
+            left, _ = _split(left, previous.start)
+            self.by_size.delete((previous.length, previous.start))
+            already_free += max(0, min(previous_end, end) - start)
+            new_start = previous.start
+            new_end = max(new_end, previous_end)
+
+        self.by_size.insert((new_end - new_start, new_start), None)
+        self.root = _merge(_merge(left, _Run(new_start, new_end - new_start)), right)
+        self.used_count -= (end - start) - already_free
+
+    def iter_free_runs(self, start=0, end=None):
+        """Recorre los runs libres maximales dentro de [start, end) como pares (inicio, longitud)"""
+        end = self.total_blocks if end is None else min(end, self.total_blocks)
+        if start >= end:
+            return
+        run = self._run_at(start)
+        if run is not None and run.start < start:
+            yield start, min(run.start + run.length, end) - start
+        # Pila con el camino hasta el primer run que empieza en 'start' o después
+        stack = []
+        node = self.root
+        while node is not None:
+            if node.start >= start:
+                stack.append(node)
+                node = node.left
+            else:
+                node = node.right
+        while stack:
+            node = stack.pop()
+            if node.start >= end:
+                return
+            yield node.start, min(node.start + node.length, end) - node.start
+            node = node.right
+            while node is not None:
+                stack.append(node)
+                node = node.left
+
+    def _first_fit(self, count, start, end):
+        # Primero el run que contiene 'start' (recortado); después el primer run que empieza
+        # en 'start' o más adelante con al menos 'count' bloques, guiado por el máximo de cada subárbol
+        run = self._run_at(start)
+        self.search_steps += 1
+        if run is not None and min(run.start + run.length, end) - start >= count:
+            return start
+        left, right = _split(self.root, start)
+        found = None
+        node = right
+        if node is not None and node.max_length >= count:
+            while True:
+                self.search_steps += 1
+                if node.left is not None and node.left.max_length >= count:
+                    node = node.left
+                elif node.length >= count:
+                    found = node.start
+                    break
+                else:
+                    node = node.right
+        self.root = _merge(left, right)
+        if found is None or found + count > end:
+            return None
+        return found
+
+    def _best_fit(self, count, start, end):
+        # Los runs que cruzan los bordes de la región cuentan recortados; del resto, el índice por tamaño
+        # da el más chico que alcanza (fuera de una región los runs nunca se saltan: O(log n))
+        candidates = []
+        run = self._run_at(start)
+        if run is not None and run.start < start:
+            candidates.append((min(run.start + run.length, end) - start, start))
+        run = self._run_at(end - 1)
+        if run is not None and run.start >= start and run.start + run.length > end:
+            candidates.append((end - run.start, run.start))
+        for (length, run_start), _ in self.by_size.items((count, -1)):
+            self.search_steps += 1
+            if run_start >= start and run_start + length <= end:
+                candidates.append((length, run_start))
+                break
+        fitting = [candidate for candidate in candidates if candidate[0] >= count]
+        return min(fitting)[1] if fitting else None
+
+    def find_run(self, count, policy="first", start=0, end=None):
+        """Busca un run libre de al menos 'count' bloques según la política; devuelve su inicio o None"""
+        end = self.total_blocks if end is None else min(end, self.total_blocks)
+        if count <= 0 or count > end - start:
+            return None
+
+        if policy == "first":
+            return self._first_fit(count, start, end)
+
+        if policy == "next":
+            cursor = min(max(self.cursor, start), end)
+            found = self._first_fit(count, cursor, end) if cursor < end else None
+            if found is None:
+                # Dar la vuelta al disco (incluye el run que pudo quedar cortado por el cursor)
+                found = self._first_fit(count, start, min(cursor + count, end))
+            return found
+
+        if policy == "best":
+            return self._best_fit(count, start, end)
+
+        raise ValueError(f"Política de asignación desconocida: {policy}")
+
+    def largest_free_run(self, start=0, end=None):
+        """Devuelve (inicio, longitud) del mayor run libre, o (None, 0) si el disco está lleno"""
+        if start > 0 or (end is not None and end < self.total_blocks):
+            return super().largest_free_run(start, end)
+        node = self.root
+        if node is None:
+            return (None, 0)
+        # Bajar hacia el primer run (en orden del disco) con la longitud máxima
+        target = node.max_length
+        while True:
+            if node.left is not None and node.left.max_length == target:
+                node = node.left
+            elif node.length == target:
+                return (node.start, node.length)
+            else:
+                node = node.right
@@ -0,0 +1,91 @@
+from array import array
+
+FREE = 0  # Cluster libre
+EOC = 0x0FFFFFFF  # Fin de cadena (End Of Chain), como en FAT32
+MAX_CLUSTERS = 0x0FFFFFF5  # Clusters que puede direccionar FAT32 (las entradas usan 28 bits)
+
+# Tamaño máximo de bloque que se compara de una vez al buscar clusters consecutivos
+_PROBE_LIMIT = 1 << 16
+
+
+class FileAllocationTable:
+    """Tabla FAT: un entero de 32 bits por cluster con el siguiente cluster de la cadena o EOC"""
+
+    def __init__(self, total_clusters, first_cluster=0):
+        self.total_clusters = total_clusters
+        # Solo se guardan las entradas desde 'first_cluster' (inicio de la zona de datos) hasta el último cluster
+        # enlazado: los clusters que nunca se usaron están libres (0) y no ocupan memoria
+        self.base = first_cluster
+        self.entries = array('I')
+
+    def _grow(self, first, end):
+        # Ampliar la tabla para que cubra los clusters [first, end)
+        if first < self.base:
+            self.entries = array('I', bytes(4 * (self.base - first))) + self.entries
+            self.base = first
+        missing = end - self.base - len(self.entries)
+        if missing > 0:
+            self.entries.frombytes(bytes(4 * missing))
+
+    @property
+    def nbytes(self):
+        return self.entries.itemsize * len(self.entries)
+
+    def link(self, extents):
+        """Enlaza los rangos [inicio, longitud] en una sola cadena; devuelve el primer cluster"""
+        self._grow(min(start for start, _ in extents), max(start + length for start, length in extents))
+        entries = self.entries
+        base = self.base
+        for index, (start, length) in enumerate(extents):
+            # Dentro de un rango cada cluster apunta al siguiente (asignación por slices, en C)
+            entries[start - base:start + length - 1 - base] = array('I', range(start + 1, start + length))
+            last = start + length - 1
+            entries[last - base] = extents[index + 1][0] if index + 1 < len(extents) else EOC
+        return extents[0][0]
+
+    def _run_length(self, cluster):
+        # Cuántos clusters consecutivos empiezan en 'cluster' (c -> c+1 -> c+2 ...),
+        # probando bloques cada vez más grandes en lugar de seguir la cadena uno por uno
+        entries = self.entries
+        base = self.base
+        length, step = 1, 1
+        while True:
+            current = cluster + length - 1
+            step = min(step, len(entries) + base - current - 1, _PROBE_LIMIT)
+            if step <= 0 or entries[current - base] != current + 1:
+                return length
+            expected = array('I', range(current + 1, current + step + 1))
+            if entries[current - base:current - base + step] == expected:
+                length += step
+                step *= 2
+            elif step == 1:
+                return length
+            else:
+                step //= 2
+
+    def runs(self, start):
+        """Recorre la cadena que empieza en 'start' y la devuelve compactada como [[inicio, longitud], ...]"""
+        runs = []
+        cluster = start
+        while cluster != EOC and cluster != FREE:
+            length = self._run_length(cluster)
+            runs.append([cluster, length])
+            cluster = self.entries[cluster + length - 1 - self.base]
+        return runs
+
+    def chain(self, start):
+        """Recorre la cadena cluster por cluster"""
+        for run_start, length in self.runs(start):
+            yield from range(run_start, run_start + length)
+
+    def release(self, start):
+        """Libera la cadena completa; devuelve sus rangos para devolverlos al mapa de bloques libres"""
+        runs = self.runs(start)
+        for run_start, length in runs:
+            self.entries[run_start - self.base:run_start + length - self.base] = array('I', bytes(4 * length))
+        return runs
+
+
+def format_runs(runs):
+    # Lista compacta de rangos, por ejemplo "160-169, 200-204"
+    return ", ".join(f"{start}-{start + length - 1}" if length > 1 else str(start) for start, length in runs)
@@ -0,0 +1,103 @@
+import threading
+import types
+
+from locks import LockTable
+
+
+class AllocationGroups:
+    """Candados de los grupos de asignación del motor (la zona de datos en partes iguales, ver
+    FileSystemEngine.group_regions). El candado de un grupo protege la asignación y la liberación de sus bloques:
+    se toma antes que el candado del motor y siempre en orden creciente"""
+
+    def __init__(self, count, locks=None):
+        self.count = max(1, count)
+        # RLock: una operación por lotes toma todos los grupos y las operaciones que llama los vuelven a pedir
+        self.locks = locks if locks is not None else LockTable(threading.RLock)
+        self._held = threading.local()  # Grupos que tiene el hilo actual -> veces que los tomó
+
+    def lock(self, group):
+        return self.locks.get("group", group)
+
+    def _counts(self):
+        counts = getattr(self._held, 'counts', None)
+        if counts is None:
+            counts = self._held.counts = {}
+        return counts
+
+    def held(self):
+        """Grupos que tiene tomados el hilo actual"""
+        return set(self._counts())
+
+    def acquire(self, groups, blocking=True):
+        """Toma los candados de 'groups' en orden; sin espera devuelve False (sin tomar ninguno) si alguno está ocupado"""
+        taken = []
+        for group in sorted(set(groups)):
+            if not self.lock(group).acquire(blocking):
+                self.release(taken)
+                return False
+            taken.append(group)
+            counts = self._counts()
+            counts[group] = counts.get(group, 0) + 1
+        return True
+
+    def release(self, groups):
+        counts = self._counts()
+        for group in sorted(set(groups), reverse=True):
+            counts[group] -= 1
+            if not counts[group]:
+                del counts[group]
+            self.lock(group).release()
+
+    def hold(self, groups=None):
+        """Contexto que tiene tomados 'groups' (todos si es None)"""
+        return _Holding(self, range(self.count) if groups is None else groups)
+
+
+class _Holding:
+    def __init__(self, groups, keys):
+        self.groups = groups
+        self.keys = sorted(set(keys))
+
+    def __enter__(self):
+        self.groups.acquire(self.keys)
+        return self
+
+    def __exit__(self, *exc):
+        self.groups.release(self.keys)
+
+
+def with_cursor(space, cursor, name, *args):
+    """Llama al método 'name' del mapa con el cursor de next-fit 'cursor' sin mover el del mapa; devuelve
+    (resultado, cursor después de la llamada)"""
+    saved, space.cursor = space.cursor, cursor
+    try:
+        return getattr(space, name)(*args), space.cursor
+    finally:
+        space.cursor = saved
+
+
+class SharedFreeSpace:
+    """Mapa de espacio libre compartido por los grupos de asignación: cada grupo reserva bloques sin el candado del
+    motor, así que cada llamada al mapa toma un candado corto (los recorridos se devuelven como lista)"""
+
+    def __init__(self, space):
+        object.__setattr__(self, 'space', space)
+        object.__setattr__(self, '_lock', threading.Lock())
+
+    def __getattr__(self, name):
+        value = getattr(self.space, name)
+        if not callable(value):
+            return value
+
+        def call(*args, **kwargs):
+            with self._lock:
+                result = value(*args, **kwargs)
+                return list(result) if isinstance(result, types.GeneratorType) else result
+        return call
+
+    def with_cursor(self, cursor, name, *args):
+        with self._lock:
+            return with_cursor(self.space, cursor, name, *args)
+
+    def __setattr__(self, name, value):
+        setattr(self.space, name, value)
@@ -0,0 +1,269 @@
+import math
+from bisect import bisect_left, bisect_right, insort
+from collections import deque, namedtuple
+
+# Capa de dispositivo simulada: los pedidos de bloques que registra el motor (IOTrace) se encolan,
+# un planificador elige el orden en que se atienden y un modelo de HDD o SSD da el costo de cada uno.
+
+# Pedido de E/S: instante de llegada, primer bloque, cantidad, si es escritura, operación que lo generó y orden de llegada
+Request = namedtuple("Request", "arrival start blocks write operation seq")
+
+
+class IOTrace:
+    """Pedidos de bloques que llegan al dispositivo, agrupados por la operación que los generó"""
+
+    def __init__(self):
+        self.requests = []  # (operación, inicio, bloques, es_escritura)
+        self.operation = 0
+
+    def __len__(self):
+        return len(self.requests)
+
+    def next_operation(self):
+        self.operation += 1
+
+    def read(self, runs):
+        for start, length in runs:
+            self.requests.append((self.operation, start, length, False))
+
+    def write(self, runs):
+        for start, length in runs:
+            self.requests.append((self.operation, start, length, True))
+
+
+class HDD:
+    """Disco rotativo: búsqueda según la distancia recorrida por el cabezal, media vuelta de latencia rotacional
+    en cada acceso no secuencial y transferencia a velocidad constante"""
+
+    name = "hdd"
+
+    def __init__(self, total_blocks, block_size=4096, rpm=7200, track_to_track_ms=0.8, full_stroke_ms=16.0,
+                 transfer_mb_s=160.0):
+        self.total_blocks = max(total_blocks, 1)
+        self.block_size = block_size
+        self.track_to_track = track_to_track_ms / 1000
+        self.full_stroke = full_stroke_ms / 1000
+        self.half_rotation = 30 / rpm  # Latencia rotacional media: media vuelta
+        self.block_transfer = block_size / (transfer_mb_s * 1e6)
+
+    def service_time(self, head, start, blocks, write):
+        distance = abs(start - head)
+        if distance == 0:
+            # Acceso secuencial: el cabezal ya está sobre el bloque
+            positioning = 0.0
+        else:
+            # Curva de búsqueda habitual: crece con la raíz de la distancia
+            seek = self.track_to_track + (self.full_stroke - self.track_to_track) * math.sqrt(distance / self.total_blocks)
+            positioning = seek + self.half_rotation
+        return positioning + blocks * self.block_transfer
+
+
+class SSD:
+    """Disco de estado sólido: costo fijo por página (la posición no importa), con escrituras más caras que lecturas"""
+
+    name = "ssd"
+
+    def __init__(self, total_blocks, block_size=4096, page_size=4096, read_page_us=50.0, write_page_us=200.0,
+                 command_us=10.0):
+        self.block_size = block_size
+        self.page_size = page_size
+        self.read_page = read_page_us / 1e6
+        self.write_page = write_page_us / 1e6
+        self.command = command_us / 1e6
+
+    def service_time(self, head, start, blocks, write):
+        pages = -(-blocks * self.block_size // self.page_size)
+        return self.command + pages * (self.write_page if write else self.read_page)
+
+
+DEVICES = {"hdd": HDD, "ssd": SSD}
+
+
+class FifoScheduler:
+    """Atiende los pedidos en orden de llegada"""
+
+    name = "fifo"
+
+    def __init__(self):
+        self.queue = deque()
+
+    def __len__(self):
+        return len(self.queue)
+
+    def add(self, request):
+        self.queue.append(request)
+
+    def pop(self, head, now):
+        return self.queue.popleft()
+
+
+class _SortedQueue:
+    # Pedidos ordenados por bloque inicial (y orden de llegada para desempatar)
+    def __init__(self):
+        self.keys = []
+        self.requests = {}  # orden de llegada -> pedido
+
+    def __len__(self):
+        return len(self.keys)
+
+    def add(self, request):
+        insort(self.keys, (request.start, request.seq))
+        self.requests[request.seq] = request
+
+    def take(self, index):
+        _, seq = self.keys.pop(index)
+        return self.requests.pop(seq)
+
+    def remove(self, request):
+        index = bisect_left(self.keys, (request.start, request.seq))
+        del self.keys[index]
+        del self.requests[request.seq]
+
+    def at_or_after(self, block):
+        return bisect_left(self.keys, (block, -1))
+
+    def at_or_before(self, block):
+        return bisect_right(self.keys, (block, math.inf)) - 1
+
+
+class ScanScheduler:
+    """Elevador (SCAN): el cabezal recorre el disco en un sentido atendiendo lo que encuentra y luego vuelve"""
+
+    name = "scan"
+
+    def __init__(self):
+        self.queue = _SortedQueue()
+        self.upward = True
+
+    def __len__(self):
+        return len(self.queue)
+
+    def add(self, request):
+        self.queue.add(request)
+
+    def pop(self, head, now):
+        queue = self.queue
+        if self.upward:
+            index = queue.at_or_after(head)
+            if index == len(queue):
+                self.upward = False
+                index = len(queue) - 1
+        else:
+            index = queue.at_or_before(head)
+            if index < 0:
+                self.upward = True
+                index = 0
+        return queue.take(index)
+
+
+class DeadlineScheduler:
+    """Como el planificador deadline de Linux: recorre el disco en orden ascendente (C-SCAN), pero un pedido cuyo
+    plazo venció se atiende primero; las lecturas tienen un plazo mucho más corto que las escrituras. Después de un
+    pedido vencido se siguen atendiendo 'fifo_batch' pedidos en orden desde ahí antes de volver a revisar los plazos"""
+
+    name = "deadline"
+
+    def __init__(self, read_expire=0.5, write_expire=5.0, fifo_batch=16):
+        self.read_expire = read_expire
+        self.write_expire = write_expire
+        self.fifo_batch = fifo_batch
+        self.batch = 0  # Pedidos que quedan del lote actual
+        self.queue = _SortedQueue()
+        self.reads = deque()  # En orden de llegada, para detectar los vencidos
+        self.writes = deque()
+
+    def __len__(self):
+        return len(self.queue)
+
+    def add(self, request):
+        self.queue.add(request)
+        (self.writes if request.write else self.reads).append(request)
+
+    def _expired(self, fifo, expire, now):
+        # Descartar del frente los pedidos que ya se atendieron por el recorrido ordenado
+        requests = self.queue.requests
+        while fifo and fifo[0].seq not in requests:
+            fifo.popleft()
+        if fifo and fifo[0].arrival + expire <= now:
+            return fifo.popleft()
+        return None
+
+    def pop(self, head, now):
+        if self.batch > 0:
+            self.batch -= 1
+        else:
+            request = self._expired(self.reads, self.read_expire, now) or self._expired(self.writes, self.write_expire, now)
+            if request is not None:
+                self.queue.remove(request)
+                self.batch = self.fifo_batch - 1
+                return request
+        index = self.queue.at_or_after(head)
+        if index == len(self.queue):
+            index = 0  # Volver al inicio del disco
+        return self.queue.take(index)
+
+
+SCHEDULERS = {"fifo": FifoScheduler, "scan": ScanScheduler, "deadline": DeadlineScheduler}
+
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))]
+
+
+def simulate(requests, device, scheduler, rate=None):
+    """Atiende los pedidos de un IOTrace con el dispositivo y el planificador dados.
+    Con 'rate' (operaciones por segundo) las operaciones llegan espaciadas; sin él llegan todas juntas"""
+    arrivals = [Request(operation / rate if rate else 0.0, start, blocks, write, operation, seq)
+                for seq, (operation, start, blocks, write) in enumerate(requests)]
+    latencies = []
+    operations = {}  # operación -> (llegada, fin del último pedido)
+    now = 0.0
+    head = 0
+    busy = 0.0
+    seek_blocks = 0
+    blocks_total = 0
+    i = 0
+    while i < len(arrivals) or len(scheduler):
+        if not len(scheduler):
+            now = max(now, arrivals[i].arrival)
+        while i < len(arrivals) and arrivals[i].arrival <= now:
+            scheduler.add(arrivals[i])
+            i += 1
+        request = scheduler.pop(head, now)
+        service = device.service_time(head, request.start, request.blocks, request.write)
+        now += service
+        busy += service
+        seek_blocks += abs(request.start - head)
+        blocks_total += request.blocks
+        head = request.start + request.blocks
+        latencies.append(now - request.arrival)
+        first, _ = operations.get(request.operation, (request.arrival, now))
+        operations[request.operation] = (first, now)
+
+    elapsed = now - arrivals[0].arrival if arrivals else 0.0
+    latencies.sort()
+    op_latencies = sorted(end - start for start, end in operations.values())
+    block_size = getattr(device, 'block_size', 4096)
+    return {
+        'device': device.name,
+        'scheduler': scheduler.name,
+        'requests': len(arrivals),
+        'blocks': blocks_total,
+        'elapsed_s': round(elapsed, 6),
+        'busy_s': round(busy, 6),
+        'iops': round(len(arrivals) / elapsed, 1) if elapsed else 0.0,
+        'throughput_mb_s': round(blocks_total * block_size / elapsed / 1e6, 3) if elapsed else 0.0,
+        'seek_blocks': seek_blocks,
+        'latency_ms': {
+            'mean': round(sum(latencies) / len(latencies) * 1000, 3) if latencies else 0.0,
+            'p50': round(_percentile(latencies, 0.50) * 1000, 3),
+            'p99': round(_percentile(latencies, 0.99) * 1000, 3),
+            'max': round(latencies[-1] * 1000, 3) if latencies else 0.0,
+        },
+        'op_latency_ms': {
+            'mean': round(sum(op_latencies) / len(op_latencies) * 1000, 3) if op_latencies else 0.0,
+            'p99': round(_percentile(op_latencies, 0.99) * 1000, 3),
+        },
+    }
@@ -0,0 +1,124 @@
+import re
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+
+# Registro del journal EXT: transacción, archivo, operación, inodo, rango de bloques y ruta.
+# En un registro "move" la ruta es la anterior: enlaza la clave nueva con los registros de la anterior
+JournalRecord = namedtuple("JournalRecord", "txid file op inode start_block end_block path")
+
+# Texto que se muestra para cada operación
+OPERATION_LABELS = {
+    "create": "Archivo creado",
+    "replace": "Archivo guardado/reemplazado",
+    "move": "Archivo movido",
+    "delete": "Archivo eliminado",
+    "relocate": "Archivo reubicado",
+}
+
+# Formato de las entradas de texto que guardaban las versiones anteriores
+_LEGACY_ENTRY = re.compile(r"^(?P<label>.*?): (?P<name>.*), Bloques: (?P<blocks>\d+), Path: (?P<path>.*)$")
+
+
+class Journal:
+    """Journal EXT de solo anexado, con un índice por archivo hacia sus registros"""
+
+    def __init__(self):
+        self.records = []
+        self.index = {}  # archivo -> posiciones de sus registros en self.records
+        self.moves = {}  # ruta anterior -> posiciones de los registros "move" que salen de ella
+        self.next_txid = 1
+
+    def __len__(self):
+        return len(self.records)
+
+    def __iter__(self):
+        return iter(self.records)
+
+    def __getitem__(self, position):
+        return self.records[position]
+
+    def append(self, file_name, op, inode, start_block, end_block, path):
+        """Agrega un registro al final; nunca se reescribe la historia"""
+        record = JournalRecord(self.next_txid, file_name, op, inode, start_block, end_block, path)
+        self.next_txid += 1
+        self._add(record)
+        return record
+
+    def _add(self, record):
+        self._index_record(len(self), record)
+        self.records.append(record)
+
+    def _index_record(self, position, record):
+        self.index.setdefault(record.file, []).append(position)
+        if record.op == "move" and record.path != record.file:
+            self.moves.setdefault(record.path, []).append(position)
+
+    def history(self, file_name):
+        """Registros de un archivo, en orden, incluidos los que se escribieron con sus rutas anteriores"""
+        return [self[position] for position in self._positions(file_name)]
+
+    def latest(self, file_name):
+        """Último registro de un archivo, o None si no tiene"""
+        positions = self._keyed(file_name, len(self))
+        return self[positions[-1]] if positions else None
+
+    def _keyed(self, file_name, end):
+        # Posiciones anteriores a 'end' de los registros escritos con esta clave, desde la última vez que un
+        # archivo salió de ella (lo anterior es de ese archivo y se llega por su registro "move")
+        moves = self.moves.get(file_name, [])
+        count = bisect_left(moves, end)
+        start = moves[count - 1] if count else -1
+        positions = self.index.get(file_name, [])
+        return positions[bisect_right(positions, start):bisect_left(positions, end)]
+
+    def _positions(self, file_name):
+        # Se siguen los registros "move" hacia atrás: cada uno aporta los registros de la ruta anterior
+        # escritos antes que él (una ruta reutilizada después por otro archivo no se mezcla)
+        positions = []
+        pending = [(file_name, len(self))]
+        while pending:
+            name, end = pending.pop()
+            for position in self._keyed(name, end):
+                positions.append(position)
+                record = self[position]
+                if record.op == "move" and record.path != name:
+                    pending.append((record.path, position))
+        positions.sort()
+        return positions
+
+    def truncate(self, length):
+        """Descarta los registros a partir de 'length' (para deshacer anexados recientes)"""
+        while len(self.records) > length:
+            record = self.records.pop()
+            for index, key in ((self.index, record.file), (self.moves, record.path)):
+                positions = index.get(key)
+                if positions and positions[-1] == len(self.records):
+                    positions.pop()
+                    if not positions:
+                        del index[key]
+        self.next_txid = self.records[-1].txid + 1 if self.records else 1
+
+    def to_list(self):
+        # Forma compacta para el JSON: una lista por registro
+        return [list(record) for record in self.records]
+
+    @classmethod
+    def from_list(cls, entries):
+        journal = cls()
+        for entry in entries:
+            if isinstance(entry, str):
+                journal._append_legacy(entry)
+                continue
+            record = JournalRecord(*entry)
+            journal._add(record)
+            journal.next_txid = max(journal.next_txid, record.txid + 1)
+        return journal
+
+    def _append_legacy(self, entry):
+        # Entradas de texto antiguas: se conservan como registros sin inodo ni rango de bloques
+        match = _LEGACY_ENTRY.match(entry)
+        if match is None:
+            return
+        labels = {label: op for op, label in OPERATION_LABELS.items()}
+        op = labels.get(match.group("label"), "create")
+        self.append(match.group("name"), op, None, None, None, match.group("path"))
@@ -0,0 +1,87 @@
+import threading
+import time
+
+
+class InstrumentedLock:
+    """Candado que mide cuántas veces se tomó, cuántas tuvo que esperar y cuánto tiempo esperó"""
+
+    def __init__(self, lock=None):
+        self._lock = lock if lock is not None else threading.Lock()
+        # Los contadores solo se actualizan con el candado tomado, así que no necesitan otro candado
+        self.acquisitions = 0
+        self.contended = 0  # Veces que el candado estaba ocupado
+        self.failed_tries = 0  # Intentos sin espera (blocking=False) que no lo consiguieron
+        self._failed_lock = threading.Lock()
+        self.wait_time = 0.0
+        self.max_wait = 0.0
+
+    def acquire(self, blocking=True):
+        if self._lock.acquire(False):
+            self.acquisitions += 1
+            return True
+        if not blocking:
+            # Sin el candado tomado el contador necesita su propia protección
+            with self._failed_lock:
+                self.failed_tries += 1
+            return False
+        started = time.perf_counter()
+        self._lock.acquire()
+        waited = time.perf_counter() - started
+        self.acquisitions += 1
+        self.contended += 1
+        self.wait_time += waited
+        if waited > self.max_wait:
+            self.max_wait = waited
+        return True
+
+    def release(self):
+        self._lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class LockTable:
+    """Candados por familia y clave (por ejemplo ("dir", ruta) o ("group", 3)), creados bajo demanda"""
+
+    def __init__(self, lock_type=threading.Lock):
+        self.locks = {}  # (familia, clave) -> InstrumentedLock
+        self.lock_type = lock_type  # threading.Lock o threading.RLock para los candados nuevos
+        self._create = threading.Lock()
+
+    def get(self, family, key=None):
+        lock = self.locks.get((family, key))
+        if lock is None:
+            with self._create:
+                lock = self.locks.get((family, key))
+                if lock is None:
+                    lock = self.locks[(family, key)] = InstrumentedLock(self.lock_type())
+        return lock
+
+    def add(self, family, lock, key=None):
+        """Registra un candado ya existente (por ejemplo, el candado global del motor) para medirlo"""
+        self.locks[(family, key)] = lock
+        return lock
+
+    def stats(self):
+        """Métricas agregadas por familia: tomas, esperas, tiempo total, medio y máximo de espera"""
+        families = {}
+        for (family, _), lock in self.locks.items():
+            entry = families.setdefault(family, {'locks': 0, 'acquisitions': 0, 'contended': 0, 'failed_tries': 0,
+                                                 'wait_s': 0.0, 'max_wait_s': 0.0})
+            entry['locks'] += 1
+            entry['acquisitions'] += lock.acquisitions
+            entry['contended'] += lock.contended
+            entry['failed_tries'] += lock.failed_tries
+            entry['wait_s'] += lock.wait_time
+            entry['max_wait_s'] = max(entry['max_wait_s'], lock.max_wait)
+        for entry in families.values():
+            entry['contention'] = round(entry['contended'] / entry['acquisitions'], 6) if entry['acquisitions'] else 0.0
+            entry['mean_wait_us'] = round(entry['wait_s'] / entry['contended'] * 1e6, 3) if entry['contended'] else 0.0
+            entry['wait_s'] = round(entry['wait_s'], 6)
+            entry['max_wait_s'] = round(entry['max_wait_s'], 6)
+        return families
@@ -0,0 +1,143 @@
+import os
+import json
+import threading
+from bisect import bisect_left
+
+# Límites de los buckets de latencia en segundos: de 1 µs a ~16 s, duplicando en cada paso
+LATENCY_BUCKETS = tuple(1e-6 * 2 ** k for k in range(25))
+
+
+class Histogram:
+    """Histograma de latencias con buckets fijos (como los de Prometheus)"""
+
+    def __init__(self, bounds=LATENCY_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # El último bucket es +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        """Límite superior del bucket donde cae el cuantil 'q' (aproximación por buckets)"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+    def cumulative(self):
+        # Pares (límite, observaciones <= límite), el último con límite +Inf
+        total = 0
+        result = []
+        for bound, count in zip(self.bounds + (float("inf"),), self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+
+class Metrics:
+    """Registro de métricas del motor: latencia por operación, contadores y medidores leídos al exportar"""
+
+    def __init__(self, counters=(), buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.histograms = {}  # operación -> Histogram
+        self.errors = {}  # operación -> operaciones que terminaron con error
+        self.counters = dict.fromkeys(counters, 0)  # nombre -> valor (los indicados se exportan aunque sigan en 0)
+        self.collectors = []  # Funciones que devuelven {nombre: valor}; se llaman solo al exportar
+        self._lock = threading.Lock()  # Las operaciones pueden venir del hilo de E/S y del de Tk
+
+    def observe(self, operation, seconds, failed=False):
+        with self._lock:
+            histogram = self.histograms.get(operation)
+            if histogram is None:
+                histogram = self.histograms[operation] = Histogram(self.buckets)
+            histogram.observe(seconds)
+            if failed:
+                self.errors[operation] = self.errors.get(operation, 0) + 1
+
+    def inc(self, name, amount=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def add_collector(self, collector):
+        self.collectors.append(collector)
+
+    def snapshot(self):
+        """Estado actual como dict (lo que se exporta en JSON)"""
+        with self._lock:
+            counters = dict(self.counters)
+            operations = {}
+            for operation, histogram in self.histograms.items():
+                operations[operation] = {
+                    'count': histogram.count,
+                    'errors': self.errors.get(operation, 0),
+                    'sum_s': round(histogram.sum, 9),
+                    'p50_s': histogram.quantile(0.50),
+                    'p99_s': histogram.quantile(0.99),
+                    'buckets': [[bound if bound != float("inf") else "+Inf", total]
+                                for bound, total in histogram.cumulative()],
+                }
+        for collector in self.collectors:
+            counters.update(collector())
+        return {'operations': operations, 'counters': counters}
+
+    def to_prometheus(self, prefix="fs"):
+        """Formato de texto de Prometheus (exposition format 0.0.4)"""
+        data = self.snapshot()
+        lines = [f"# HELP {prefix}_operation_duration_seconds Latencia de las operaciones del motor",
+                 f"# TYPE {prefix}_operation_duration_seconds histogram"]
+        for operation, entry in sorted(data['operations'].items()):
+            for bound, total in entry['buckets']:
+                le = bound if bound == "+Inf" else repr(bound)
+                lines.append(f'{prefix}_operation_duration_seconds_bucket{{op="{operation}",le="{le}"}} {total}')
+            lines.append(f'{prefix}_operation_duration_seconds_sum{{op="{operation}"}} {entry["sum_s"]}')
+            lines.append(f'{prefix}_operation_duration_seconds_count{{op="{operation}"}} {entry["count"]}')
+        lines.append(f"# TYPE {prefix}_operation_errors_total counter")
+        for operation, entry in sorted(data['operations'].items()):
+            lines.append(f'{prefix}_operation_errors_total{{op="{operation}"}} {entry["errors"]}')
+        for name, value in sorted(data['counters'].items()):
+            kind = "counter" if name.endswith("_total") else "gauge"
+            lines.append(f"# TYPE {prefix}_{name} {kind}")
+            lines.append(f"{prefix}_{name} {value}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        """Escribe las métricas de forma atómica: JSON si la extensión es .json, si no texto de Prometheus"""
+        if path.endswith('.json'):
+            text = json.dumps(self.snapshot(), indent=2, sort_keys=True) + "\n"
+        else:
+            text = self.to_prometheus()
+        temp_file = path + '.tmp'
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(temp_file, path)
+
+
+class MetricsExporter:
+    """Hilo que escribe las métricas en un archivo local cada 'interval' segundos"""
+
+    def __init__(self, metrics, path, interval=10.0):
+        self.metrics = metrics
+        self.path = path
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="metrics-export", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.metrics.write(self.path)
+
+    def stop(self):
+        """Detiene el hilo y escribe una última vez"""
+        self._stop.set()
+        self._thread.join()
+        self.metrics.write(self.path)
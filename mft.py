@@ -0,0 +1,317 @@
+import os
+import heapq
+import struct
+
+from btree import BTree
+
+RECORD_SIZE = 1024  # Bytes por registro, como en NTFS
+ROOT_RECORD = 5  # Registro del directorio raíz "."
+FIRST_USER_RECORD = 16  # Los registros 0-15 están reservados para los metadatos del sistema
+MAX_NAME_BYTES = 510  # Máximo de bytes de nombre (el resto del registro queda para los runs)
+
+# Metarchivos del sistema en los primeros registros
+SYSTEM_FILES = ["$MFT", "$MFTMirr", "$LogFile", "$Volume", "$AttrDef", ".", "$Bitmap", "$Boot",
+                "$BadClus", "$Secure", "$UpCase", "$Extend"]
+
+# Indicadores de cada registro
+IN_USE = 1
+DIRECTORY = 2
+EXTENSION = 4  # Registro de extensión: guarda los runs que no cupieron en el registro base
+
+# Cabecera: firma, indicadores, secuencia, número, padre, tamaño, bloques, largo del nombre, cantidad de runs, extensión
+_HEADER = struct.Struct('<4sHHIIQIHHI')
+_RUN = struct.Struct('<II')  # Run de datos: cluster inicial y cantidad de clusters
+_FLAGS = struct.Struct('<H')
+_EXTENSION_RUNS = (RECORD_SIZE - _HEADER.size) // _RUN.size  # Runs por registro de extensión
+
+
+class MftFullError(Exception):
+    """La zona reservada para la MFT no tiene más registros libres"""
+
+
+class MasterFileTable:
+    """MFT de registros de 1 KB con listas de runs y un índice B+ por directorio"""
+
+    def __init__(self, storage=None):
+        # 'storage' es una vista de capacidad fija (la zona MFT de la imagen de disco);
+        # sin ella los registros viven en un bytearray que crece a medida que hace falta
+        self.data = storage if storage is not None else bytearray()
+        self.fixed = storage is not None
+        if self.fixed:
+            # La tabla se reconstruye desde el estado guardado: se descartan registros de sesiones anteriores
+            storage[:] = bytes(len(storage))
+        self.next_record = FIRST_USER_RECORD
+        self.free_records = []  # Montículo de registros liberados (se reutiliza el menor)
+        self.files = {}  # archivo -> número de registro base
+        self.indexes = {}  # registro de directorio -> BTree(nombre -> registro)
+        self.directories = {}  # ruta de directorio -> registro
+        self.directory_paths = {}  # registro de directorio -> ruta
+        self.records_written = 0
+        self.changed = set()  # Archivos escritos o eliminados desde el último checkpoint (estado en SQLite)
+
+        for number, name in enumerate(SYSTEM_FILES):
+            flags = IN_USE | (DIRECTORY if number == ROOT_RECORD else 0)
+            self._write(number, flags, ROOT_RECORD, 0, 0, name, [])
+        self.indexes[ROOT_RECORD] = BTree()
+
+    def __len__(self):
+        return len(self.files)
+
+    def __contains__(self, key):
+        return key in self.files
+
+    @property
+    def nbytes(self):
+        return self.next_record * RECORD_SIZE
+
+    def detach(self):
+        """Copia los registros a memoria y suelta la vista de la imagen de disco"""
+        if self.fixed:
+            storage = self.data
+            self.data = bytearray(storage[:self.next_record * RECORD_SIZE])
+            self.fixed = False
+            storage.release()
+
+    def _ensure(self, number):
+        needed = (number + 1) * RECORD_SIZE
+        if needed <= len(self.data):
+            return
+        if self.fixed:
+            raise MftFullError("La zona reservada para la MFT está llena.")
+        self.data.extend(bytes(max(needed - len(self.data), len(self.data), 64 * RECORD_SIZE)))
+
+    def _allocate_record(self):
+        if self.free_records:
+            return heapq.heappop(self.free_records)
+        number = self.next_record
+        self._ensure(number)
+        self.next_record += 1
+        return number
+
+    def claim_record(self, number):
+        """Reserva el registro 'number' si está libre (para recrear un archivo con su número); si no, otro cualquiera"""
+        if number >= self.next_record:
+            self._ensure(number)
+            for free in range(self.next_record, number):
+                heapq.heappush(self.free_records, free)
+            self.next_record = number + 1
+            return number
+        if number in self.free_records:
+            self.free_records.remove(number)
+            heapq.heapify(self.free_records)
+            return number
+        return self._allocate_record()
+
+    def _release_record(self, number):
+        _FLAGS.pack_into(self.data, number * RECORD_SIZE + 4, 0)
+        heapq.heappush(self.free_records, number)
+
+    def _header(self, number):
+        return _HEADER.unpack_from(self.data, number * RECORD_SIZE)
+
+    def _write(self, number, flags, parent, size, blocks, name, runs):
+        # Escribe el registro base y encadena registros de extensión si los runs no caben
+        self._ensure(number)
+        name_bytes = name.encode('utf-8')
+        capacity = (RECORD_SIZE - _HEADER.size - len(name_bytes)) // _RUN.size
+        base_runs, rest = runs[:capacity], runs[capacity:]
+        if rest and self.fixed:
+            # Comprobar antes de tocar nada que hay registros para todas las extensiones
+            needed = -(-len(rest) // _EXTENSION_RUNS)
+            if needed > len(self.free_records) + len(self.data) // RECORD_SIZE - self.next_record:
+                raise MftFullError("La zona reservada para la MFT está llena.")
+
+        # Liberar las extensiones anteriores de este registro antes de escribir las nuevas
+        previous = self._header(number)
+        if previous[0] == b'FILE' and previous[1] & IN_USE:
+            self._free_extensions(previous[9])
+
+        extension = self._write_extensions(number, rest) if rest else 0
+        offset = number * RECORD_SIZE
+        _HEADER.pack_into(self.data, offset, b'FILE', flags, 1, number, parent, size, blocks,
+                          len(name_bytes), len(base_runs), extension)
+        offset += _HEADER.size
+        self.data[offset:offset + len(name_bytes)] = name_bytes
+        offset += len(name_bytes)
+        for start, length in base_runs:
+            _RUN.pack_into(self.data, offset, start, length)
+            offset += _RUN.size
+        self.records_written += 1
+
+    def _write_extensions(self, base, runs):
+        capacity = _EXTENSION_RUNS
+        first = None
+        previous = None
+        for i in range(0, len(runs), capacity):
+            number = self._allocate_record()
+            chunk = runs[i:i + capacity]
+            offset = number * RECORD_SIZE
+            _HEADER.pack_into(self.data, offset, b'FILE', IN_USE | EXTENSION, 1, number, base, 0, 0, 0, len(chunk), 0)
+            offset += _HEADER.size
+            for start, length in chunk:
+                _RUN.pack_into(self.data, offset, start, length)
+                offset += _RUN.size
+            if previous is None:
+                first = number
+            else:
+                # Enlazar la extensión anterior con esta (campo 'extension' al final de la cabecera)
+                struct.pack_into('<I', self.data, previous * RECORD_SIZE + _HEADER.size - 4, number)
+            previous = number
+            self.records_written += 1
+        return first
+
+    def _free_extensions(self, number):
+        while number:
+            following = self._header(number)[9]
+            self._release_record(number)
+            number = following
+
+    def read(self, number):
+        """Lee un registro completo (incluidos los runs de sus extensiones)"""
+        magic, flags, _, number, parent, size, blocks, name_length, run_count, extension = self._header(number)
+        offset = number * RECORD_SIZE + _HEADER.size
+        name = bytes(self.data[offset:offset + name_length]).decode('utf-8')
+        offset += name_length
+        runs = [list(run) for run in _RUN.iter_unpack(self.data[offset:offset + run_count * _RUN.size])]
+        while extension:
+            _, _, _, _, _, _, _, _, count, following = self._header(extension)
+            offset = extension * RECORD_SIZE + _HEADER.size
+            runs += [list(run) for run in _RUN.iter_unpack(self.data[offset:offset + count * _RUN.size])]
+            extension = following
+        return {'record': number, 'flags': flags, 'name': name, 'parent': parent,
+                'size': size, 'blocks': blocks, 'runs': runs}
+
+    def directory_record(self, path, create=True):
+        """Registro del directorio 'path', creando los registros de directorio que falten (O(profundidad))"""
+        number = self.directories.get(path)
+        if number is not None:
+            return number
+
+        parent = ROOT_RECORD
+        for component in path.replace('\\', '/').split('/'):
+            if component in ("", "."):
+                continue
+            child = self.indexes[parent].get(component)
+            if child is None:
+                if not create:
+                    return None
+                child = self._allocate_record()
+                self._write(child, IN_USE | DIRECTORY, parent, 0, 0, component, [])
+                self.indexes[parent].insert(component, child)
+                self.indexes[child] = BTree()
+            parent = child
+        self.directories[path] = parent
+        self.directory_paths[parent] = path
+        return parent
+
+    def write_file(self, key, path, size, blocks, runs, number=None):
+        """Crea o actualiza el registro del archivo 'key' con su ruta, tamaño y runs de datos"""
+        name = os.path.basename(path)
+        parent = self.directory_record(os.path.dirname(path))
+        current = self.files.get(key)
+        old_entry = None
+        if current is not None:
+            old_entry = self._header(current)[4], self.read(current)['name']
+            number = current
+        elif number is None:
+            number = self._allocate_record()
+
+        try:
+            self._write(number, IN_USE, parent, size, blocks, name, runs)
+        except MftFullError:
+            if current is None:
+                heapq.heappush(self.free_records, number)
+            raise
+        if old_entry is not None and old_entry != (parent, name):
+            self.indexes[old_entry[0]].delete(old_entry[1])
+        self.files[key] = number
+        self.indexes[parent].insert(name, number)
+        self.changed.add(key)
+        return number
+
+    def move(self, key, new_path):
+        """Cambia el directorio de un archivo actualizando los índices de origen y destino"""
+        entry = self.read(self.files[key])
+        self.write_file(key, new_path, entry['size'], entry['blocks'], entry['runs'])
+
+    def rename(self, key, new_key):
+        """Cambia la clave de un archivo y lo mueve a la ruta 'new_key'"""
+        self.files[new_key] = self.files.pop(key)
+        self.changed.add(key)
+        self.move(new_key, new_key)
+
+    def remove(self, key):
+        number = self.files.pop(key)
+        self.changed.add(key)
+        entry = self._header(number)
+        self.indexes[entry[4]].delete(self.read(number)['name'])
+        self._free_extensions(entry[9])
+        self._release_record(number)
+
+    def runs(self, key):
+        return self.read(self.files[key])['runs']
+
+    def path(self, number):
+        entry = self.read(number)
+        return os.path.join(self.directory_paths.get(entry['parent'], ""), entry['name'])
+
+    def get(self, key):
+        """Registro del archivo 'key' con su ruta, o None si no existe"""
+        number = self.files.get(key)
+        if number is None:
+            return None
+        entry = self.read(number)
+        entry['path'] = os.path.join(self.directory_paths.get(entry['parent'], ""), entry['name'])
+        return entry
+
+    def list_directory(self, path, prefix="", limit=None):
+        """Entradas (nombre, registro) de un directorio en orden, filtradas por prefijo: O(log n + k)"""
+        number = self.directory_record(path, create=False)
+        if number is None:
+            return
+        for count, item in enumerate(self.indexes[number].prefix_items(prefix)):
+            if limit is not None and count >= limit:
+                return
+            yield item
+
+    def records(self, start=0, limit=100):
+        """Página de registros en uso a partir del número 'start'; devuelve (registros, siguiente inicio)"""
+        page = []
+        number = start
+        while number < self.next_record and len(page) < limit:
+            flags = _FLAGS.unpack_from(self.data, number * RECORD_SIZE + 4)[0]
+            if flags & IN_USE and not flags & EXTENSION:
+                entry = self.read(number)
+                entry['path'] = os.path.join(self.directory_paths.get(entry['parent'], ""), entry['name'])
+                page.append(entry)
+            number += 1
+        return page, (number if number < self.next_record else None)
+
+    def entry(self, key):
+        # Lo necesario para reconstruir el registro de un archivo: los runs salen de los rangos del archivo
+        entry = self.get(key)
+        return {'record': entry['record'], 'size': entry['size'], 'blocks': entry['blocks'], 'path': entry['path']}
+
+    def to_dict(self):
+        return {key: self.entry(key) for key in self.files}
+
+    @classmethod
+    def rebuild(cls, entries, extents, storage=None):
+        """Reconstruye la MFT a partir de to_dict() respetando los números de registro guardados"""
+        mft = cls(storage)
+        numbered = sorted((entry['record'], key) for key, entry in entries.items() if 'record' in entry)
+        if numbered:
+            mft.next_record = max(FIRST_USER_RECORD, numbered[-1][0] + 1)
+            mft._ensure(mft.next_record - 1)
+            # Los huecos entre registros de archivos quedan libres: ahí se recrean los directorios
+            used = {number for number, _ in numbered}
+            mft.free_records = [number for number in range(FIRST_USER_RECORD, mft.next_record) if number not in used]
+        for number, key in numbered:
+            entry = entries[key]
+            mft.write_file(key, entry['path'], entry['size'], entry['blocks'], extents.get(key, []), number=number)
+
+        # Entradas sin número de registro (guardadas por versiones anteriores)
+        for key, entry in entries.items():
+            if 'record' not in entry:
+                mft.write_file(key, entry['path'], entry.get('size', 0), entry['blocks'], extents.get(key, []))
+        return mft
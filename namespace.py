@@ -0,0 +1,163 @@
+import os
+import re
+
+# Separadores aceptados en las rutas (las rutas guardadas pueden venir de Windows o de Linux)
+_SEPARATORS = re.compile(r'[\\/]+')
+
+
+class _Directory:
+    __slots__ = ("name", "parent", "children", "files")
+
+    def __init__(self, name, parent):
+        self.name = name
+        self.parent = parent
+        self.children = {}  # nombre -> _Directory
+        self.files = set()  # nombres de los archivos de este directorio
+
+
+class Namespace:
+    """Árbol de directorios del disco simulado: resolución de rutas en O(profundidad) y renombrado de subárboles"""
+
+    def __init__(self):
+        self.root = _Directory("", None)
+        self.file_count = 0
+
+    @staticmethod
+    def normalize(path):
+        """Ruta absoluta y normalizada: es la clave con la que el motor identifica cada archivo"""
+        return os.path.abspath(path)
+
+    @staticmethod
+    def split(path):
+        return [part for part in _SEPARATORS.split(path) if part not in ("", ".")]
+
+    @staticmethod
+    def join(components):
+        path = os.sep.join(components)
+        # En Windows el primer componente es la unidad ("C:"); en Linux la ruta empieza en "/"
+        return path if os.path.splitdrive(path)[0] else os.sep + path
+
+    def directory(self, path, create=False):
+        """Nodo del directorio 'path' (None si no existe y no se pide crearlo)"""
+        node = self.root
+        for component in self.split(path):
+            child = node.children.get(component)
+            if child is None:
+                if not create:
+                    return None
+                child = node.children[component] = _Directory(component, node)
+            node = child
+        return node
+
+    def path_of(self, node):
+        components = []
+        while node.parent is not None:
+            components.append(node.name)
+            node = node.parent
+        return self.join(components[::-1])
+
+    def is_dir(self, path):
+        return self.directory(path) is not None
+
+    def exists(self, path):
+        directory, name = os.path.split(path)
+        node = self.directory(directory)
+        return node is not None and (name in node.files or name in node.children)
+
+    def mkdir(self, path):
+        """Crea el directorio (y los padres que falten); devuelve False si ya existía"""
+        parent, name = os.path.split(path)
+        node = self.directory(parent, create=True)
+        if name in node.children or name in node.files:
+            return False
+        node.children[name] = _Directory(name, node)
+        return True
+
+    def rmdir(self, path):
+        """Elimina un directorio vacío; devuelve False si no existe o tiene contenido"""
+        node = self.directory(path)
+        if node is None or node.parent is None or node.children or node.files:
+            return False
+        del node.parent.children[node.name]
+        return True
+
+    def missing_directories(self, path):
+        """Directorios de 'path' (incluido él mismo) que todavía no existen, del más externo al más interno"""
+        missing = []
+        while not self.is_dir(path):
+            missing.append(path)
+            parent = os.path.dirname(path)
+            if parent == path:
+                break
+            path = parent
+        return missing[::-1]
+
+    def add_file(self, path):
+        directory, name = os.path.split(path)
+        files = self.directory(directory, create=True).files
+        if name not in files:
+            files.add(name)
+            self.file_count += 1
+
+    def remove_file(self, path):
+        directory, name = os.path.split(path)
+        node = self.directory(directory)
+        if node is not None and name in node.files:
+            node.files.discard(name)
+            self.file_count -= 1
+
+    def move_file(self, path, new_path):
+        self.remove_file(path)
+        self.add_file(new_path)
+
+    def move_directory(self, path, new_path):
+        """Mueve o renombra un directorio con todo su contenido: solo se reengancha el nodo, O(profundidad)"""
+        node = self.directory(path)
+        if node is None or node.parent is None:
+            raise KeyError(path)
+        parent_path, name = os.path.split(new_path)
+        target = self.directory(parent_path, create=True)
+        # No se puede mover un directorio dentro de sí mismo
+        ancestor = target
+        while ancestor is not None:
+            if ancestor is node:
+                raise ValueError(new_path)
+            ancestor = ancestor.parent
+        if name in target.children or name in target.files:
+            raise FileExistsError(new_path)
+
+        del node.parent.children[node.name]
+        node.name, node.parent = name, target
+        target.children[name] = node
+
+    def files_under(self, path):
+        """Recorre las rutas de todos los archivos del subárbol (solo visita ese subárbol)"""
+        node = self.directory(path)
+        if node is None:
+            return
+        stack = [(node, self.path_of(node))]
+        while stack:
+            node, node_path = stack.pop()
+            for name in node.files:
+                yield os.path.join(node_path, name)
+            for name, child in node.children.items():
+                stack.append((child, os.path.join(node_path, name)))
+
+    def listdir(self, path):
+        """Entradas (nombre, es_directorio) de un directorio, generadas bajo demanda: directorios primero"""
+        node = self.directory(path)
+        if node is None:
+            return
+        for name in node.children:
+            yield name, True
+        for name in node.files:
+            yield name, False
+
+    def empty_directories(self):
+        """Rutas de los directorios vacíos (los demás se deducen de las rutas de los archivos)"""
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            if node.parent is not None and not node.children and not node.files:
+                yield self.path_of(node)
+            stack.extend(node.children.values())
@@ -0,0 +1,40 @@
+from collections import namedtuple
+
+# Estado de un archivo en el momento de la instantánea: uso de bloques, rangos, tamaño, entradas de
+# la Allocation Table, del inodo y de la MFT, el contenido (imagen de disco o archivo real), la compresión
+# y las huellas de sus clusters en el almacén por contenido (None sin deduplicación)
+FileState = namedtuple("FileState", "blocks extents size allocation inode mft content compression digests",
+                       defaults=(None, None))
+
+
+class Snapshot:
+    """Instantánea copy-on-write del motor: guarda el estado anterior solo de lo que cambia después de crearla"""
+
+    def __init__(self, name, algorithm, journal_length, next_inode, cursor, wal_mark=None, region_cursors=None):
+        self.name = name
+        self.algorithm = algorithm
+        self.formatted = False  # Se aplicó otro formato después de la instantánea (hay que reconstruir todo)
+        self.journal_length = journal_length
+        self.next_inode = next_inode
+        self.cursor = cursor
+        self.region_cursors = region_cursors or {}  # Cursores de next-fit por región de asignación
+        self.wal_mark = wal_mark  # Posición del log al crearla (None si no hay log)
+        self.files = {}  # ruta -> FileState (None si el archivo no existía)
+        self.directories = []  # Operaciones de carpetas a deshacer: ("mkdir", creadas) o ("mvdir", origen, destino, creadas)
+
+    def __len__(self):
+        # Archivos modificados desde la instantánea
+        return len(self.files)
+
+    def absorb(self, newer):
+        """Incorpora los cambios de la instantánea siguiente (al eliminarla, su historia pasa a esta)"""
+        for path, state in newer.files.items():
+            self.files.setdefault(path, state)
+        self.directories.extend(newer.directories)
+        self.formatted = self.formatted or newer.formatted
+
+    def reset(self):
+        # Después de volver a la instantánea el estado es idéntico al suyo: no queda nada por deshacer
+        self.files = {}
+        self.directories = []
+        self.formatted = False
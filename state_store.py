@@ -0,0 +1,347 @@
+import json
+import sqlite3
+import threading
+from collections.abc import MutableMapping
+
+from journal import Journal, JournalRecord
+
+# Estado del motor en un archivo SQLite. A diferencia del JSON, que se lee completo al abrir, aquí cada tabla
+# del motor es una tabla de la base: al abrir solo se leen los contadores del superbloque y el resto se trae
+# cuando se consulta. Los checkpoints escriben únicamente lo que cambió, en una sola transacción.
+
+DELETED = object()  # Marca de una entrada borrada en la lista de cambios de una tabla
+_MISSING = object()
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS superblock (key TEXT PRIMARY KEY, value TEXT) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS entries (name TEXT, key TEXT, value TEXT, PRIMARY KEY (name, key)) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS journal (position INTEGER PRIMARY KEY, txid INTEGER, file TEXT, op TEXT, inode INTEGER,
+                                    start_block INTEGER, end_block INTEGER, path TEXT);
+CREATE INDEX IF NOT EXISTS journal_file ON journal (file, position);
+CREATE INDEX IF NOT EXISTS journal_moves ON journal (path, position) WHERE op = 'move';
+CREATE TABLE IF NOT EXISTS free_runs (start INTEGER PRIMARY KEY, length INTEGER);
+CREATE TABLE IF NOT EXISTS directories (path TEXT PRIMARY KEY) WITHOUT ROWID;
+"""
+
+
+def _dumps(value):
+    return json.dumps(value, separators=(',', ':'))
+
+
+class StateStore:
+    """Archivo SQLite con el superbloque, las tablas por archivo, el journal, los runs libres y las carpetas vacías"""
+
+    # Tablas por archivo del motor (la de la MFT guarda las entradas de to_dict())
+    TABLES = ("block_usage", "file_extents", "file_sizes", "allocation_table", "inodes", "mft")
+
+    def __init__(self, path):
+        self.path = path
+        # Las lecturas diferidas pueden venir del hilo de Tk y del de E/S: una conexión compartida con su candado
+        self.connection = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self._lock = threading.Lock()
+        self.connection.executescript(_SCHEMA)
+
+    def _query(self, sql, parameters=()):
+        with self._lock:
+            return self.connection.execute(sql, parameters).fetchall()
+
+    def is_empty(self):
+        return not self._query("SELECT 1 FROM superblock LIMIT 1")
+
+    def superblock(self):
+        return {key: json.loads(value) for key, value in self._query("SELECT key, value FROM superblock")}
+
+    def get(self, name, key):
+        """Valor de 'key' en la tabla 'name', o _MISSING si no está"""
+        rows = self._query("SELECT value FROM entries WHERE name = ? AND key = ?", (name, key))
+        return json.loads(rows[0][0]) if rows else _MISSING
+
+    def count(self, name):
+        return self._query("SELECT COUNT(*) FROM entries WHERE name = ?", (name,))[0][0]
+
+    def _pages(self, sql, name, page=4096):
+        # Recorre una tabla por páginas (por clave) sin traerla completa de una vez
+        last = ""
+        while True:
+            rows = self._query(sql, (name, last, page))
+            yield from rows
+            if len(rows) < page:
+                return
+            last = rows[-1][0]
+
+    def keys(self, name):
+        for (key,) in self._pages("SELECT key FROM entries WHERE name = ? AND key > ? ORDER BY key LIMIT ?", name):
+            yield key
+
+    def items(self, name):
+        for key, value in self._pages("SELECT key, value FROM entries WHERE name = ? AND key > ? ORDER BY key LIMIT ?",
+                                      name):
+            yield key, json.loads(value)
+
+    def journal_length(self):
+        return self._query("SELECT COALESCE(MAX(position) + 1, 0) FROM journal")[0][0]
+
+    def journal_next_txid(self):
+        return self._query("SELECT COALESCE(MAX(txid) + 1, 1) FROM journal")[0][0]
+
+    def journal_page(self, start, count):
+        rows = self._query("SELECT txid, file, op, inode, start_block, end_block, path FROM journal "
+                           "WHERE position >= ? AND position < ? ORDER BY position", (start, start + count))
+        return [JournalRecord(*row) for row in rows]
+
+    def journal_positions(self, file_name, end):
+        rows = self._query("SELECT position FROM journal WHERE file = ? AND position < ? ORDER BY position",
+                           (file_name, end))
+        return [position for (position,) in rows]
+
+    def journal_moves(self, path, end):
+        # Registros "move" que salen de 'path' (su ruta anterior) antes de 'end'
+        rows = self._query("SELECT position FROM journal WHERE op = 'move' AND path = ? AND file != path "
+                           "AND position < ? ORDER BY position", (path, end))
+        return [position for (position,) in rows]
+
+    def free_runs(self):
+        return self._query("SELECT start, length FROM free_runs ORDER BY start")
+
+    def directories(self):
+        return [path for (path,) in self._query("SELECT path FROM directories")]
+
+    def save(self, superblock, tables=None, journal=None, free_runs=None, directories=None):
+        """Guarda un checkpoint en una transacción; devuelve los bytes de datos escritos.
+        'tables' es {tabla: (reemplazar_todo, [(clave, valor o DELETED), ...])}; 'journal' es
+        (registros que se conservan, registros nuevos); None = sin cambios"""
+        written = 0
+        with self._lock:
+            cursor = self.connection.cursor()
+            cursor.execute("BEGIN")
+            try:
+                rows = [(key, _dumps(value)) for key, value in superblock.items()]
+                cursor.executemany("INSERT OR REPLACE INTO superblock VALUES (?, ?)", rows)
+                written += sum(len(key) + len(value) for key, value in rows)
+
+                for name, (replace, changes) in (tables or {}).items():
+                    if replace:
+                        cursor.execute("DELETE FROM entries WHERE name = ?", (name,))
+                    removed = []
+                    updated = []
+                    for key, value in changes:
+                        if value is DELETED:
+                            removed.append((name, key))
+                        else:
+                            updated.append((name, key, _dumps(value)))
+                    cursor.executemany("DELETE FROM entries WHERE name = ? AND key = ?", removed)
+                    cursor.executemany("INSERT OR REPLACE INTO entries VALUES (?, ?, ?)", updated)
+                    written += sum(len(key) + len(value) for _, key, value in updated)
+
+                if journal is not None:
+                    kept, appended = journal
+                    cursor.execute("DELETE FROM journal WHERE position >= ?", (kept,))
+                    records = list(enumerate(appended, kept))
+                    cursor.executemany("INSERT INTO journal VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                                       [(position,) + tuple(record) for position, record in records])
+                    written += 48 * len(records)
+
+                if free_runs is not None:
+                    cursor.execute("DELETE FROM free_runs")
+                    cursor.executemany("INSERT INTO free_runs VALUES (?, ?)", free_runs)
+                    written += 16 * len(free_runs)
+
+                if directories is not None:
+                    cursor.execute("DELETE FROM directories")
+                    cursor.executemany("INSERT INTO directories VALUES (?)", [(path,) for path in directories])
+                    written += sum(len(path) for path in directories)
+                cursor.execute("COMMIT")
+            except BaseException:
+                cursor.execute("ROLLBACK")
+                raise
+        return written
+
+    def close(self):
+        with self._lock:
+            self.connection.close()
+
+
+class LazyTable(MutableMapping):
+    """Tabla del motor respaldada por SQLite: cada entrada se lee al pedirla y las modificadas se guardan en el
+    checkpoint (con su valor de ese momento). Recorrerla completa la carga una sola vez"""
+
+    def __init__(self, store, name):
+        self.store = store
+        self.name = name
+        self.loaded = {}
+        self.missing = set()  # Claves consultadas que no existen (o que se borraron)
+        self.dirty = set()  # Claves escritas o borradas desde el último checkpoint
+        self.complete = False  # Todas las entradas de la base ya están en 'loaded'
+        self.length = None  # Cantidad de entradas (se calcula la primera vez que se pide)
+
+    def __getitem__(self, key):
+        try:
+            return self.loaded[key]
+        except KeyError:
+            pass
+        if self.complete or key in self.missing:
+            raise KeyError(key)
+        value = self.store.get(self.name, key)
+        if value is _MISSING:
+            self.missing.add(key)
+            raise KeyError(key)
+        self.loaded[key] = value
+        return value
+
+    def __contains__(self, key):
+        if key in self.loaded:
+            return True
+        try:
+            self[key]
+        except KeyError:
+            return False
+        return True
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __setitem__(self, key, value):
+        if self.length is not None and key not in self:
+            self.length += 1
+        self.loaded[key] = value
+        self.missing.discard(key)
+        self.dirty.add(key)
+
+    def __delitem__(self, key):
+        self[key]  # KeyError si no existe
+        del self.loaded[key]
+        self.missing.add(key)
+        self.dirty.add(key)
+        if self.length is not None:
+            self.length -= 1
+
+    def _load_all(self):
+        if self.complete:
+            return
+        for key, value in self.store.items(self.name):
+            if key not in self.loaded and key not in self.missing:
+                self.loaded[key] = value
+        self.complete = True
+        self.missing.clear()
+        self.length = len(self.loaded)
+
+    def __iter__(self):
+        self._load_all()
+        return iter(self.loaded)
+
+    def __len__(self):
+        if self.length is None:
+            if self.complete:
+                self.length = len(self.loaded)
+            else:
+                self.length = self.store.count(self.name) + sum(
+                    1 for key in self.dirty if key in self.loaded) - sum(
+                    1 for key in self.dirty if self.store.get(self.name, key) is not _MISSING)
+        return self.length
+
+    def iter_keys(self):
+        """Recorre las claves sin cargar los valores (las de la base y las agregadas después)"""
+        if self.complete:
+            yield from list(self.loaded)
+            return
+        added = {key for key in self.dirty if key in self.loaded}
+        for key in self.store.keys(self.name):
+            if key in self.missing:
+                continue
+            added.discard(key)
+            yield key
+        yield from added
+
+    def changes(self):
+        # Cambios pendientes para StateStore.save()
+        return [(key, self.loaded.get(key, DELETED)) for key in self.dirty]
+
+    def saved(self):
+        self.dirty.clear()
+
+
+class LazyJournal(Journal):
+    """Journal EXT guardado en SQLite: los registros se leen por páginas al consultarlos y los nuevos quedan en
+    memoria hasta el checkpoint"""
+
+    PAGE_SIZE = 256  # Registros por página leída de la base
+    MAX_PAGES = 64  # Páginas que se mantienen en memoria
+
+    def __init__(self, store):
+        self.store = store
+        self.kept = store.journal_length()  # Registros de la base que siguen vigentes
+        self.records = []  # Registros nuevos (posiciones desde 'kept')
+        self.index = {}  # archivo -> posiciones de sus registros nuevos
+        self.moves = {}  # ruta anterior -> posiciones de los registros "move" nuevos que salen de ella
+        self.pages = {}  # número de página -> registros (en orden de uso)
+        self.next_txid = store.journal_next_txid()
+
+    def __len__(self):
+        return self.kept + len(self.records)
+
+    def _stored(self, position):
+        number = position // self.PAGE_SIZE
+        page = self.pages.pop(number, None)
+        if page is None:
+            page = self.store.journal_page(number * self.PAGE_SIZE, self.PAGE_SIZE)
+            if len(self.pages) >= self.MAX_PAGES:
+                del self.pages[next(iter(self.pages))]
+        self.pages[number] = page
+        return page[position - number * self.PAGE_SIZE]
+
+    def __getitem__(self, position):
+        if position < 0:
+            position += len(self)
+        if not 0 <= position < len(self):
+            raise IndexError(position)
+        if position < self.kept:
+            return self._stored(position)
+        return self.records[position - self.kept]
+
+    def __iter__(self):
+        for position in range(self.kept):
+            yield self._stored(position)
+        yield from list(self.records)
+
+    def _keyed(self, file_name, end):
+        # Igual que en Journal, con las posiciones de la base y las de los registros nuevos
+        stored = min(end, self.kept)
+        moves = self.store.journal_moves(file_name, stored)
+        moves += [position for position in self.moves.get(file_name, ()) if position < end]
+        start = moves[-1] if moves else -1
+        positions = self.store.journal_positions(file_name, stored)
+        positions += [position for position in self.index.get(file_name, ()) if position < end]
+        return [position for position in positions if position > start]
+
+    def _reindex(self):
+        self.index = {}
+        self.moves = {}
+        for position, record in enumerate(self.records, self.kept):
+            self._index_record(position, record)
+
+    def truncate(self, length):
+        if length >= self.kept:
+            del self.records[length - self.kept:]
+        else:
+            self.records = []
+            self.kept = length
+            self.pages = {}
+        self._reindex()
+        self.next_txid = self[len(self) - 1].txid + 1 if len(self) else 1
+
+    def to_list(self):
+        return [list(record) for record in self]
+
+    def changes(self):
+        # Cambios pendientes para StateStore.save()
+        return self.kept, self.records
+
+    def saved(self):
+        self.kept += len(self.records)
+        self.records = []
+        self.index = {}
+        self.moves = {}
+        self.pages = {}
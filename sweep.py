@@ -0,0 +1,227 @@
+import os
+import csv
+import sys
+import json
+import argparse
+import functools
+import itertools
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import benchmark
+from engine import ALGORITHMS
+
+# Barrido de parámetros: cada combinación de formato, tamaño de disco, fracción reservada, límite de
+# bloques por archivo, carga y semilla se reproduce en un proceso del pool. Las filas se escriben en el
+# archivo de resultados a medida que terminan, así que un barrido interrumpido se reanuda desde donde quedó.
+
+# Columnas que identifican una configuración (vacías = valor por defecto del formato)
+CONFIG_FIELDS = ["format", "disk_blocks", "reserve_ratio", "max_blocks_per_file", "workload", "ops",
+                 "max_blocks", "seed", "policy"]
+# Operaciones con columnas de latencia propias
+LATENCY_OPS = ["create", "replace", "move", "delete", "mkdir"]
+RESULT_FIELDS = (["ok", "failed", "elapsed_s", "ops_per_sec"]
+                 + [f"{op}_{q}_us" for op in LATENCY_OPS for q in ("p50", "p99")]
+                 + ["files", "fragmented_files", "extents_per_file", "score", "free_space_fragmentation",
+                    "reserved_blocks", "used_blocks", "free_blocks", "peak_memory_bytes", "error"])
+FIELDS = CONFIG_FIELDS + RESULT_FIELDS
+
+
+def configurations(formats=ALGORITHMS, disk_blocks=(100000,), reserve_ratios=(None,), max_blocks_per_file=(None,),
+                   workloads=("uniform",), ops=10000, max_blocks=200, seeds=(0,), policy="first"):
+    """Producto cartesiano de los parámetros: una configuración (dict con CONFIG_FIELDS) por combinación"""
+    for values in itertools.product(workloads, seeds, disk_blocks, reserve_ratios, max_blocks_per_file, formats):
+        workload, seed, blocks, ratio, limit, algorithm = values
+        yield {
+            'format': algorithm,
+            'disk_blocks': blocks,
+            'reserve_ratio': ratio,
+            'max_blocks_per_file': limit,
+            'workload': workload,
+            'ops': ops,
+            'max_blocks': max_blocks,
+            'seed': seed,
+            'policy': policy,
+        }
+
+
+def config_key(row):
+    """Clave de una configuración; igual para un dict recién generado y para una fila leída del CSV o JSON"""
+    return tuple("" if row.get(field) is None else str(row[field]) for field in CONFIG_FIELDS)
+
+
+@functools.lru_cache(maxsize=4)
+def _operations(workload, ops, max_blocks, seed):
+    # Cada proceso genera la carga una vez y la reutiliza para los formatos y discos siguientes
+    return tuple(benchmark.GENERATORS[workload](ops, max_blocks, seed))
+
+
+def run_configuration(config, measure_memory=False):
+    """Reproduce una configuración y devuelve su fila de resultados (se ejecuta en un proceso del pool)"""
+    row = dict(config)
+    algorithm = config['format']
+    options = {}
+    if config['reserve_ratio'] is not None:
+        options['reserve_ratios'] = {algorithm: config['reserve_ratio']}
+    if config['max_blocks_per_file'] is not None:
+        options['max_blocks_per_file'] = {algorithm: config['max_blocks_per_file']}
+    try:
+        operations = _operations(config['workload'], config['ops'], config['max_blocks'], config['seed'])
+        result = benchmark.replay(operations, algorithm, config['disk_blocks'], config['policy'],
+                                  measure_memory, engine_options=options)
+    except Exception as e:
+        row['error'] = f"{type(e).__name__}: {e}"
+        return row
+
+    for field in ("ok", "failed", "elapsed_s", "ops_per_sec"):
+        row[field] = result[field]
+    for op in LATENCY_OPS:
+        latency = result['latency'].get(op)
+        if latency is not None:
+            row[f"{op}_p50_us"] = latency['p50_us']
+            row[f"{op}_p99_us"] = latency['p99_us']
+    row.update(result['fragmentation'])
+    row['reserved_blocks'] = result['blocks']['reserved']
+    row['used_blocks'] = result['blocks']['used']
+    row['free_blocks'] = result['blocks']['free']
+    row['peak_memory_bytes'] = result.get('peak_memory_bytes')
+    row['error'] = ""
+    return row
+
+
+class ResultWriter:
+    """Tabla de resultados en CSV o JSON Lines (según la extensión), escrita fila a fila"""
+
+    def __init__(self, path):
+        self.path = path
+        self.csv = not path.endswith(('.json', '.jsonl'))
+        self.file = None
+        self.writer = None
+
+    def read(self):
+        """Filas completas ya escritas (una línea cortada por una interrupción se descarta)"""
+        if not os.path.exists(self.path):
+            return []
+        rows = []
+        with open(self.path, 'r', newline='', encoding='utf-8') as f:
+            if self.csv:
+                for row in csv.DictReader(f):
+                    # En una fila cortada faltan las últimas columnas (DictReader las deja en None)
+                    if row.get('error') is not None:
+                        rows.append(row)
+            else:
+                for line in f:
+                    try:
+                        rows.append(json.loads(line))
+                    except ValueError:
+                        pass
+        return rows
+
+    def open(self, rows=()):
+        """Reescribe el archivo con 'rows' (las filas que se conservan) y lo deja abierto para anexar"""
+        temp_file = self.path + '.tmp'
+        with open(temp_file, 'w', newline='', encoding='utf-8') as f:
+            self._start(f)
+            for row in rows:
+                self._write_row(row)
+        os.replace(temp_file, self.path)
+        self.file = open(self.path, 'a', newline='', encoding='utf-8')
+        self._start(self.file, header=False)
+
+    def _start(self, f, header=True):
+        self.file = f
+        if self.csv:
+            self.writer = csv.DictWriter(f, fieldnames=FIELDS, extrasaction='ignore')
+            if header:
+                self.writer.writeheader()
+
+    def _write_row(self, row):
+        if self.csv:
+            self.writer.writerow(row)
+        else:
+            self.file.write(json.dumps({field: row.get(field) for field in FIELDS}, ensure_ascii=False) + '\n')
+
+    def write(self, row):
+        self._write_row(row)
+        self.file.flush()  # Cada fila queda en disco apenas termina su configuración
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+def sweep(configs, output, workers=None, measure_memory=False, resume=True, progress=None):
+    """Ejecuta las configuraciones en un ProcessPoolExecutor y devuelve (ejecutadas, omitidas por estar hechas)"""
+    writer = ResultWriter(output)
+    kept = []
+    done = set()
+    if resume:
+        # Se conservan las filas sin error; las que fallaron se vuelven a intentar
+        for row in writer.read():
+            if not row.get('error'):
+                kept.append(row)
+                done.add(config_key(row))
+    pending = [config for config in configs if config_key(config) not in done]
+    skipped = len(done)
+    writer.open(kept)
+
+    finished = 0
+    pool = ProcessPoolExecutor(max_workers=workers or os.cpu_count())
+    try:
+        futures = [pool.submit(run_configuration, config, measure_memory) for config in pending]
+        for future in as_completed(futures):
+            row = future.result()
+            writer.write(row)
+            finished += 1
+            if progress is not None:
+                progress(finished, len(pending), row)
+    except BaseException:
+        # Interrupción (Ctrl+C): no se empiezan más configuraciones; lo ya escrito sirve para reanudar
+        pool.shutdown(wait=True, cancel_futures=True)
+        raise
+    finally:
+        pool.shutdown()
+        writer.close()
+    return finished, skipped
+
+
+def _print_progress(finished, total, row):
+    status = row['error'] or f"{row['ops_per_sec']} ops/s"
+    print(f"[{finished}/{total}] {row['format']} disk={row['disk_blocks']} reserve={row['reserve_ratio']} "
+          f"max={row['max_blocks_per_file']} {row['workload']} seed={row['seed']}: {status}", file=sys.stderr)
+
+
+def _ratio(value):
+    ratio = float(value)
+    if not 0 <= ratio < 1:
+        raise argparse.ArgumentTypeError("la fracción reservada debe estar entre 0 y 1")
+    return ratio
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Barrido de parámetros en paralelo sobre FAT32, NTFS y EXT (resultados en CSV o JSON Lines)")
+    parser.add_argument("--output", required=True, help="Tabla de resultados: .csv, o .jsonl/.json para JSON Lines")
+    parser.add_argument("--formats", nargs="+", choices=ALGORITHMS, default=ALGORITHMS)
+    parser.add_argument("--disk-blocks", nargs="+", type=int, default=[1000, 10000, 100000])
+    parser.add_argument("--reserve-ratios", nargs="+", type=_ratio, default=[None],
+                        help="Fracciones del disco reservadas (por defecto, la de cada formato)")
+    parser.add_argument("--max-blocks-per-file", nargs="+", type=int, default=[None],
+                        help="Límites de bloques por archivo (por defecto, el de cada formato)")
+    parser.add_argument("--workloads", nargs="+", choices=benchmark.WORKLOADS, default=["uniform"])
+    parser.add_argument("--ops", type=int, default=10000, help="Operaciones por carga")
+    parser.add_argument("--max-blocks", type=int, default=200, help="Bloques máximos por archivo en las cargas sintéticas")
+    parser.add_argument("--seeds", nargs="+", type=int, default=[0])
+    parser.add_argument("--policy", choices=["first", "next", "best"], default="first")
+    parser.add_argument("--workers", type=int, default=None, help="Procesos del pool (por defecto, todos los núcleos)")
+    parser.add_argument("--memory", action="store_true", help="Medir también el pico de memoria (segunda pasada)")
+    parser.add_argument("--restart", action="store_true", help="Descartar los resultados existentes en lugar de reanudar")
+    args = parser.parse_args(argv)
+
+    configs = list(configurations(args.formats, args.disk_blocks, args.reserve_ratios, args.max_blocks_per_file,
+                                  args.workloads, args.ops, args.max_blocks, args.seeds, args.policy))
+    finished, skipped = sweep(configs, args.output, args.workers, args.memory, not args.restart, _print_progress)
+    print(f"{finished} configuraciones ejecutadas, {skipped} ya estaban en '{args.output}'", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,325 @@
+import os
+import tkinter as tk
+from tkinter import messagebox, ttk
+
+from fat import format_runs
+from journal import OPERATION_LABELS
+
+
+class TableSource:
+    """Origen de filas para una tabla virtual: filtra y ordena claves, y arma solo las filas que se piden.
+    Las tablas del motor se leen con su candado tomado: el hilo de E/S puede estar cambiándolas"""
+
+    columns = ()
+    widths = {}
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.sort_column = None
+        self.descending = False
+        self.prefix = ""
+        self.block_range = None  # (desde, hasta) inclusive, o None
+        self.keys = []
+
+    # Cada origen define cómo obtener sus claves y los datos de cada una
+    def all_keys(self):
+        raise NotImplementedError
+
+    def has(self, key):
+        # La clave sigue en la tabla (una operación posterior al último refresh pudo quitarla)
+        raise NotImplementedError
+
+    def name(self, key):
+        raise NotImplementedError
+
+    def extents(self, key):
+        raise NotImplementedError
+
+    def sort_value(self, key, column):
+        raise NotImplementedError
+
+    def row(self, key):
+        raise NotImplementedError
+
+    def refresh(self):
+        """Recalcula las claves visibles según el filtro y el orden actuales"""
+        with self.engine.lock:
+            self.keys = self._visible_keys()
+
+    def _visible_keys(self):
+        keys = self.all_keys()
+        if self.prefix:
+            prefix = self.prefix
+            keys = [key for key in keys if self.name(key).startswith(prefix)]
+        if self.block_range is not None:
+            first, last = self.block_range
+            keys = [key for key in keys if self._overlaps(self.extents(key), first, last)]
+        if self.sort_column is not None:
+            column = self.sort_column
+            keys = sorted(keys, key=lambda key: _sortable(self.sort_value(key, column)), reverse=self.descending)
+        return keys
+
+    @staticmethod
+    def _overlaps(extents, first, last):
+        return any(start <= last and start + length - 1 >= first for start, length in extents or ())
+
+    def set_sort(self, column):
+        # Un segundo clic sobre la misma columna invierte el orden
+        if self.sort_column == column:
+            self.descending = not self.descending
+        else:
+            self.sort_column, self.descending = column, False
+        self.refresh()
+
+    def set_filter(self, prefix="", block_range=None):
+        self.prefix = prefix
+        self.block_range = block_range
+        self.refresh()
+
+    def count(self):
+        return len(self.keys)
+
+    def rows(self, offset, limit):
+        # Las claves que ya no están se saltan hasta el próximo refresh
+        with self.engine.lock:
+            return [self.row(key) for key in self.keys[offset:offset + limit] if self.has(key)]
+
+
+def _sortable(value):
+    # Los valores vacíos van al final sin comparar None con números
+    return (value is None, value if value is not None else 0)
+
+
+class AllocationTableSource(TableSource):
+    """Filas de la tabla de asignación FAT32; la cadena de clusters se recorre solo para las filas visibles"""
+
+    columns = ("Archivo", "Bloques", "Cadena de Clusters", "Ruta")
+    widths = {"Archivo": 200, "Bloques": 80, "Cadena de Clusters": 220, "Ruta": 300}
+
+    def all_keys(self):
+        return list(self.engine.allocation_table)
+
+    def has(self, key):
+        return key in self.engine.allocation_table
+
+    def name(self, key):
+        return os.path.basename(key)
+
+    def extents(self, key):
+        return self.engine.file_extents.get(key)
+
+    def sort_value(self, key, column):
+        entry = self.engine.allocation_table[key]
+        if column == "Archivo":
+            return os.path.basename(key)
+        if column == "Bloques":
+            return entry['blocks']
+        if column == "Cadena de Clusters":
+            return entry['start_block']
+        return entry['path']
+
+    def row(self, key):
+        entry = self.engine.allocation_table[key]
+        return (os.path.basename(key), entry['blocks'], format_runs(self.engine.fat_runs(key)), entry['path'])
+
+
+class JournalSource(TableSource):
+    """Filas del journal EXT; sin filtro ni orden las claves son un range y no se copia nada"""
+
+    columns = ("Transacción", "Operación", "Inodo", "Bloques", "Ruta")
+    widths = {"Transacción": 90, "Operación": 200, "Inodo": 70, "Bloques": 100, "Ruta": 300}
+
+    @property
+    def journal(self):
+        # El motor reemplaza el journal al cargar o volver a una instantánea: siempre se lee el actual
+        return self.engine.journal
+
+    def all_keys(self):
+        return range(len(self.journal))
+
+    def has(self, key):
+        return key < len(self.journal)
+
+    def name(self, key):
+        return os.path.basename(self.journal[key].file)
+
+    def extents(self, key):
+        record = self.journal[key]
+        if record.start_block is None:
+            return None
+        return [[record.start_block, record.end_block - record.start_block + 1]]
+
+    def sort_value(self, key, column):
+        record = self.journal[key]
+        if column == "Transacción":
+            return record.txid
+        if column == "Operación":
+            return OPERATION_LABELS.get(record.op, record.op)
+        if column == "Inodo":
+            return record.inode
+        if column == "Bloques":
+            return record.start_block
+        return record.path
+
+    def row(self, key):
+        record = self.journal[key]
+        bloques = f"{record.start_block}-{record.end_block}" if record.start_block is not None else ""
+        # Un movimiento guarda la ruta anterior: se muestra de dónde a dónde
+        ruta = f"{record.path} → {record.file}" if record.op == "move" and record.path != record.file else record.path
+        return (record.txid, OPERATION_LABELS.get(record.op, record.op), record.inode or "", bloques, ruta)
+
+
+class MftSource(TableSource):
+    """Filas de la MFT NTFS: cada fila se lee de su registro de 1 KB al mostrarse"""
+
+    columns = ("Registro", "Nombre Archivo", "Tamaño", "Bloques", "Runs", "Ruta")
+    widths = {"Registro": 70, "Nombre Archivo": 200, "Tamaño": 100, "Bloques": 80, "Runs": 160, "Ruta": 300}
+
+    @property
+    def mft(self):
+        # La MFT se reconstruye al cambiar de formato o volver a una instantánea
+        return self.engine.mft
+
+    def all_keys(self):
+        return list(self.mft.files)
+
+    def has(self, key):
+        return key in self.mft.files
+
+    def name(self, key):
+        return os.path.basename(key)
+
+    def extents(self, key):
+        return self.mft.runs(key)
+
+    def sort_value(self, key, column):
+        if column == "Registro":
+            return self.mft.files[key]
+        if column == "Nombre Archivo":
+            return os.path.basename(key)
+        entry = self.mft.get(key)
+        if column == "Tamaño":
+            return entry['size']
+        if column == "Bloques":
+            return entry['blocks']
+        if column == "Runs":
+            return entry['runs'][0][0] if entry['runs'] else None
+        return entry['path']
+
+    def row(self, key):
+        entry = self.mft.get(key)
+        return (entry['record'], entry['name'], entry['size'], entry['blocks'], format_runs(entry['runs']), entry['path'])
+
+
+class VirtualTable(tk.Frame):
+    """Treeview que solo contiene las filas visibles; el desplazamiento pide al origen la ventana siguiente"""
+
+    def __init__(self, parent, source, height=20):
+        super().__init__(parent)
+        self.source = source
+        self.height = height  # Filas visibles a la vez
+        self.offset = 0  # Índice de la primera fila visible
+
+        # Barra de filtros: prefijo del nombre y rango de bloques
+        filters = tk.Frame(self)
+        filters.pack(fill="x", pady=5)
+        tk.Label(filters, text="Prefijo:").pack(side="left")
+        self.prefix_entry = tk.Entry(filters, width=20)
+        self.prefix_entry.pack(side="left", padx=5)
+        tk.Label(filters, text="Bloques desde:").pack(side="left")
+        self.first_entry = tk.Entry(filters, width=8)
+        self.first_entry.pack(side="left", padx=5)
+        tk.Label(filters, text="hasta:").pack(side="left")
+        self.last_entry = tk.Entry(filters, width=8)
+        self.last_entry.pack(side="left", padx=5)
+        tk.Button(filters, text="Filtrar", command=self.apply_filter).pack(side="left", padx=5)
+        tk.Button(filters, text="Limpiar", command=self.clear_filter).pack(side="left")
+        self.prefix_entry.bind("<Return>", lambda event: self.apply_filter())
+
+        body = tk.Frame(self)
+        body.pack(fill="both", expand=True)
+        self.tree = ttk.Treeview(body, columns=source.columns, show="headings", height=height)
+        for col in source.columns:
+            self.tree.heading(col, text=col, command=lambda c=col: self.sort_by(c))
+            self.tree.column(col, width=source.widths.get(col, 120))
+        self.scrollbar = ttk.Scrollbar(body, orient="vertical", command=self._on_scroll)
+        self.tree.pack(side="left", fill="both", expand=True)
+        self.scrollbar.pack(side="right", fill="y")
+
+        self.count_label = tk.Label(self, anchor="w")
+        self.count_label.pack(fill="x")
+
+        # Rueda del ratón (Windows/macOS y X11) y teclas de página
+        self.tree.bind("<MouseWheel>", lambda event: self.scroll(-1 if event.delta > 0 else 1))
+        self.tree.bind("<Button-4>", lambda event: self.scroll(-1))
+        self.tree.bind("<Button-5>", lambda event: self.scroll(1))
+        self.tree.bind("<Prior>", lambda event: self.scroll(-self.height))
+        self.tree.bind("<Next>", lambda event: self.scroll(self.height))
+        self.tree.bind("<Home>", lambda event: self.scroll_to(0))
+        self.tree.bind("<End>", lambda event: self.scroll_to(self.source.count()))
+
+        self.refresh()
+
+    def refresh(self):
+        """Vuelve a consultar el origen (por ejemplo, después de una operación) y redibuja"""
+        self.source.refresh()
+        self.render()
+
+    def render(self):
+        total = self.source.count()
+        self.offset = max(0, min(self.offset, total - self.height))
+        self.tree.delete(*self.tree.get_children())
+        for values in self.source.rows(self.offset, self.height):
+            self.tree.insert("", "end", values=values)
+
+        if total:
+            self.scrollbar.set(self.offset / total, min(1.0, (self.offset + self.height) / total))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+        shown_last = min(self.offset + self.height, total)
+        self.count_label.config(text=f"{total} filas (mostrando {self.offset + 1 if total else 0}-{shown_last})")
+
+    def scroll(self, rows):
+        self.scroll_to(self.offset + rows)
+
+    def scroll_to(self, offset):
+        self.offset = offset
+        self.render()
+        return "break"
+
+    def _on_scroll(self, action, value, units=None):
+        # Protocolo de ttk.Scrollbar: ("moveto", fracción) o ("scroll", n, "units"/"pages")
+        if action == "moveto":
+            self.scroll_to(int(float(value) * self.source.count()))
+        elif action == "scroll":
+            self.scroll(int(value) * (self.height if units == "pages" else 1))
+
+    def sort_by(self, column):
+        self.source.set_sort(column)
+        for col in self.source.columns:
+            arrow = ""
+            if col == self.source.sort_column:
+                arrow = " ▼" if self.source.descending else " ▲"
+            self.tree.heading(col, text=col + arrow)
+        self.offset = 0
+        self.render()
+
+    def apply_filter(self):
+        first, last = self.first_entry.get().strip(), self.last_entry.get().strip()
+        block_range = None
+        if first or last:
+            try:
+                block_range = (int(first) if first else 0, int(last) if last else float("inf"))
+            except ValueError:
+                messagebox.showwarning("Entrada Inválida", "El rango de bloques debe ser numérico.")
+                return
+        self.source.set_filter(self.prefix_entry.get(), block_range)
+        self.offset = 0
+        self.render()
+
+    def clear_filter(self):
+        for entry in (self.prefix_entry, self.first_entry, self.last_entry):
+            entry.delete(0, tk.END)
+        self.source.set_filter()
+        self.offset = 0
+        self.render()
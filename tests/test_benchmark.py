@@ -0,0 +1,44 @@
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import benchmark
+
+
+class ReplayTest(unittest.TestCase):
+    """Una traza con líneas inválidas se reproduce entera: cada error queda en su operación"""
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder, ignore_errors=True)
+
+    def test_invalid_lines_are_recorded(self):
+        path = os.path.join(self.folder, 'trace.jsonl')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('["create", "a.txt", 10]\n'
+                    '["create", "b.txt"\n'  # JSON incompleto
+                    '\n'
+                    '["delete", "a.txt", "/", "sobra"]\n'  # Demasiados argumentos (TypeError)
+                    '[]\n'  # Sin código de operación (ValueError)
+                    '5\n'
+                    '["create", "c.txt", 5]\n')
+        operations = list(benchmark.read_trace(path))
+        result = benchmark.replay(operations, "EXT", disk_blocks=1000)
+        self.assertEqual(result['operations'], 6)
+        self.assertEqual(result['ok'], 2)
+        self.assertEqual(result['failed'], 4)
+        self.assertEqual([entry['operation'] for entry in result['error_lines']], [2, 3, 4, 5])
+        self.assertEqual(result['error_lines'][0]['error'], "InvalidInputError")
+        self.assertIn("Línea 2", result['error_lines'][0]['message'])
+        self.assertEqual(result['latency']['create']['count'], 2)
+        self.assertEqual(benchmark.write_trace(os.path.join(self.folder, 'copy.jsonl'), operations), 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine import FileSystemEngine
+
+
+class ConvertTest(unittest.TestCase):
+    """Conversión de formato en el lugar: los archivos, su contenido y sus bloques sobreviven"""
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.data_file = os.path.join(self.folder, 'state.json')
+        self.options = dict(host_io=False, disk_image=os.path.join(self.folder, 'disk.img'), cluster_size=512,
+                            disk_blocks=800)
+        self.engine = FileSystemEngine('/v', self.data_file, **self.options)
+        self.engine.apply_algorithm("NTFS")
+        self.engine.checkpoint()
+        self.contents = {}
+        for i in range(12):
+            self.store(f'f{i}.txt', 2 + i % 5, f'archivo {i} ' * (10 + 30 * i))
+        for i in range(0, 12, 3):
+            self.engine.delete_file(f'f{i}.txt')
+            del self.contents[f'/v/f{i}.txt']
+
+    def tearDown(self):
+        self.engine.close()
+        shutil.rmtree(self.folder, ignore_errors=True)
+
+    def store(self, name, blocks, content):
+        blocks = max(blocks, -(-len(content) // 512))
+        self.engine.create_file(name, blocks, content)
+        self.contents[f'/v/{name}'] = content
+
+    def check(self, engine):
+        data_start = engine._data_start()
+        owners = {}
+        for path, extents in engine.file_extents.items():
+            self.assertEqual(engine.file_runs(path), extents, path)
+            for start, length in extents:
+                self.assertGreaterEqual(start, data_start, path)
+                for block in range(start, start + length):
+                    self.assertNotIn(block, owners)
+                    owners[block] = path
+        self.assertEqual(engine.used_blocks, engine.reserved_blocks + len(owners))
+        for path, content in self.contents.items():
+            self.assertEqual(engine.read_file(os.path.basename(path)), content, path)
+        algorithm = engine.selected_algorithm
+        self.assertEqual(set(engine.allocation_table), set(self.contents) if algorithm == "FAT32" else set())
+        self.assertEqual(set(engine.inodes), set(self.contents) if algorithm == "EXT" else set())
+        self.assertEqual(set(engine.mft.files), set(self.contents) if algorithm == "NTFS" else set())
+
+    def test_convert_between_formats(self):
+        for algorithm in ("FAT32", "EXT", "NTFS", "EXT", "FAT32", "NTFS"):
+            report = self.engine.apply_algorithm(algorithm)
+            self.assertEqual(report['files'], len(self.contents))
+            self.check(self.engine)
+
+    def test_converted_files_can_change(self):
+        self.engine.apply_algorithm("FAT32")
+        self.store('nuevo.txt', 6, 'nuevo ' * 200)
+        self.engine.delete_file('f1.txt')
+        del self.contents['/v/f1.txt']
+        self.engine.apply_algorithm("EXT")
+        self.check(self.engine)
+
+    def test_conversion_replays_from_log(self):
+        self.engine.apply_algorithm("FAT32")
+        self.engine.apply_algorithm("EXT")
+        self.engine.save_data()
+        extents = {path: [list(run) for run in runs] for path, runs in self.engine.file_extents.items()}
+        self.engine.wal.close()
+        self.engine.disk_image.flush()
+        replayed = FileSystemEngine('/v', self.data_file, **self.options)
+        try:
+            self.assertEqual(replayed.selected_algorithm, "EXT")
+            self.assertEqual(replayed.file_extents, extents)
+            self.check(replayed)
+        finally:
+            replayed.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
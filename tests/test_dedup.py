@@ -0,0 +1,79 @@
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine import FileSystemEngine
+
+CLUSTER = 512
+
+
+class DedupTest(unittest.TestCase):
+    """Deduplicación y compresión: los clusters iguales se comparten y todo se lee igual después de reabrir"""
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.engines = []
+
+    def tearDown(self):
+        for engine in self.engines:
+            engine.close()
+        shutil.rmtree(self.folder, ignore_errors=True)
+
+    def open(self, data_file, **options):
+        options = dict(dict(host_io=False, disk_image=os.path.join(self.folder, data_file + '.img'),
+                            cluster_size=CLUSTER, disk_blocks=600), **options)
+        engine = FileSystemEngine('/v', os.path.join(self.folder, data_file), **options)
+        self.engines.append(engine)
+        return engine
+
+    def reopen(self, engine, data_file):
+        engine.close()
+        self.engines.remove(engine)
+        # Un estado guardado con deduplicación la sigue usando aunque no se pida
+        return self.open(data_file)
+
+    def read_all(self, engine):
+        return {path: engine.read_file(os.path.basename(path)) for path in engine.file_extents}
+
+    def test_shared_clusters_survive_delete_and_reopen(self):
+        block = 'a' * CLUSTER
+        for data_file in ("dedup.json", "dedup-sqlite.db"):
+            engine = self.open(data_file, dedup=True)
+            engine.apply_algorithm("EXT")
+            engine.create_file('uno.txt', 4, block * 4)
+            engine.create_file('dos.txt', 4, block * 3 + 'b' * CLUSTER)
+            usage = engine.storage_usage()
+            self.assertEqual(engine.used_blocks - engine.reserved_blocks, 2)  # Un cluster "a" y uno "b"
+            self.assertEqual(usage['logical_blocks'], 8)
+            engine.delete_file('uno.txt')
+            self.assertEqual(engine.read_file('dos.txt'), block * 3 + 'b' * CLUSTER)
+            expected = self.read_all(engine)
+            used = engine.used_blocks
+            engine = self.reopen(engine, data_file)
+            self.assertIsNotNone(engine.block_store)
+            self.assertEqual(self.read_all(engine), expected)
+            self.assertEqual(engine.used_blocks, used)
+            # Un archivo nuevo con el mismo contenido vuelve a compartir el cluster
+            engine.create_file('tres.txt', 1, block)
+            self.assertEqual(engine.used_blocks, used)
+
+    def test_compressed_files_read_back_after_reopen(self):
+        for data_file in ("zlib.json", "zlib-sqlite.db"):
+            engine = self.open(data_file, compression="zlib")
+            engine.apply_algorithm("NTFS")
+            content = 'texto repetido ' * 300
+            engine.create_file('c.txt', -(-len(content) // CLUSTER), content)
+            engine.create_file('plano.txt', 2, 'sin comprimir', compression="none")
+            self.assertLess(engine.used_blocks - engine.reserved_blocks, engine.block_usage['/v/c.txt'])
+            expected = self.read_all(engine)
+            engine = self.reopen(engine, data_file)
+            self.assertEqual(self.read_all(engine), expected)
+            self.assertEqual(engine.file_compression['/v/c.txt'][0], "zlib")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+import os
+import sys
+import random
+import shutil
+import tempfile
+import threading
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import clients
+from engine import FileSystemEngine
+
+
+class AllocationGroupsTest(unittest.TestCase):
+    """Motor con grupos de asignación: hilos que asignan y liberan bloques a la vez en grupos distintos"""
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder, ignore_errors=True)
+
+    def run_clients(self, engine, clients_count=6, operations=120):
+        regions = engine.group_regions()
+        errors = []
+
+        def work(client):
+            rng = random.Random(client)
+            live = []
+            try:
+                for i in range(operations):
+                    if live and rng.random() < 0.35:
+                        engine.delete_file(live.pop(rng.randrange(len(live))))
+                    elif live and rng.random() < 0.2:
+                        engine.replace_file(rng.choice(live), rng.randint(1, 20), "r", None,
+                                            regions[(client + i) % len(regions)])
+                    else:
+                        live.append(f"c{client}_{i}")
+                        engine.create_file(live[-1], rng.randint(1, 20), "x", None, regions[client % len(regions)])
+            except Exception as e:
+                errors.append(e)
+
+        workers = [threading.Thread(target=work, args=(client,)) for client in range(clients_count)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual(errors, [])
+
+    def assert_consistent(self, engine):
+        owners = {}
+        for file_path, extents in engine.file_extents.items():
+            for start, length in extents:
+                for block in range(start, start + length):
+                    self.assertNotIn(block, owners, f"{block}: {file_path} y {owners.get(block)}")
+                    owners[block] = file_path
+        for block in range(engine._data_start(), engine.disk_blocks):
+            self.assertEqual(engine.free_space.count_used(block, block + 1), int(block in owners))
+
+    def test_concurrent_groups_keep_blocks_and_replay(self):
+        for algorithm in ("EXT", "NTFS", "FAT32"):
+            for policy in ("first", "next"):
+                data_file = os.path.join(self.folder, f"{algorithm}-{policy}.json")
+                engine = FileSystemEngine('/v', data_file, host_io=False, disk_blocks=4000, allocation_policy=policy,
+                                          allocation_groups=4)
+                engine.apply_algorithm(algorithm)
+                engine.checkpoint()
+                self.run_clients(engine)
+                self.assert_consistent(engine)
+                engine.save_data()
+                # El log se reproduce sin grupos y debe dejar cada archivo en los mismos bloques
+                replayed = FileSystemEngine('/v', data_file, host_io=False, disk_blocks=4000, allocation_policy=policy)
+                self.assertEqual(replayed.file_extents, engine.file_extents, (algorithm, policy))
+
+    def test_fat32_has_one_group(self):
+        engine = FileSystemEngine('/v', None, host_io=False, wal=False, disk_blocks=4000, allocation_groups=4)
+        engine.apply_algorithm("FAT32")
+        self.assertEqual(len(engine.group_regions()), 1)
+        engine.apply_algorithm("EXT")
+        self.assertEqual(len(engine.group_regions()), 4)
+
+    def test_concurrent_volume_uses_engine_group_locks(self):
+        result = clients.run("EXT", 4, ops_per_client=40, groups=4, disk_blocks=20000, metadata_latency=0.0,
+                             data_latency=0.0)
+        self.assertEqual(result['failed'], 0)
+        self.assertIn("group", result['locks'])
+        self.assertGreater(result['locks']['group']['acquisitions'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
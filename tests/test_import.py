@@ -0,0 +1,63 @@
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine import FileSystemEngine, FileSystemError
+from importer import HostImporter
+
+
+class ImportTest(unittest.TestCase):
+    """Archivos importados del host con host_io: existen solo en el volumen y sus bloques se pueden liberar"""
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.source = os.path.join(self.folder, 'src')
+        self.volume = os.path.join(self.folder, 'vol')
+        os.makedirs(os.path.join(self.source, 'docs'))
+        os.makedirs(self.volume)
+        for name in ('a.txt', os.path.join('docs', 'b.txt')):
+            with open(os.path.join(self.source, name), 'w') as f:
+                f.write('x' * 5000)
+        self.engine = FileSystemEngine(self.volume, None, host_io=True, wal=False)
+        self.engine.apply_algorithm("EXT")
+        HostImporter(self.engine, workers=1).run(self.source, self.volume)
+        self.used = self.engine.used_blocks
+
+    def tearDown(self):
+        self.engine.close()
+        shutil.rmtree(self.folder, ignore_errors=True)
+
+    def test_delete_frees_blocks(self):
+        blocks = self.engine.block_usage[os.path.join(self.volume, 'a.txt')]
+        self.engine.delete_file('a.txt')
+        self.assertNotIn(os.path.join(self.volume, 'a.txt'), self.engine.block_usage)
+        self.assertEqual(self.engine.used_blocks, self.used - blocks)
+
+    def test_move_keeps_blocks(self):
+        self.engine.create_folder('dest')
+        new_path = self.engine.move_file('b.txt', os.path.join(self.volume, 'dest'), os.path.join(self.volume, 'docs'))
+        self.assertIn(new_path, self.engine.block_usage)
+        self.assertEqual(self.engine.used_blocks, self.used)
+        self.engine.delete_file('b.txt', os.path.join(self.volume, 'dest'))
+        self.assertNotIn(new_path, self.engine.block_usage)
+
+    def test_read_reports_missing_content(self):
+        with self.assertRaises(FileSystemError) as raised:
+            self.engine.read_file('a.txt')
+        self.assertEqual(raised.exception.title, "Archivo Simulado")
+
+    def test_rollback_restores_imported_file(self):
+        self.engine.create_snapshot("antes")
+        self.engine.delete_file('a.txt')
+        self.engine.rollback_snapshot("antes")
+        self.assertIn(os.path.join(self.volume, 'a.txt'), self.engine.block_usage)
+        self.assertFalse(os.path.exists(os.path.join(self.volume, 'a.txt')))
+        self.assertEqual(self.engine.used_blocks, self.used)
+
+
+if __name__ == '__main__':
+    unittest.main()
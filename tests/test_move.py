@@ -0,0 +1,57 @@
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine import FileSystemEngine, AlreadyExistsError
+
+
+class HostMoveTest(unittest.TestCase):
+    """Movimientos con archivos reales (host_io): los que conoce el volumen y los que no"""
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.source = os.path.join(self.folder, 'a')
+        self.target = os.path.join(self.folder, 'b')
+        os.makedirs(self.source)
+        os.makedirs(self.target)
+        self.engine = FileSystemEngine(self.source, None, host_io=True, wal=False)
+        self.engine.apply_algorithm("NTFS")
+
+    def tearDown(self):
+        self.engine.close()
+        shutil.rmtree(self.folder, ignore_errors=True)
+
+    def test_move_tracked_file(self):
+        self.engine.create_file('a.txt', 2, 'hola')
+        new_path = self.engine.move_file('a.txt', self.target)
+        self.assertEqual(new_path, os.path.join(self.target, 'a.txt'))
+        self.assertTrue(os.path.exists(new_path))
+        self.assertEqual(list(self.engine.block_usage), [new_path])
+        self.assertEqual(self.engine.mft.get(new_path)['runs'], self.engine.file_extents[new_path])
+
+    def test_move_untracked_host_file(self):
+        # Un archivo real que el volumen no registró se mueve igual, sin entrar en sus tablas
+        with open(os.path.join(self.source, 'u.txt'), 'w') as f:
+            f.write('x')
+        new_path = self.engine.move_file('u.txt', self.target)
+        self.assertTrue(os.path.exists(new_path))
+        self.assertFalse(os.path.exists(os.path.join(self.source, 'u.txt')))
+        self.assertEqual(len(self.engine.block_usage), 0)
+
+    def test_move_does_not_replace_untracked_destination(self):
+        self.engine.create_file('a.txt', 2, 'hola')
+        with open(os.path.join(self.target, 'a.txt'), 'w') as f:
+            f.write('ajeno')
+        with self.assertRaises(AlreadyExistsError):
+            self.engine.move_file('a.txt', self.target)
+        with open(os.path.join(self.target, 'a.txt')) as f:
+            self.assertEqual(f.read(), 'ajeno')
+        self.assertIn(os.path.join(self.source, 'a.txt'), self.engine.block_usage)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine import FileSystemEngine
+
+
+class PersistenceTest(unittest.TestCase):
+    """Estado guardado en SQLite (carga diferida) y en JSON: lo que se hace después de reabrir"""
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.engines = []
+
+    def tearDown(self):
+        for engine in self.engines:
+            engine.close()
+        shutil.rmtree(self.folder, ignore_errors=True)
+
+    def open(self, data_file="state.db", **options):
+        options.setdefault('host_io', False)
+        engine = FileSystemEngine('/v', os.path.join(self.folder, data_file), **options)
+        self.engines.append(engine)
+        return engine
+
+    def reopen(self, engine, data_file="state.db", **options):
+        engine.close()
+        self.engines.remove(engine)
+        return self.open(data_file, **options)
+
+    def crash(self, engine, data_file="state.db", **options):
+        # Caída después de confirmar el log: sin checkpoint final, al abrir se reproduce el log
+        engine.save_data()
+        engine.wal.close()
+        if engine.store is not None:
+            engine.store.close()
+        self.engines.remove(engine)
+        return self.open(data_file, **options)
+
+    @staticmethod
+    def state(engine):
+        return ({path: [list(run) for run in runs] for path, runs in engine.file_extents.items()},
+                dict(engine.block_usage), engine.selected_algorithm, engine.used_blocks, len(engine.journal),
+                sorted(engine.list_directory('/v')))
+
+    def workload(self, engine, algorithm):
+        engine.apply_algorithm(algorithm)
+        engine.create_folder('docs')
+        for i in range(8):
+            engine.create_file(f'f{i}.txt', i + 2, f'contenido {i}')
+        engine.replace_file('f3.txt', 12, 'otro')
+        engine.delete_file('f5.txt')
+        engine.move_file('f1.txt', '/v/docs')
+        engine.move_folder('docs', '/v', new_name='papeles')
+        engine.create_file('f5.txt', 3, 'de nuevo')
+
+    def test_wal_replay_restores_state(self):
+        # Nombres distintos: un .db vacío migraría el .json del mismo nombre
+        for data_file in ("json.json", "sqlite.db"):
+            for algorithm in ("FAT32", "NTFS", "EXT"):
+                name = f"{algorithm}-{data_file}"
+                engine = self.open(name)
+                engine.checkpoint()
+                self.workload(engine, algorithm)
+                expected = self.state(engine)
+                engine = self.crash(engine, name)
+                self.assertEqual(self.state(engine), expected, name)
+                # Lo reproducido queda en el checkpoint: al cerrar y abrir no se aplica dos veces
+                engine = self.reopen(engine, name)
+                self.assertEqual(self.state(engine), expected, name)
+
+    def test_sqlite_defers_tables_until_used(self):
+        engine = self.open()
+        self.workload(engine, "NTFS")
+        expected = self.state(engine)
+        engine = self.reopen(engine)
+        self.assertTrue({'namespace', 'mft', 'free_space'} <= set(engine._lazy))
+        self.assertEqual(self.state(engine), expected)
+        self.assertEqual(engine.mft.get('/v/papeles/f1.txt')['runs'], engine.file_extents['/v/papeles/f1.txt'])
+
+    def test_move_after_reopen_keeps_mft_runs(self):
+        # La MFT diferida no puede reconstruirse con el archivo ya quitado de sus tablas
+        engine = self.open()
+        engine.apply_algorithm("NTFS")
+        engine.create_file('a.txt', 10, 'hi')
+        engine.create_folder('sub')
+        engine = self.reopen(engine)
+        engine.move_file('a.txt', '/v/sub')
+        extents = engine.file_extents['/v/sub/a.txt']
+        self.assertEqual(engine.mft.get('/v/sub/a.txt')['runs'], extents)
+        used = engine.used_blocks
+        engine.apply_algorithm("NTFS")
+        self.assertEqual(engine.used_blocks, used)
+
+    def test_fat_chain_after_reopen_and_delete(self):
+        engine = self.open()
+        engine.apply_algorithm("FAT32")
+        engine.create_file('a.txt', 5, 'a')
+        engine.create_file('b.txt', 5, 'b')
+        engine = self.reopen(engine)
+        engine.delete_file('a.txt')
+        engine.create_file('c.txt', 5, 'c')
+        self.assertEqual(sorted(engine.allocation_table), ['/v/b.txt', '/v/c.txt'])
+        for file_path, entry in engine.allocation_table.items():
+            self.assertEqual(engine.fat_runs(file_path), engine.file_extents[file_path])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+import os
+import copy
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine import FileSystemEngine
+
+
+class SnapshotTest(unittest.TestCase):
+    """Instantáneas copy-on-write: volver a una deja el estado, el contenido y el log como estaban"""
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.data_file = os.path.join(self.folder, 'state.json')
+        self.options = dict(host_io=False, disk_image=os.path.join(self.folder, 'disk.img'), cluster_size=512,
+                            disk_blocks=600)
+        self.engine = FileSystemEngine('/v', self.data_file, **self.options)
+        self.engine.apply_algorithm("EXT")
+        for i in range(6):
+            self.engine.create_file(f'f{i}.txt', 3, f'archivo {i} ' * 20)
+        self.engine.create_folder('docs')
+
+    def tearDown(self):
+        self.engine.close()
+        shutil.rmtree(self.folder, ignore_errors=True)
+
+    def state(self, engine):
+        contents = {path: engine.read_file(os.path.basename(path), os.path.dirname(path)) for path in engine.file_extents}
+        return ({path: [list(run) for run in runs] for path, runs in engine.file_extents.items()}, contents,
+                engine.selected_algorithm, engine.used_blocks, len(engine.journal), sorted(engine.list_directory('/v')),
+                copy.deepcopy(engine.inodes))
+
+    def change_everything(self):
+        engine = self.engine
+        engine.replace_file('f0.txt', 5, 'reemplazado ' * 50)
+        engine.delete_file('f1.txt')
+        engine.create_file('nuevo.txt', 4, 'nuevo')
+        engine.move_file('f2.txt', '/v/docs')
+        engine.create_folder('otra')
+        engine.move_folder('docs', '/v', new_name='papeles')
+
+    def test_rollback_restores_state_and_content(self):
+        expected = self.state(self.engine)
+        self.engine.create_snapshot("antes")
+        self.change_everything()
+        # Solo se copió lo que cambió
+        self.assertFalse({'/v/f3.txt', '/v/f4.txt', '/v/f5.txt'} & set(self.engine.snapshots[0].files))
+        self.engine.rollback_snapshot("antes")
+        self.assertEqual(self.state(self.engine), expected)
+
+    def test_rollback_across_format_change(self):
+        expected = self.state(self.engine)
+        self.engine.create_snapshot("antes")
+        self.change_everything()
+        self.engine.apply_algorithm("FAT32")
+        self.engine.rollback_snapshot("antes")
+        self.assertEqual(self.state(self.engine), expected)
+        self.assertEqual(self.engine.allocation_table, {})
+
+    def test_rollback_truncates_log(self):
+        self.engine.checkpoint()
+        self.engine.create_snapshot("antes")
+        expected = self.state(self.engine)
+        self.change_everything()
+        self.engine.save_data()
+        self.engine.rollback_snapshot("antes")
+        self.engine.save_data()
+        # Al reproducir el log no vuelven los cambios descartados
+        self.engine.wal.close()
+        self.engine.disk_image.flush()
+        replayed = FileSystemEngine('/v', self.data_file, **self.options)
+        try:
+            self.assertEqual(self.state(replayed), expected)
+        finally:
+            replayed.close()
+
+    def test_release_keeps_older_snapshot(self):
+        expected = self.state(self.engine)
+        self.engine.create_snapshot("uno")
+        self.engine.delete_file('f3.txt')
+        self.engine.create_snapshot("dos")
+        self.engine.replace_file('f4.txt', 6, 'cambio')
+        self.engine.release_snapshot("dos")
+        self.engine.rollback_snapshot("uno")
+        self.assertEqual(self.state(self.engine), expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+import os
+import sys
+import time
+import threading
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine import FileSystemEngine
+from executor import BackgroundExecutor
+from table_views import AllocationTableSource, JournalSource, MftSource
+
+
+class TableSourceTest(unittest.TestCase):
+    """Orígenes de las tablas virtuales mientras el motor cambia por debajo"""
+
+    def engine(self, algorithm, files=5):
+        engine = FileSystemEngine('/v', None, host_io=False, wal=False)
+        engine.apply_algorithm(algorithm)
+        for i in range(files):
+            engine.create_file(f"f{i}.txt", i + 1, "x")
+        return engine
+
+    def test_rows_skip_deleted_keys(self):
+        for algorithm, source_type in (("FAT32", AllocationTableSource), ("NTFS", MftSource)):
+            engine = self.engine(algorithm)
+            source = source_type(engine)
+            source.set_sort(source.columns[1])
+            engine.delete_file("f2.txt")
+            rows = source.rows(0, 10)
+            self.assertEqual(len(rows), 4)
+            source.set_sort(source.columns[1])
+            self.assertEqual(source.count(), 4)
+
+    def test_sources_follow_replaced_tables(self):
+        engine = self.engine("NTFS")
+        mft = MftSource(engine)
+        journal = JournalSource(engine)
+        engine.create_snapshot("antes")
+        engine.apply_algorithm("EXT")
+        journal.refresh()
+        self.assertGreater(journal.count(), 0)
+        engine.rollback_snapshot("antes")
+        self.assertEqual(len(journal.rows(0, 100)), len(engine.journal))
+        mft.refresh()
+        self.assertEqual(mft.count(), 5)
+
+    def test_refresh_waits_for_engine_lock(self):
+        engine = self.engine("FAT32")
+        source = AllocationTableSource(engine)
+        done = threading.Event()
+        with engine.lock:
+            worker = threading.Thread(target=lambda: (source.refresh(), done.set()))
+            worker.start()
+            self.assertFalse(done.wait(0.05))
+        worker.join()
+        self.assertEqual(source.count(), 5)
+
+
+class _Root:
+    # Lo mínimo de Tk que usa el ejecutor: los eventos se entregan llamando a poll()
+    def after(self, interval, callback):
+        self.callback = callback
+        return callback
+
+    def after_cancel(self, poll_id):
+        pass
+
+
+class ExecutorWatchTest(unittest.TestCase):
+
+    def test_watchers_run_after_each_operation(self):
+        root = _Root()
+        executor = BackgroundExecutor(root)
+        calls = []
+        executor.watch(lambda: calls.append("watch"))
+
+        def fail(task):
+            raise ValueError("x")
+
+        executor.submit(lambda task: 1, on_done=lambda result: calls.append("done"))
+        executor.submit(fail, on_error=lambda error: calls.append("error"))
+        deadline = time.monotonic() + 5
+        while executor.pending and time.monotonic() < deadline:
+            root.callback()
+            time.sleep(0.01)
+        executor.shutdown()
+        self.assertEqual(calls, ["done", "watch", "error", "watch"])
+
+
+if __name__ == '__main__':
+    unittest.main()